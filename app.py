@@ -1,10 +1,21 @@
 import streamlit as st
 import database
 import os
+import io
 import json
 import pandas as pd
+from datetime import date
 from card_generator import generate_member_card
+from batch_cards import load_members_for_cards, generate_cards_zip
+from card_renderer import render_card_preview, render_card_file
+from print_sheets import impose_cards_pdf
+from photos import ingest_member_photo, photo_variant
+from attachment_export import export_attachments_zip, member_owner
 from doc_generator import generate_bilingual_profile_doc
+from profile_book import generate_profile_book, iter_club_book, iter_member_profiles
+from entry_lists import build_entry_lists, entry_list_frame, reference_date_or_default
+from draws import athletes_from_entries, generate_draws
+from bracket_sheets import write_draw_sheets
 from bilingual_labels import *
 
 # إعداد الصفحة
@@ -38,14 +49,14 @@ with st.sidebar:
 if menu == "الرئيسية":
     st.title("🏠 لوحة المعلومات")
     
-    # إحصائيات سريعة
-    all_members = database.search_members("")
-    all_clubs = database.get_all_clubs()
-    
-    col1, col2, col3 = st.columns(3)
-    col1.metric("عدد الأعضاء", len(all_members))
-    col2.metric("عدد الأندية", len(all_clubs))
-    col3.metric("اللاعبين المسجلين", len([m for m in all_members if m['role'] == 'Player']))
+    # إحصائيات سريعة (استعلام تجميعي واحد بدلاً من تحميل كل الأعضاء)
+    stats = database.get_dashboard_stats()
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("عدد الأعضاء", stats['member_count'])
+    col2.metric("عدد الأندية", stats['club_count'])
+    col3.metric("اللاعبين المسجلين", stats['per_role'].get('Player', 0))
+    col4.metric("اشتراكات تنتهي خلال 30 يوماً", stats['expiring']['membership'].get('30', 0))
 
 # ==========================================
 # 2. إدارة الأعضاء (إضافة وتعديل)
@@ -118,12 +129,11 @@ elif menu == "إدارة الأعضاء":
                 # معالجة الصورة
                 photo_path = ""
                 if photo:
-                    # حفظ الصورة في مجلد assets محلياً
-                    save_dir = f"assets/member_files/{pkf_id}"
-                    os.makedirs(save_dir, exist_ok=True)
-                    photo_path = os.path.join(save_dir, photo.name)
-                    with open(photo_path, "wb") as f:
-                        f.write(photo.getbuffer())
+                    # حفظ الصورة في مجلد assets محلياً: نسخة أصلية مصححة الاتجاه + نسخة البطاقة + صورة مصغرة
+                    try:
+                        photo_path = ingest_member_photo(photo.getvalue(), pkf_id)
+                    except ValueError as e:
+                        st.warning(f"تعذر حفظ الصورة: {e}")
 
                 member_data = {
                     "full_name_ar": name_ar, "full_name": name_en, "pkf_id": pkf_id,
@@ -181,16 +191,158 @@ elif menu == "التقارير والطباعة":
     if role_filter != "All Roles": filters["role"] = role_filter
     if club_filter != "All Clubs": filters["club"] = club_filter
     
-    results = database.search_members_advanced(**filters)
-    
+    # ترقيم الصفحات بالمؤشر (keyset): نحفظ after_id لكل صفحة تمت زيارتها في الجلسة،
+    # ونعيد البدء من الصفحة الأولى عند تغيير الفلاتر
+    filters_key = json.dumps(filters, sort_keys=True)
+    if st.session_state.get("reports_filters_key") != filters_key:
+        st.session_state["reports_filters_key"] = filters_key
+        st.session_state["reports_cursors"] = [None]
+        st.session_state.pop("reports_total", None)
+    cursors = st.session_state["reports_cursors"]
+
+    # العدد الإجمالي يُحسب مرة واحدة لكل مجموعة فلاتر
+    count_mode = None if "reports_total" in st.session_state else "auto"
+    page = database.search_members_page(after_id=cursors[-1], count_mode=count_mode, **filters)
+    if count_mode:
+        st.session_state["reports_total"] = (page['total'], page['total_is_estimate'])
+    total, total_is_estimate = st.session_state["reports_total"]
+    results = page['rows']
+
+    # إصدار بطاقات بالجملة (نادٍ كامل أو بعثة) في ملف ZIP واحد أو في أوراق طباعة A4
+    with st.expander("🗂️ إصدار بطاقات بالجملة"):
+        ids_text = st.text_area("أرقام العضوية (رقم في كل سطر) — اتركه فارغاً لإصدار بطاقات كل نتائج البحث الحالية")
+        card_format = st.radio("صيغة البطاقات", ["docx", "png", "pdf", "sheets"], horizontal=True,
+                               format_func=lambda f: {"docx": "Word (ZIP)", "png": "صور PNG (ZIP)", "pdf": "PDF (ZIP)",
+                                                      "sheets": "أوراق طباعة A4 (PDF واحد)"}[f])
+        duplex = None
+        if card_format == "sheets":
+            duplex = st.selectbox("الطباعة على الوجهين", [None, "long", "short"],
+                                  format_func=lambda d: {None: "وجه واحد", "long": "الوجهين (الحافة الطويلة)",
+                                                         "short": "الوجهين (الحافة القصيرة)"}[d])
+        if st.button("⚙️ توليد البطاقات"):
+            pkf_ids = [line.strip() for line in ids_text.splitlines() if line.strip()]
+            batch_members = load_members_for_cards(pkf_ids=pkf_ids, **filters)
+            if not batch_members:
+                st.warning("لا يوجد أعضاء مطابقون.")
+            else:
+                progress = st.progress(0.0, text=f"0 / {len(batch_members)}")
+                on_progress = lambda done, total: progress.progress(done / total, text=f"{done} / {total}")
+                buffer = io.BytesIO()
+                if card_format == "sheets":
+                    summary = impose_cards_pdf(batch_members, buffer, duplex=duplex, progress_callback=on_progress)
+                    st.success(f"تم توليد {summary['written']} بطاقة في {summary['pages']} صفحة.")
+                else:
+                    summary = generate_cards_zip(batch_members, buffer, card_format=card_format, progress_callback=on_progress)
+                    st.success(f"تم توليد {summary['written']} بطاقة.")
+                for pkf_id, error in summary['failed']:
+                    st.error(f"{pkf_id}: {error}")
+                if card_format == "sheets":
+                    st.download_button("📥 تحميل أوراق الطباعة (PDF)", buffer.getvalue(),
+                                       file_name="pkf_card_sheets.pdf", mime="application/pdf")
+                else:
+                    st.download_button("📥 تحميل البطاقات (ZIP)", buffer.getvalue(),
+                                       file_name="pkf_cards.zip", mime="application/zip")
+
+    # تصدير مرفقات عدة أعضاء (نادٍ كامل أو بعثة) في ملف ZIP واحد مع ملف manifest.csv
+    with st.expander("📎 تصدير المرفقات بالجملة"):
+        attachment_ids_text = st.text_area("أرقام العضوية للمرفقات (رقم في كل سطر) — اتركه فارغاً لتصدير مرفقات كل نتائج البحث الحالية")
+        attachment_categories = st.multiselect("أنواع المرفقات", list(database.ATTACHMENT_CATEGORIES['member']),
+                                               default=list(database.ATTACHMENT_CATEGORIES['member']),
+                                               format_func=lambda c: ATTACHMENT_LABELS_AR.get(c, c))
+        if st.button("⚙️ تجهيز ملف المرفقات"):
+            pkf_ids = [line.strip() for line in attachment_ids_text.splitlines() if line.strip()]
+            export_members = load_members_for_cards(pkf_ids=pkf_ids, **filters)
+            if not export_members or not attachment_categories:
+                st.warning("لا يوجد أعضاء أو أنواع مرفقات محددة.")
+            else:
+                progress = st.progress(0.0, text="0 / 0")
+                on_progress = lambda done, total: progress.progress(done / total, text=f"{done} / {total}")
+                buffer = io.BytesIO()
+                summary = export_attachments_zip([member_owner(m) for m in export_members], buffer,
+                                                 categories=attachment_categories, progress_callback=on_progress)
+                st.success(f"تم تصدير {summary['written']} ملفاً لـ {summary['owners']} عضواً.")
+                if summary['missing']:
+                    st.warning(f"ملفات مفقودة: {len(summary['missing'])} (التفاصيل في manifest.csv)")
+                    for owner_id, category, name, _ in summary['missing'][:10]:
+                        st.caption(f"{owner_id} | {ATTACHMENT_LABELS_AR.get(category, category)} | {name}")
+                st.download_button("📥 تحميل المرفقات (ZIP)", buffer.getvalue(),
+                                   file_name="pkf_attachments.zip", mime="application/zip")
+
+    # كتاب الملفات الشخصية: كل ملفات الاختيار في مستند Word واحد مع فهرس، صفحة لكل ملف
+    with st.expander("📚 كتاب الملفات الشخصية"):
+        book_ids_text = st.text_area("أرقام العضوية للكتاب (رقم في كل سطر) — اتركه فارغاً لكل نتائج البحث الحالية")
+        book_title = st.text_input("عنوان الكتاب", value="PKF Profile Book - كتاب الملفات الشخصية")
+        if st.button("⚙️ توليد الكتاب"):
+            pkf_ids = [line.strip() for line in book_ids_text.splitlines() if line.strip()]
+            if filters.get("club") and not pkf_ids and not search_q and role_filter == "All Roles":
+                # نادٍ كامل: ملف النادي أولاً ثم كل أعضائه
+                profiles = iter_club_book(filters["club"])
+            else:
+                profiles = iter_member_profiles(pkf_ids=pkf_ids, **filters)
+            status = st.empty()
+            buffer = io.BytesIO()
+            summary = generate_profile_book(profiles, buffer, title=book_title,
+                                            progress_callback=lambda done: status.caption(f"{done} ملف..."))
+            if summary['members'] + summary['clubs'] == 0:
+                st.warning("لا يوجد أعضاء مطابقون.")
+            else:
+                st.success(f"تم توليد {summary['members']} ملف عضو و {summary['clubs']} ملف نادٍ.")
+                st.download_button("📥 تحميل الكتاب (Word)", buffer.getvalue(), file_name="pkf_profile_book.docx",
+                                   mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+
+    # قوائم المشاركة: توزيع كل اللاعبين النشطين على الفئات العمرية والأوزان حسب تاريخ البطولة
+    with st.expander("🥋 قوائم المشاركة في البطولة"):
+        entry_col1, entry_col2 = st.columns(2)
+        tournament_date = entry_col1.date_input("تاريخ البطولة (لحساب الأعمار)", value=reference_date_or_default())
+        include_expired = entry_col2.checkbox("تضمين العضويات المنتهية")
+        only_registered = entry_col2.checkbox("فقط الفئات التي اختارها اللاعب في نموذج العضو")
+        if st.button("⚙️ توليد قوائم المشاركة"):
+            roster, entries = build_entry_lists(tournament_date, include_expired=include_expired,
+                                                club=filters.get("club"), only_registered=only_registered)
+            entry_frame = entry_list_frame(roster, entries, tournament_date)
+            if entry_frame.empty:
+                st.warning("لا يوجد لاعبون مطابقون.")
+            else:
+                st.success(f"{len(roster)} لاعباً في {len(entries)} فئة.")
+                summary_frame = entry_frame.groupby('category', sort=False).size().rename("عدد اللاعبين")
+                st.dataframe(summary_frame, use_container_width=True)
+                st.download_button("📥 تحميل قوائم المشاركة (CSV)", entry_frame.to_csv(index=False).encode('utf-8-sig'),
+                                   file_name=f"pkf_entry_lists_{tournament_date}.csv", mime="text/csv")
+
+        # القرعة: نفس القوائم ونفس رقم القرعة يعطيان نفس الجداول دائماً
+        event_name = st.text_input("اسم البطولة (يظهر في رأس الجداول)")
+        draw_seed = st.number_input("رقم القرعة", min_value=0, value=0, step=1)
+        if st.button("🎲 إجراء القرعة وطباعة الجداول"):
+            roster, entries = build_entry_lists(tournament_date, include_expired=include_expired,
+                                                club=filters.get("club"), only_registered=only_registered)
+            if not entries:
+                st.warning("لا يوجد لاعبون مطابقون.")
+            else:
+                draws = generate_draws(athletes_from_entries(roster, entries), draw_seed=int(draw_seed))
+                progress = st.progress(0.0, text=f"0 / {len(draws)}")
+                on_progress = lambda done, total: progress.progress(done / total, text=f"{done} / {total}")
+                buffer = io.BytesIO()
+                summary = write_draw_sheets(draws, buffer, event_name=event_name, event_date=tournament_date,
+                                            draw_seed=int(draw_seed), progress_callback=on_progress)
+                st.success(f"تم إعداد {summary['categories']} فئة في {summary['pages']} صفحة.")
+                st.download_button("📥 تحميل جداول القرعة (PDF)", buffer.getvalue(),
+                                   file_name=f"pkf_draws_{tournament_date}_{int(draw_seed)}.pdf", mime="application/pdf")
+
+    st.caption(f"الصفحة {len(cursors)} — إجمالي النتائج: {'≈ ' if total_is_estimate else ''}{total}")
+    nav_prev, nav_next = st.columns(2)
+    nav_prev.button("⬅️ الصفحة السابقة", disabled=len(cursors) == 1, on_click=cursors.pop)
+    nav_next.button("الصفحة التالية ➡️", disabled=page['next_after_id'] is None,
+                    on_click=cursors.append, args=(page['next_after_id'],))
+
     if results:
         for m in results:
             with st.expander(f"{m['full_name_ar']} | {m['role']} | {m['pkf_id']}"):
                 c1, c2, c3 = st.columns([1, 2, 2])
                 
                 with c1:
-                    if m['photo_path'] and os.path.exists(m['photo_path']):
-                        st.image(m['photo_path'], width=100)
+                    thumb_path = photo_variant(m['photo_path'], 'thumb')
+                    if thumb_path:
+                        st.image(thumb_path, width=100)
                     else: st.info("بدون صورة")
                 
                 with c2:
@@ -216,6 +368,16 @@ elif menu == "التقارير والطباعة":
                         except Exception as e:
                             st.error(f"خطأ: {e}")
 
+                    # معاينة البطاقة الفعلية للعضو (بدون Word)
+                    if st.button("👁️ معاينة البطاقة", key=f"preview_{m['id']}"):
+                        try:
+                            st.image(render_card_preview(m))
+                            png_name, png_bytes = render_card_file(m, 'png')
+                            st.download_button("📥 تحميل البطاقة (PNG للطباعة)", png_bytes, file_name=png_name,
+                                               mime="image/png", key=f"dl_png_{m['id']}")
+                        except Exception as e:
+                            st.error(f"خطأ: {e}")
+
                     # 2. طباعة التقرير (Profile)
                     if st.button("📄 طباعة الملف الشخصي", key=f"prof_{m['id']}"):
                         try:
@@ -237,16 +399,30 @@ elif menu == "التقارير والطباعة":
 elif menu == "التنبيهات":
     st.title("⚠️ تنبيهات انتهاء الصلاحية")
     
-    days = st.slider("عرض المنتهي خلال (أيام):", 30, 180, 60)
-    
-    st.subheader("اشتراكات تنتهي قريباً")
-    exp_members = database.get_expiring_members(days)
-    if exp_members:
-        st.dataframe(pd.DataFrame(exp_members)[['full_name_ar', 'club_name', 'expiry_date']])
-    else:
-        st.success("لا توجد اشتراكات تنتهي قريباً.")
-        
-    st.subheader("جوازات سفر تنتهي قريباً")
-    exp_pass = database.get_expiring_passports(days)
-    if exp_pass:
-        st.dataframe(pd.DataFrame(exp_pass)[['full_name_ar', 'passport_number', 'passport_expiry_date']])
+    # تُجلب التنبيهات مرة واحدة لكل يوم (أو عند التحديث)، وتغيير الفترة يصفّي في الذاكرة فقط
+    col_days, col_refresh = st.columns([4, 1])
+    days = col_days.select_slider("عرض المنتهي خلال (أيام):", options=list(database.EXPIRY_BUCKETS), value=60)
+    alerts = st.session_state.get("expiry_alerts")
+    refresh = col_refresh.button("🔄 تحديث")
+    if refresh or not alerts or alerts["today"] != date.today().isoformat():
+        alerts = database.get_expiry_alerts(use_cache=not refresh)
+        st.session_state["expiry_alerts"] = alerts
+    by_kind = database.filter_expiry_alerts(alerts, days)
+
+    sections = [
+        ('membership', "اشتراكات تنتهي قريباً", "لا توجد اشتراكات تنتهي قريباً.", {'detail': 'الصفة'}),
+        ('passport', "جوازات سفر تنتهي قريباً", "لا توجد جوازات سفر تنتهي قريباً.", {'detail': 'رقم الجواز'}),
+        ('club_subscription', "اشتراكات أندية تنتهي قريباً", "لا توجد اشتراكات أندية تنتهي قريباً.", {'detail': 'ممثل النادي'}),
+        ('referee_license', "رخص حكام تنتهي قريباً", "لا توجد رخص حكام تنتهي قريباً.", {'detail': 'الدرجة'}),
+    ]
+    columns = {'ref': 'الرقم', 'name_ar': 'الاسم', 'name': 'Name', 'club': 'النادي', 'expiry': 'تاريخ الانتهاء', 'days_left': 'الأيام المتبقية'}
+    for kind, title, empty_text, extra in sections:
+        st.subheader(f"{title} ({len(by_kind[kind])})")
+        if by_kind[kind]:
+            labels = {**columns, **extra}
+            if kind == 'club_subscription':
+                labels.pop('name_ar'); labels.pop('club')
+            df = pd.DataFrame(by_kind[kind])[list(labels)].rename(columns=labels)
+            st.dataframe(df, use_container_width=True, hide_index=True)
+        else:
+            st.success(empty_text)
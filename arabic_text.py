@@ -0,0 +1,156 @@
+"""
+Arabic text helpers shared by the search layer and the card renderer.
+
+normalize_search_text() folds the spelling variants that commonly differ
+between two entries of the same Arabic name, so that both the stored search
+keys and the user's query compare equal:
+
+    أ إ آ ٱ -> ا      ة -> ه      ى -> ي
+    tatweel (ـ) and harakat/diacritics are removed
+
+Latin text is case-folded and whitespace is collapsed.
+
+shape_arabic() / display_arabic() prepare text for renderers without a shaping
+engine (Pillow without libraqm): letters are replaced by their contextual
+presentation forms and the line is put in visual (left-to-right) order.
+"""
+import re
+import unicodedata
+
+# Harakat, Quranic annotation marks, superscript alef and tatweel.
+_ARABIC_DIACRITICS_RE = re.compile("[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_WHITESPACE_RE = re.compile(r"\s+")
+_ARABIC_FOLD = str.maketrans({
+    "\u0623": "\u0627",  # أ -> ا
+    "\u0625": "\u0627",  # إ -> ا
+    "\u0622": "\u0627",  # آ -> ا
+    "\u0671": "\u0627",  # ٱ -> ا
+    "\u0629": "\u0647",  # ة -> ه
+    "\u0649": "\u064A",  # ى -> ي
+})
+
+
+def normalize_arabic(text):
+    """Removes diacritics/tatweel and unifies alef, taa marbuta and alef maqsura."""
+    if not text:
+        return ""
+    return _ARABIC_DIACRITICS_RE.sub("", str(text)).translate(_ARABIC_FOLD)
+
+
+def normalize_search_text(text):
+    """Normalized, case-folded, single-spaced form of `text` used for search keys and queries."""
+    return _WHITESPACE_RE.sub(" ", normalize_arabic(text).casefold()).strip()
+
+
+# --- Shaping for display ---
+def _build_presentation_forms():
+    """{letter or lam-alef pair: {'isolated'|'final'|'initial'|'medial': presentation form}} from the Unicode tables."""
+    forms = {}
+    for cp in list(range(0xFB50, 0xFC00)) + list(range(0xFE70, 0xFF00)):
+        decomposition = unicodedata.decomposition(chr(cp))
+        if not decomposition.startswith('<'):
+            continue
+        tag, *codes = decomposition.split()
+        tag = tag.strip('<>')
+        if tag not in ('isolated', 'final', 'initial', 'medial'):
+            continue
+        base = ''.join(chr(int(code, 16)) for code in codes)
+        if base.isspace() or not base.strip():
+            continue
+        forms.setdefault(base, {}).setdefault(tag, chr(cp))
+    return forms
+
+
+_PRESENTATION_FORMS = _build_presentation_forms()
+_TATWEEL = "\u0640"
+_LAM = "\u0644"
+_ALEFS_AFTER_LAM = "\u0622\u0623\u0625\u0627"
+_ARABIC_CHAR_RE = re.compile("[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]")
+# A number: ASCII or Arabic-Indic digits, with Arabic/Latin decimal and thousands separators between them.
+_DIGITS = "0-9\u0660-\u0669\u06F0-\u06F9"
+_DIGIT_RUN_RE = re.compile(f"[{_DIGITS}]+(?:[\u066B\u066C.,][{_DIGITS}]+)*")
+
+
+def _joins_next(unit):
+    forms = _PRESENTATION_FORMS.get(unit, {})
+    return unit == _TATWEEL or 'initial' in forms or 'medial' in forms
+
+
+def _joins_previous(unit):
+    return unit == _TATWEEL or 'final' in _PRESENTATION_FORMS.get(unit, {})
+
+
+def shape_arabic(text):
+    """
+    Replaces Arabic letters with their contextual presentation forms (logical order kept).
+    Harakat are dropped: without a shaping engine they cannot be positioned over their letter.
+    """
+    if not text or not _ARABIC_CHAR_RE.search(text):
+        return text or ""
+    units = []
+    chars = [c for c in str(text) if not unicodedata.combining(c)]
+    i = 0
+    while i < len(chars):
+        if chars[i] == _LAM and i + 1 < len(chars) and chars[i + 1] in _ALEFS_AFTER_LAM:
+            units.append(chars[i] + chars[i + 1])
+            i += 2
+        else:
+            units.append(chars[i])
+            i += 1
+
+    shaped = []
+    for i, unit in enumerate(units):
+        forms = _PRESENTATION_FORMS.get(unit)
+        if not forms:
+            shaped.append(unit)
+            continue
+        after_previous = i > 0 and _joins_next(units[i - 1]) and _joins_previous(unit)
+        before_next = i + 1 < len(units) and _joins_next(unit) and _joins_previous(units[i + 1])
+        if after_previous and before_next:
+            form = 'medial'
+        elif after_previous:
+            form = 'final'
+        elif before_next:
+            form = 'initial'
+        else:
+            form = 'isolated'
+        shaped.append(forms.get(form) or forms.get('isolated') or unit)
+    return ''.join(shaped)
+
+
+def is_rtl_text(text):
+    """True when the first strong character of `text` is Arabic."""
+    for c in text or "":
+        if _ARABIC_CHAR_RE.match(c):
+            return True
+        if c.isalpha():
+            return False
+    return False
+
+
+def display_arabic(text):
+    """
+    Shaped text in visual order for a left-to-right renderer. Words are reordered
+    for a right-to-left line; Latin words and numbers (including Arabic-Indic
+    digits) keep their own order.
+    """
+    shaped = shape_arabic(text)
+    if not _ARABIC_CHAR_RE.search(shaped):
+        return shaped
+    runs = []  # [is_arabic, [words]]
+    for word in shaped.split(' '):
+        arabic = bool(_ARABIC_CHAR_RE.search(_DIGIT_RUN_RE.sub('', word)))
+        if runs and runs[-1][0] == arabic:
+            runs[-1][1].append(word)
+        else:
+            runs.append([arabic, [word]])
+    visual = []
+    for arabic, words in runs:
+        if arabic:
+            # Reversing the run also reverses numbers inside a word; put their digits back in order
+            visual.append(_DIGIT_RUN_RE.sub(lambda m: m.group()[::-1], ' '.join(words)[::-1]))
+        else:
+            visual.append(' '.join(words))
+    if is_rtl_text(shaped):
+        visual.reverse()
+    return ' '.join(visual)
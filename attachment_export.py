@@ -0,0 +1,151 @@
+"""
+Bulk attachment export.
+
+Collects the attachments of many members and clubs (any mix of categories)
+from the attachments table and writes them into one ZIP:
+
+    <Name ID>/<Category>/<original file name>
+    manifest.csv
+
+Files are read by a small thread pool (file reads release the GIL, which helps
+most when assets/ sits on a network share) while the calling thread streams
+each finished file into the archive, so nothing is staged on disk and only a
+bounded number of files is held in memory. Already-compressed formats are
+stored as is, everything else is deflated. The manifest lists every requested
+file with its status, so missing files are reported instead of silently skipped.
+"""
+import csv
+import io
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from bilingual_labels import ATTACHMENT_LABELS_EN
+from database import get_attachments_for_owners
+
+DEFAULT_WORKERS = 4
+# Files read ahead per worker; bounds memory to a few attachments per thread.
+_IN_FLIGHT_PER_WORKER = 2
+# Formats that do not shrink any further; deflating them only costs CPU.
+_STORED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.heic', '.pdf', '.zip', '.docx', '.xlsx', '.pptx', '.mp4'}
+
+# Files between progress_callback calls; per-file updates flood the GUI poller on large exports.
+PROGRESS_EVERY = 100
+
+MANIFEST_NAME = "manifest.csv"
+MANIFEST_COLUMNS = ["owner_type", "owner_id", "owner_name", "category", "file_name", "archive_path", "size", "sha256", "status"]
+
+
+def member_owner(member):
+    """Export owner for a member row."""
+    return {'owner_type': 'member', 'owner_id': member.get('pkf_id'), 'name': member.get('full_name') or member.get('full_name_ar') or ''}
+
+
+def club_owner(club):
+    """Export owner for a club row."""
+    return {'owner_type': 'club', 'owner_id': club.get('club_membership_id'), 'name': club.get('name') or ''}
+
+
+def _safe_name(text):
+    return "".join(c for c in str(text) if c.isalnum() or c in (' ', '_', '-', '.')).strip() or "_"
+
+
+def _unique_name(name, used):
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{base}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def _read_file(item):
+    """Runs in a worker thread; returns (item, bytes or None, error or None)."""
+    try:
+        with open(item['path'], 'rb') as f:
+            return item, f.read(), None
+    except FileNotFoundError:
+        return item, None, "missing"
+    except OSError as e:
+        return item, None, f"error: {e}"
+
+
+def _iter_read(items, workers):
+    """Yields read results in completion order, with at most workers * _IN_FLIGHT_PER_WORKER files in memory."""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        items = iter(items)
+        limit = workers * _IN_FLIGHT_PER_WORKER
+        while True:
+            for item in items:
+                pending.add(pool.submit(_read_file, item))
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def plan_export(owners, categories=None):
+    """
+    The files to export for the owners, as dicts with the archive path assigned:
+    one folder per owner, one sub-folder per category, names made unique.
+    """
+    owners = [o for o in owners if o.get('owner_id')]
+    by_key = {(o['owner_type'], str(o['owner_id'])): o for o in owners}
+    rows = get_attachments_for_owners(list(by_key), categories)
+    used, folders, items = set(), {}, []
+    for row in rows:
+        owner = by_key[(row['owner_type'], row['owner_id'])]
+        key = (row['owner_type'], row['owner_id'])
+        if key not in folders:
+            folders[key] = _unique_name(_safe_name(f"{owner['name']} {row['owner_id']}"), used)
+        category = _safe_name(ATTACHMENT_LABELS_EN.get(row['category'], row['category']))
+        file_name = row['original_name'] or os.path.basename(row['path'])
+        archive_path = _unique_name(f"{folders[key]}/{category}/{_safe_name(file_name)}", used)
+        items.append(dict(row, owner_name=owner['name'], file_name=file_name, archive_path=archive_path))
+    return items
+
+
+def export_attachments_zip(owners, output, categories=None, workers=DEFAULT_WORKERS, progress_callback=None):
+    """
+    Writes the attachments of the owners (see member_owner / club_owner) into one ZIP
+    with a manifest.csv.
+
+    output: a file path or a writable binary file object (e.g. io.BytesIO for Streamlit).
+    categories: attachment category keys to include (None for all).
+    progress_callback(done, total) is called every PROGRESS_EVERY files and after the last one.
+    Returns {'written': int, 'bytes': int, 'owners': int, 'missing': [(owner_id, category, file_name, path), ...]}.
+    """
+    items = plan_export(owners, categories)
+    total = len(items)
+    summary = {'written': 0, 'bytes': 0, 'owners': len({(i['owner_type'], i['owner_id']) for i in items}), 'missing': []}
+    status = {}
+
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for done, (item, content, error) in enumerate(_iter_read(items, max(1, workers)), start=1):
+            if error:
+                status[item['archive_path']] = error
+                summary['missing'].append((item['owner_id'], item['category'], item['file_name'], item['path']))
+            else:
+                ext = os.path.splitext(item['archive_path'])[1].lower()
+                compress = zipfile.ZIP_STORED if ext in _STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+                zf.writestr(item['archive_path'], content, compress_type=compress)
+                status[item['archive_path']] = "ok"
+                summary['written'] += 1
+                summary['bytes'] += len(content)
+            if progress_callback and (done % PROGRESS_EVERY == 0 or done == total):
+                progress_callback(done, total)
+
+        manifest = io.StringIO()
+        writer = csv.writer(manifest)
+        writer.writerow(MANIFEST_COLUMNS)
+        for item in items:
+            writer.writerow([item['owner_type'], item['owner_id'], item['owner_name'], item['category'], item['file_name'],
+                             item['archive_path'], item['size'], item['sha256'] or "", status.get(item['archive_path'], "")])
+        # UTF-8 with BOM so Excel shows Arabic names correctly
+        zf.writestr(MANIFEST_NAME, manifest.getvalue().encode('utf-8-sig'))
+    return summary
@@ -0,0 +1,323 @@
+"""
+Content-addressed attachment store.
+
+Uploaded documents (ID scans, receipts, certificates...) are stored once per
+distinct content, named after their SHA-256:
+
+    assets/blobs/<sha[:2]>/<sha[2:4]>/<sha><ext>
+
+Every use of a file by a member or club is one row in the attachments table
+(owner, category, original name, size, mime); attachment_blobs keeps the
+reference count, and the file is deleted when its last reference is released
+(after that transaction commits, see database.remove_orphaned_blobs).
+Uploading the same receipt for ten members therefore stores it once.
+
+The blob path is what the specific_data / attachments_data JSON keeps, so
+everything that opens or copies attachments by path keeps working. Saving a
+member or club reconciles its attachments rows with that JSON.
+
+The forms upload with stage_file(): the blob is stored and referenced by an
+attachment_uploads row, but no attachments row exists until the member or
+club is saved, when the reference moves to the owner in the same transaction.
+Uploads of a form that is never saved are released after a day (init_db).
+
+Index attachments saved before the attachments table existed once with:
+    python attachment_store.py --backfill
+"""
+import argparse
+import hashlib
+import mimetypes
+import os
+import tempfile
+from collections import Counter
+
+from database import (backfill_attachments, discard_uploads, get_connection, lock_blob, release_blob_refs,
+                      remove_orphaned_blobs)
+
+BLOB_DIR = os.path.join("assets", "blobs")
+CHUNK_SIZE = 1024 * 1024
+OWNER_TYPES = ('member', 'club')
+
+
+def blob_path(sha256, ext=""):
+    """Sharded location of a blob: assets/blobs/ab/cd/abcd...<ext>."""
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], f"{sha256}{ext}")
+
+
+def is_blob_path(path):
+    """True for paths inside the blob store (as opposed to legacy per-member copies)."""
+    try:
+        return os.path.commonpath([os.path.abspath(path), os.path.abspath(BLOB_DIR)]) == os.path.abspath(BLOB_DIR)
+    except ValueError:
+        return False
+
+
+def guess_mime(name):
+    return mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+
+def _stage(source_path, progress_callback=None):
+    """
+    Copies source_path to a temporary file inside BLOB_DIR while hashing it, so
+    the file is read only once. Returns (sha256, size, tmp_path).
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, suffix=".tmp")
+    try:
+        with open(source_path, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+                if progress_callback:
+                    progress_callback(size)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return digest.hexdigest(), size, tmp_path
+
+
+def _place(tmp_path, path):
+    """Moves a staged file into place, or drops it when the blob is already on disk."""
+    if os.path.exists(path):
+        os.remove(tmp_path)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+
+
+def _store(source_path, skip_paths, progress_callback, insert_row):
+    """
+    Copies source_path into the store and takes one blob reference, recorded by
+    insert_row(cur, sha256, path, original_name, size, mime) -> row id in the same
+    transaction. Returns the stored file as a dict, or None if it is in skip_paths.
+
+    The file is placed before the commit, so a committed reference always has
+    its file; a failed commit at worst leaves an unreferenced file behind.
+    """
+    original_name = os.path.basename(source_path)
+    mime = guess_mime(original_name)
+    sha256, size, tmp_path = _stage(source_path, progress_callback)
+    path = blob_path(sha256, os.path.splitext(original_name)[1].lower())
+
+    conn = get_connection()
+    if not conn:
+        os.remove(tmp_path)
+        raise RuntimeError("No database connection available.")
+    placed = False
+    try:
+        with conn.cursor() as cur:
+            # Serializes us with remove_orphaned_blobs() deleting the same content.
+            lock_blob(cur, sha256)
+            cur.execute("""
+                INSERT INTO attachment_blobs (sha256, size, mime, path, refcount) VALUES (%s, %s, %s, %s, 1)
+                ON CONFLICT (sha256) DO UPDATE SET refcount = attachment_blobs.refcount + 1
+                RETURNING path, refcount
+            """, (sha256, size, mime, path))
+            path, refcount = cur.fetchone()
+            if path in skip_paths:
+                conn.rollback()
+                os.remove(tmp_path)
+                return None
+            row_id = insert_row(cur, sha256, path, original_name, size, mime)
+            _place(tmp_path, path)
+            placed = True
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        if not placed:
+            os.remove(tmp_path)
+        raise
+    finally:
+        conn.close()
+
+    return {'id': row_id, 'path': path, 'original_name': original_name, 'size': size,
+            'mime': mime, 'sha256': sha256, 'deduplicated': refcount > 1}
+
+
+def attach_file(source_path, owner_type, owner_id, category, skip_paths=(), progress_callback=None):
+    """
+    Stores source_path in the blob store and records it as an attachment of
+    (owner_type, owner_id) under category, for an owner that is already saved
+    (the forms use stage_file()).
+
+    skip_paths: blob paths already attached in this list; a file whose content
+    is one of them is not attached twice.
+    progress_callback(bytes_done) is called while the file is hashed/copied.
+    Returns the attachment as a dict (id, path, original_name, size, mime, sha256,
+    deduplicated), or None when the file was skipped as a duplicate of skip_paths.
+    """
+    if owner_type not in OWNER_TYPES:
+        raise ValueError(f"Unknown attachment owner type: {owner_type}")
+    if not str(owner_id or "").strip():
+        raise ValueError("An owner ID is required to store attachments.")
+
+    def insert_row(cur, sha256, path, original_name, size, mime):
+        cur.execute("""
+            INSERT INTO attachments (owner_type, owner_id, category, sha256, path, original_name, size, mime)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+        """, (owner_type, str(owner_id), category, sha256, path, original_name, size, mime))
+        return cur.fetchone()[0]
+
+    return _store(source_path, skip_paths, progress_callback, insert_row)
+
+
+def stage_file(source_path, skip_paths=(), progress_callback=None):
+    """
+    Stores source_path in the blob store for a form that is not saved yet: the
+    file holds a reference through an attachment_uploads row, and becomes an
+    attachment when the member or club is saved with its path in the JSON.
+    Same arguments and return value as attach_file(); 'id' is the upload row.
+    """
+    def insert_row(cur, sha256, path, original_name, size, mime):
+        cur.execute("""
+            INSERT INTO attachment_uploads (sha256, path, original_name, size, mime)
+            VALUES (%s, %s, %s, %s, %s) RETURNING id
+        """, (sha256, path, original_name, size, mime))
+        return cur.fetchone()[0]
+
+    return _store(source_path, skip_paths, progress_callback, insert_row)
+
+
+def _store_files(store_one, source_paths, skip_paths, progress_callback, on_stored):
+    skip_paths = set(skip_paths)
+    sizes = {}
+    for source_path in source_paths:
+        try:
+            sizes[source_path] = os.path.getsize(source_path)
+        except OSError:
+            sizes[source_path] = 0
+    total = sum(sizes.values())
+    summary = {'added': 0, 'deduplicated': 0, 'skipped': 0, 'failed': []}
+    done = 0
+    for source_path in source_paths:
+        file_progress = None
+        if progress_callback:
+            file_progress = lambda n, base=done: progress_callback(base + n, total)
+        try:
+            stored = store_one(source_path, skip_paths, file_progress)
+        except Exception as e:
+            summary['failed'].append((os.path.basename(source_path), str(e)))
+        else:
+            if stored is None:
+                summary['skipped'] += 1
+            else:
+                skip_paths.add(stored['path'])
+                summary['added'] += 1
+                summary['deduplicated'] += stored['deduplicated']
+                if on_stored:
+                    on_stored(stored)
+        done += sizes[source_path]
+    return summary
+
+
+def attach_files(source_paths, owner_type, owner_id, category, skip_paths=(), progress_callback=None, on_attached=None):
+    """
+    attach_file() over a selection of files.
+
+    progress_callback(bytes_done, bytes_total) reports progress across the whole
+    selection; on_attached(attachment) is called for every stored file.
+    Returns {'added', 'deduplicated', 'skipped', 'failed': [(file name, error), ...]};
+    'deduplicated' counts files whose content was already in the store (no extra disk).
+    """
+    return _store_files(lambda path, skip, progress: attach_file(path, owner_type, owner_id, category, skip, progress),
+                        source_paths, skip_paths, progress_callback, on_attached)
+
+
+def stage_files(source_paths, skip_paths=(), progress_callback=None, on_staged=None):
+    """stage_file() over a selection of files, for the upload workers of the forms; as attach_files()."""
+    return _store_files(stage_file, source_paths, skip_paths, progress_callback, on_staged)
+
+
+def release_attachments(owner_type, owner_id, category, paths):
+    """
+    Removes the owner's attachment rows for the given paths and drops one blob
+    reference per row; blobs left without references are deleted from disk
+    once the change is committed.
+    Paths without such a row are uploads of the form not saved yet, and are
+    discarded (see stage_file()). Files outside the store are not touched.
+    Returns the number of blob files deleted.
+    """
+    paths = [p for p in paths if p]
+    if not paths:
+        return 0
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("No database connection available.")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                DELETE FROM attachments
+                WHERE owner_type = %s AND owner_id = %s AND category = %s AND path = ANY(%s)
+                RETURNING path, sha256
+            """, (owner_type, str(owner_id or ""), category, paths))
+            rows = cur.fetchall()
+            orphaned = release_blob_refs(cur, Counter(sha256 for _, sha256 in rows if sha256))
+            unsaved = Counter(paths) - Counter(path for path, _ in rows)
+            orphaned += discard_uploads(cur, Counter(p for p in unsaved.elements() if is_blob_path(p)))
+            conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return remove_orphaned_blobs(orphaned)
+
+
+def attachment_names(owner_type, owner_id):
+    """{path: original file name} for the owner's attachments, for display in the forms."""
+    conn = get_connection()
+    if not conn:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT path, original_name FROM attachments WHERE owner_type = %s AND owner_id = %s",
+                        (owner_type, str(owner_id)))
+            return {path: name for path, name in cur.fetchall() if name}
+    finally:
+        conn.close()
+
+
+def store_stats():
+    """Blob count, bytes on disk, attachment references and the bytes saved by deduplication."""
+    conn = get_connection()
+    if not conn:
+        return {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*), COALESCE(sum(size), 0), COALESCE(sum(refcount), 0),
+                       COALESCE(sum(size * GREATEST(refcount - 1, 0)), 0)
+                FROM attachment_blobs
+            """)
+            blobs, stored_bytes, references, saved_bytes = cur.fetchone()
+            return {'blobs': blobs, 'stored_bytes': int(stored_bytes), 'references': int(references),
+                    'saved_bytes': int(saved_bytes)}
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attachment store maintenance.")
+    parser.add_argument("--backfill", action="store_true",
+                        help="index the attachments listed in existing member/club JSON into the attachments table")
+    args = parser.parse_args(argv)
+
+    if args.backfill:
+        def progress(owner_type, done):
+            print(f"{done} {owner_type}s indexed")
+
+        summary = backfill_attachments(progress_callback=progress)
+        print(f"{summary['members']} members and {summary['clubs']} clubs checked, {summary['attachments']} attachments indexed.")
+    stats = store_stats()
+    print(f"Store: {stats['blobs']} files, {stats['stored_bytes'] / 1048576:.1f} MB, {stats['references']} references, "
+          f"{stats['saved_bytes'] / 1048576:.1f} MB saved by deduplication.")
+
+
+if __name__ == "__main__":
+    main()
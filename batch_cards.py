@@ -0,0 +1,103 @@
+"""
+Batch ID-card generation.
+
+Cards are rendered in a process pool (card rendering is CPU bound, so threads
+would serialize on the GIL) and each finished file is written straight into a
+single ZIP as soon as it arrives, without staging files on disk. Cards are Word
+documents by default, or print-ready PNG/PDF from card_renderer.
+"""
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from card_generator import render_member_card
+from card_renderer import render_card_file
+from database import get_members_by_pkf_ids, search_members_advanced
+
+# Tasks kept in flight per worker; bounds memory to a few rendered cards per process.
+_IN_FLIGHT_PER_WORKER = 4
+
+# Cards between progress_callback calls; per-card updates flood the GUI poller on large batches.
+PROGRESS_EVERY = 25
+
+
+def load_members_for_cards(pkf_ids=None, **filters):
+    """Members to print: an explicit list of pkf_ids, or every member matching the Reports filters."""
+    if pkf_ids:
+        return get_members_by_pkf_ids(pkf_ids)
+    return search_members_advanced(page_size=None, **filters)
+
+
+def _render_card_task(member_data, card_format='docx'):
+    """Runs in a worker process; never raises so one bad card does not stop the batch."""
+    try:
+        if card_format == 'docx':
+            file_name, content = render_member_card(member_data)
+        else:
+            file_name, content = render_card_file(member_data, card_format)
+        return member_data.get('pkf_id'), file_name, content, None
+    except Exception as e:
+        return member_data.get('pkf_id'), None, None, str(e)
+
+
+def _unique_name(name, used):
+    base, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{base}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def _iter_rendered(members, workers, card_format):
+    """Yields render results in completion order; workers <= 1 renders in this process."""
+    if workers <= 1:
+        for member in members:
+            yield _render_card_task(member, card_format)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        members = iter(members)
+        limit = workers * _IN_FLIGHT_PER_WORKER
+        while True:
+            for member in members:
+                pending.add(pool.submit(_render_card_task, member, card_format))
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def generate_cards_zip(members, output, workers=None, progress_callback=None, card_format='docx'):
+    """
+    Renders a card for every member and writes them into one ZIP.
+
+    output: a file path or a writable binary file object (e.g. io.BytesIO for Streamlit).
+    workers: process count (default: CPU count); 1 renders serially.
+    card_format: 'docx' (Word template) or 'png' / 'pdf' (card_renderer).
+    progress_callback(done, total) is called every PROGRESS_EVERY cards and after the last one.
+    Returns {'written': int, 'failed': [(pkf_id, error), ...]}.
+    """
+    members = list(members)
+    total = len(members)
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, total))
+    summary = {'written': 0, 'failed': []}
+    used_names = set()
+
+    # .docx, .png and .pdf files are already compressed, so they are stored as-is.
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for done, (pkf_id, file_name, content, error) in enumerate(_iter_rendered(members, workers, card_format), start=1):
+            if error:
+                summary['failed'].append((pkf_id, error))
+            else:
+                archive.writestr(_unique_name(file_name, used_names), content)
+                summary['written'] += 1
+            if progress_callback and (done % PROGRESS_EVERY == 0 or done == total):
+                progress_callback(done, total)
+    return summary
@@ -0,0 +1,355 @@
+"""
+Printable draw sheets.
+
+Writes the draws from draws.py into one A4 PDF, one or more pages per
+category:
+
+  * Kumite: the bracket with seeds, club names, byes and bout numbers, blank
+    lines for the winners, the repechage ladder of each half and the medal
+    boxes. Brackets larger than PAGE_SLOTS are split into parts of PAGE_SLOTS
+    athletes, followed by a page with the remaining rounds.
+  * Kata: each pool in performance order with blank score and rank columns.
+
+Pages are drawn with Pillow in greyscale and embedded losslessly
+(print_sheets.PdfStream). Categories are rendered in a process pool and
+streamed into the PDF in order, so hundreds of categories print as one job
+without holding the document in memory.
+"""
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+
+from PIL import Image, ImageDraw, ImageFont, features
+
+from arabic_text import display_arabic, is_rtl_text
+from card_renderer import FONT_PATH
+from print_sheets import PAGE_SIZE_MM, PdfStream
+
+SHEET_DPI = 150
+PAGE_SLOTS = 32           # bracket positions per page
+MARGIN_MM = 10.0
+HEADER_MM = 22.0
+LEAF_WIDTH_MM = 64.0      # first column: athlete name and club
+MAX_LINE_MM = 8.0         # bracket line spacing when there is room
+REPECHAGE_LINE_MM = 6.0
+KATA_ROW_MM = 7.0
+KATA_COLUMNS = (("No.", 10), ("Name", 66), ("Club", 50), ("Seed", 14), ("Score", 25), ("Rank", 25))  # (heading, mm)
+
+_PT_PER_MM = 72 / 25.4
+_RAQM = features.check('raqm')
+
+
+@lru_cache(maxsize=16)
+def _font(size_px):
+    layout = ImageFont.Layout.RAQM if _RAQM else ImageFont.Layout.BASIC
+    return ImageFont.truetype(FONT_PATH, size_px, layout_engine=layout)
+
+
+@lru_cache(maxsize=16384)
+def _text_length(text, size_px, direction):
+    return _font(size_px).getlength(text, direction=direction)
+
+
+def _line_length(text, size_px, direction):
+    if _RAQM:
+        return _text_length(text, size_px, direction)
+    return sum(_text_length(char, size_px, None) for char in text)  # glyph by glyph, as drawn by _Page.text
+
+
+@lru_cache(maxsize=16384)
+def _text_mask(text, size_px, direction, anchor):
+    """(mask, left, top): the rendered text (a line, or one glyph) and its offset from the anchor point."""
+    font = _font(size_px)
+    left, top, right, bottom = font.getbbox(text, direction=direction, anchor=anchor)
+    mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+    ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255, direction=direction, anchor=anchor)
+    return mask, left, top
+
+
+class _Page:
+    """One A4 page in millimetres."""
+
+    def __init__(self, dpi=SHEET_DPI):
+        self.dpi = dpi
+        self.image = Image.new('L', (self.px(PAGE_SIZE_MM[0]), self.px(PAGE_SIZE_MM[1])), 255)
+        self.draw = ImageDraw.Draw(self.image)
+
+    def px(self, mm):
+        return int(round(mm * self.dpi / 25.4))
+
+    def text(self, x_mm, y_mm, text, size_pt, fill=0, anchor='ls', max_width_mm=None):
+        """Draws one line (anchor 'ls': left end of the baseline); the font shrinks (down to 60%) to fit max_width_mm."""
+        text = str(text) if text is not None else ""
+        if not text:
+            return
+        direction = None
+        if _RAQM:
+            if is_rtl_text(text):
+                direction = 'rtl'
+        else:
+            text = display_arabic(text)
+        size = max(1, int(size_pt * self.dpi / 72))
+        if max_width_mm:
+            limit, floor = self.px(max_width_mm), int(size * 0.6)
+            width = _line_length(text, size, direction)
+            if width > limit:
+                size = max(floor, int(size * limit / width))
+                while size > floor and _line_length(text, size, direction) > limit:
+                    size -= 1
+        x, y = self.px(x_mm), self.px(y_mm)
+        if _RAQM:
+            self._paste(fill, x, y, *_text_mask(text, size, direction, anchor))
+            return
+        # Without libraqm Pillow lays text out glyph by glyph anyway (text is already in visual
+        # order), so only the few distinct glyphs are rasterized, once per size
+        if anchor[0] == 'r':
+            x -= int(round(_line_length(text, size, None)))
+        glyph_anchor = 'l' + anchor[1]
+        for char in text:
+            if not char.isspace():
+                self._paste(fill, x, y, *_text_mask(char, size, None, glyph_anchor))
+            x += _text_length(char, size, None)
+
+    def _paste(self, fill, x, y, mask, left, top):
+        x, y = int(round(x)) + left, y + top
+        self.image.paste(fill, (x, y, x + mask.width, y + mask.height), mask)
+
+    def hline(self, x0_mm, x1_mm, y_mm, width=1):
+        y = self.px(y_mm)
+        self.draw.line([(self.px(x0_mm), y), (self.px(x1_mm), y)], fill=0, width=width)
+
+    def vline(self, x_mm, y0_mm, y1_mm, width=1):
+        x = self.px(x_mm)
+        self.draw.line([(x, self.px(y0_mm)), (x, self.px(y1_mm))], fill=0, width=width)
+
+    def rect(self, x_mm, y_mm, w_mm, h_mm):
+        self.draw.rectangle([self.px(x_mm), self.px(y_mm), self.px(x_mm + w_mm), self.px(y_mm + h_mm)], outline=0)
+
+
+def _header(page, draw, event, part=None):
+    width = PAGE_SIZE_MM[0] - 2 * MARGIN_MM
+    page.text(MARGIN_MM, MARGIN_MM + 6, draw['title'] + (f" — {part}" if part else ""), 15, max_width_mm=width)
+    details = [event.get('name'), event.get('date') and f"Date: {event['date']}", f"Athletes: {draw['athletes']}",
+               event.get('draw_seed') is not None and f"Draw seed: {event['draw_seed']}"]
+    page.text(MARGIN_MM, MARGIN_MM + 12, "   |   ".join(d for d in details if d), 8, fill=80, max_width_mm=width)
+    page.hline(MARGIN_MM, PAGE_SIZE_MM[0] - MARGIN_MM, MARGIN_MM + 15)
+
+
+def _athlete_label(athlete):
+    seed = f"[{athlete['seed']}] " if athlete.get('seed') else ""
+    return f"{seed}{athlete['name']}", athlete['club']
+
+
+# --- Kumite ---
+
+class _TreeLayout:
+    def __init__(self, top, line_mm, levels):
+        self.top, self.line_mm = top, line_mm
+        self.x_leaf = MARGIN_MM
+        self.col_w = (PAGE_SIZE_MM[0] - 2 * MARGIN_MM - LEAF_WIDTH_MM) / max(1, levels)
+        self.next_leaf = 0
+
+    def x_of(self, depth):
+        """Left end of the lines at depth (1 = first bouts)."""
+        return self.x_leaf + LEAF_WIDTH_MM + (depth - 1) * self.col_w
+
+
+def _draw_leaf(page, layout, node, winner_leaf):
+    y = layout.top + (layout.next_leaf + 0.5) * layout.line_mm
+    layout.next_leaf += 1
+    page.hline(layout.x_leaf, layout.x_leaf + LEAF_WIDTH_MM, y)
+    size = min(8, layout.line_mm * 1.1)
+    if winner_leaf and node['match'] is not None:
+        page.text(layout.x_leaf + 1, y - 0.7, f"Winner of bout {node['match']}", size, fill=90)
+    elif node['athlete']:
+        name, club = _athlete_label(node['athlete'])
+        page.text(layout.x_leaf + 1, y - 0.7, name, size, max_width_mm=LEAF_WIDTH_MM * 0.6)
+        page.text(layout.x_leaf + LEAF_WIDTH_MM - 1, y - 0.7, club, size * 0.8, fill=90, anchor='rs',
+                  max_width_mm=LEAF_WIDTH_MM * 0.38)
+    else:
+        page.text(layout.x_leaf + 1, y - 0.7, "BYE", size, fill=150)
+    return y
+
+
+def _draw_tree(page, layout, node, depth, winner_leaves):
+    """Draws node and its subtree down to depth 0 (the leaves); returns the y of node's line."""
+    if depth == 0:
+        return _draw_leaf(page, layout, node, winner_leaves)
+    y1 = _draw_tree(page, layout, node['children'][0], depth - 1, winner_leaves)
+    y2 = _draw_tree(page, layout, node['children'][1], depth - 1, winner_leaves)
+    x = layout.x_of(depth)
+    page.vline(x, y1, y2)
+    y = (y1 + y2) / 2
+    page.hline(x, x + layout.col_w, y)
+    size = min(7, layout.line_mm)
+    if node['match'] is None and node['athlete']:
+        page.text(x + 1, y - 0.7, _athlete_label(node['athlete'])[0], size, max_width_mm=layout.col_w - 2)
+    elif node['match'] is not None:
+        page.text(x - 0.8, (y1 + y2) / 2 - 0.7, str(node['match']), size * 0.8, fill=110, anchor='rs')
+    return y
+
+
+def _repechage_height(rounds):
+    return 14 + max(rounds, 1) * REPECHAGE_LINE_MM
+
+
+def _draw_repechage(page, top, rounds):
+    """One ladder per half: the losers to the finalist, first round at the top, ending in a bronze line."""
+    page.text(MARGIN_MM, top + 4, "Repechage", 10)
+    half_w = (PAGE_SIZE_MM[0] - 2 * MARGIN_MM) / 2
+    entrant_w = 40.0
+    step = min(12.0, (half_w - entrant_w - 6) / max(1, rounds - 1))
+    for n, half in enumerate("AB"):
+        left = MARGIN_MM + n * half_w
+        page.text(left, top + 10, f"Half {half} (losers to finalist {half})", 7, fill=90)
+        y_prev = None
+        for i in range(rounds):
+            y = top + 10 + (i + 1) * REPECHAGE_LINE_MM
+            label = "Semi-final" if i == rounds - 1 else f"Round {i + 1}"
+            end = left + entrant_w + max(0, i - 1) * step
+            page.hline(left, end, y)
+            page.text(left + 1, y - 0.7, label, 6, fill=130)
+            if y_prev is not None:
+                page.vline(end, y_prev, y)
+                y_prev = (y_prev + y) / 2
+                page.hline(end, end + step, y_prev)
+            else:
+                y_prev = y
+        x_end = left + entrant_w + max(0, rounds - 1) * step
+        page.text(x_end + 1, y_prev + 1, "Bronze", 7, anchor='lm')
+
+
+def _draw_medals(page, top):
+    width = (PAGE_SIZE_MM[0] - 2 * MARGIN_MM) / 4
+    for n, label in enumerate(("1st", "2nd", "3rd", "3rd")):
+        x = MARGIN_MM + n * width
+        page.rect(x + 1, top, width - 2, 9)
+        page.text(x + 2, top + 4, label, 7, fill=90)
+
+
+def _kumite_pages(draw, event):
+    rounds = draw['rounds']
+    levels = len(rounds) - 1
+    footer = _repechage_height(draw['repechage_rounds']) + 12
+    bottom = PAGE_SIZE_MM[1] - MARGIN_MM
+    top = MARGIN_MM + HEADER_MM
+
+    if levels == 0 or draw['size'] <= PAGE_SLOTS:
+        parts, final_depth, final_leaves = [], levels, rounds[0]
+    else:
+        part_levels = PAGE_SLOTS.bit_length() - 1
+        parts = rounds[part_levels]  # one page per subtree of PAGE_SLOTS positions
+        final_depth, final_leaves = levels - part_levels, parts
+
+    for n, root in enumerate(parts, start=1):
+        page = _Page()
+        _header(page, draw, event, f"Part {n} of {len(parts)}")
+        layout = _TreeLayout(top, min(MAX_LINE_MM, (bottom - top) / PAGE_SLOTS), PAGE_SLOTS.bit_length() - 1)
+        _draw_tree(page, layout, root, PAGE_SLOTS.bit_length() - 1, winner_leaves=False)
+        yield page
+
+    page = _Page()
+    _header(page, draw, event, "Final rounds" if parts else None)
+    line_mm = min(MAX_LINE_MM, (bottom - footer - top) / len(final_leaves))
+    layout = _TreeLayout(top, line_mm, final_depth)
+    y = _draw_tree(page, layout, rounds[-1][0], final_depth, winner_leaves=bool(parts))
+    if final_depth:
+        page.text(layout.x_of(final_depth) + layout.col_w, y - 0.7, "1st", 7, fill=90, anchor='rs')
+    footer_top = top + len(final_leaves) * line_mm + 4
+    if draw['repechage_rounds']:
+        _draw_repechage(page, footer_top, draw['repechage_rounds'])
+        footer_top += _repechage_height(draw['repechage_rounds'])
+    _draw_medals(page, footer_top)
+    yield page
+
+
+# --- Kata ---
+
+def _kata_pages(draw, event):
+    bottom = PAGE_SIZE_MM[1] - MARGIN_MM
+    page, y = None, 0.0
+    for n, (pool, advance) in enumerate(zip(draw['pools'], draw['advance'])):
+        needed = (len(pool) + 2) * KATA_ROW_MM + 6
+        if page is None or y + needed > bottom:
+            if page is not None:
+                yield page
+            page = _Page()
+            _header(page, draw, event)
+            y = MARGIN_MM + HEADER_MM
+        title = f"Pool {chr(ord('A') + n)}" if len(draw['pools']) > 1 else "Pool"
+        if advance:
+            title += f" — best {advance} advance"
+        page.text(MARGIN_MM, y + 5, title, 10)
+        y += KATA_ROW_MM
+        rows = [[heading for heading, _ in KATA_COLUMNS]]
+        rows += [[str(i), a['name'], a['club'], str(a.get('seed') or ""), "", ""] for i, a in enumerate(pool, start=1)]
+        for r, cells in enumerate(rows):
+            x = MARGIN_MM
+            for (heading, width), cell in zip(KATA_COLUMNS, cells):
+                page.rect(x, y, width, KATA_ROW_MM)
+                page.text(x + 1.5, y + KATA_ROW_MM - 2, cell, 8, fill=90 if r == 0 else 0, max_width_mm=width - 3)
+                x += width
+            y += KATA_ROW_MM
+        y += 6
+    if page is not None:
+        yield page
+
+
+def draw_pages(draw, event=None):
+    """The pages (Pillow images) of one draw."""
+    pages = _kata_pages(draw, event or {}) if draw['discipline'] == 'Kata' else _kumite_pages(draw, event or {})
+    for page in pages:
+        yield page.image
+
+
+def _render_draw(draw, event):
+    """Runs in a worker process: the pages of one draw as (size, zlib-compressed pixels)."""
+    return [(image.size, zlib.compress(image.tobytes(), 1)) for image in draw_pages(draw, event)]
+
+
+def _iter_rendered(draws, event, workers):
+    """Rendered pages per draw, in draw order; workers <= 1 renders in this process."""
+    render = partial(_render_draw, event=event)
+    if workers <= 1:
+        for draw in draws:
+            yield render(draw)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(render, draws, chunksize=4)
+
+
+def write_draw_sheets(draws, output, event_name="", event_date=None, draw_seed=None, workers=None,
+                      progress_callback=None):
+    """
+    Writes the draw sheets of all draws into one PDF.
+
+    output: a file path or a writable binary file object (e.g. io.BytesIO for Streamlit).
+    workers: rendering processes (default: one per CPU).
+    progress_callback(done, total) is called after every category.
+    Returns {'categories': int, 'pages': int}.
+    """
+    draws = list(draws)
+    event = {'name': event_name, 'date': event_date and str(event_date), 'draw_seed': draw_seed}
+    workers = max(1, min(workers or os.cpu_count() or 1, len(draws) or 1))
+    width_pt, height_pt = (v * _PT_PER_MM for v in PAGE_SIZE_MM)
+    content = f"q {width_pt:.2f} 0 0 {height_pt:.2f} 0 0 cm /Im0 Do Q\n".encode('ascii')
+    summary = {'categories': 0, 'pages': 0}
+
+    fh = open(output, 'wb') if isinstance(output, (str, os.PathLike)) else output
+    try:
+        pdf = PdfStream(fh)
+        for done, pages in enumerate(_iter_rendered(draws, event, workers), start=1):
+            for size, data in pages:
+                pdf.add_page(width_pt, height_pt, content, {'Im0': pdf.add_flate_gray(size, data)})
+                summary['pages'] += 1
+            summary['categories'] += 1
+            if progress_callback:
+                progress_callback(done, len(draws))
+        if not summary['pages']:
+            raise ValueError("No draws to print.")
+        pdf.close()
+    finally:
+        if fh is not output:
+            fh.close()
+    return summary
@@ -1,15 +1,20 @@
 import os
 import io
 import json
-from docxtpl import DocxTemplate, InlineImage
+from docxtpl import InlineImage
 from docx.shared import Mm
 from PIL import Image
 import qrcode
 
+from photos import photo_variant
+from render_cache import RenderCache
+from template_cache import TemplateCache
+
 # --- Path Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-ASSETS_DIR = os.path.join(BASE_DIR, "assets")
-OUTPUT_DIR = os.path.join(BASE_DIR, "output")
+# PKF_ASSETS_DIR lets benchmarks and worker processes point at another template folder.
+ASSETS_DIR = os.environ.get("PKF_ASSETS_DIR", os.path.join(BASE_DIR, "assets"))
+OUTPUT_DIR = os.environ.get("PKF_CARDS_OUTPUT_DIR", os.path.join(BASE_DIR, "output"))
 
 # Ensure the temporary output directory exists
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -43,13 +48,19 @@ def get_template_path(role):
         raise FileNotFoundError(f"Template file not found: {path}")
     return path
 
-def generate_member_card(member_data):
-    """Generates a member ID card using a Word template and returns the path to the temporary file."""
-    role = member_data.get('role', 'Player')
-    template_path = get_template_path(role)
-    doc = DocxTemplate(template_path)
+# Parsed templates, keyed by role and re-validated against the file's mtime.
+_templates = TemplateCache(get_template_path)
 
-    specific_data = json.loads(member_data.get('specific_data', '{}'))
+# Bump when the rendering code below changes, so cached cards are not reused.
+RENDER_VERSION = 1
+
+# Rendered cards, keyed by their context, template version and photo bytes.
+render_cache = RenderCache(OUTPUT_DIR)
+
+def card_context(member_data):
+    """Returns (role, context, photo_path): the template values as plain data, before images are attached."""
+    role = member_data.get('role', 'Player')
+    specific_data = json.loads(member_data.get('specific_data') or '{}')
 
     # --- General Information ---
     context = {
@@ -60,14 +71,11 @@ def generate_member_card(member_data):
         'club': member_data.get('club_name', ''),
     }
 
-    # --- Photo ---
-    photo_path = member_data.get('photo_path')
-    if photo_path and os.path.exists(photo_path):
-        context['photo'] = InlineImage(doc, photo_path, width=Mm(19), height=Mm(24))
-    else:
+    # --- Photo (the pre-sized card variant when it exists) ---
+    photo_path = photo_variant(member_data.get('photo_path'), 'card')
+    if not photo_path:
         placeholder_path = os.path.join(ASSETS_DIR, 'placeholder.jpg')
-        if os.path.exists(placeholder_path):
-            context['photo'] = InlineImage(doc, placeholder_path, width=Mm(19), height=Mm(24))
+        photo_path = placeholder_path if os.path.exists(placeholder_path) else None
 
     # --- Player Specific ---
     if role == 'Player':
@@ -99,13 +107,43 @@ def generate_member_card(member_data):
     if role == 'Admin':
         context['admin_title'] = member_data.get('admin_title', specific_data.get('admin_title', ''))
 
-    # Render the document
-    doc.render(context)
+    return role, context, photo_path
 
-    # Save to a temporary file
-    safe_pkf_id = "".join(c for c in context['pkf_id'] if c.isalnum()).rstrip()
-    temp_filename = f"card_{safe_pkf_id}_{role.lower()}.docx"
-    temp_path = os.path.join(OUTPUT_DIR, temp_filename)
-    doc.save(temp_path)
+def _render_docx(role, context, photo_path):
+    doc = _templates.get(role)
+    context = dict(context)
+    if photo_path:
+        context['photo'] = InlineImage(doc, photo_path, width=Mm(19), height=Mm(24))
 
+    # Render the document
+    doc.render(context, jinja_env=_templates.jinja_env)
+
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def _card_cache_key(member_data):
+    role, context, photo_path = card_context(member_data)
+    key = render_cache.make_key(context, _templates.version(role), photo_path, renderer='card', version=RENDER_VERSION)
+    return key, role, context, photo_path
+
+def render_member_card(member_data):
+    """Renders a member ID card in memory and returns (file_name, docx_bytes); unchanged cards come from the render cache."""
+    key, role, context, photo_path = _card_cache_key(member_data)
+    content = render_cache.get(key)
+    if content is None:
+        content = _render_docx(role, context, photo_path)
+        render_cache.put(key, content)
+    return card_file_name(member_data), content
+
+def card_file_name(member_data):
+    safe_pkf_id = "".join(c for c in str(member_data.get('pkf_id', '')) if c.isalnum()).rstrip()
+    return f"card_{safe_pkf_id}_{(member_data.get('role') or 'Player').lower()}.docx"
+
+def generate_member_card(member_data):
+    """Generates a member ID card using a Word template and returns the path to the temporary file."""
+    key, role, context, photo_path = _card_cache_key(member_data)
+    temp_path = os.path.join(OUTPUT_DIR, card_file_name(member_data))
+    if not render_cache.link(key, temp_path):
+        render_cache.put(key, _render_docx(role, context, photo_path), link_to=temp_path)
     return temp_path
@@ -0,0 +1,219 @@
+"""
+Native PNG/PDF card renderer.
+
+Composes a CR80 ID card (85.6 x 54 mm) directly with Pillow from member_data:
+photo, QR code, bilingual text in the bundled font_bold.ttf and the fields of
+the member's role, placed from the per-role definitions in ROLE_LAYOUTS. No
+Word template is involved, so a preview takes milliseconds and the PNG/PDF can
+be printed as is.
+
+Arabic is shaped by libraqm when Pillow was built with it, otherwise by
+arabic_text.display_arabic (presentation forms + visual reordering).
+"""
+import io
+import os
+from functools import lru_cache
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps, features
+
+from arabic_text import display_arabic, is_rtl_text
+from card_generator import BASE_DIR, card_context, card_file_name
+from qr_codes import member_payload, qr_image
+
+FONT_PATH = os.path.join(BASE_DIR, "font_bold.ttf")
+
+CARD_SIZE_MM = (85.6, 54.0)
+CARD_DPI = 300
+PREVIEW_DPI = 120
+CARD_FORMATS = ('png', 'pdf')
+
+FEDERATION_NAME = ("Palestine Karate Federation", "الاتحاد الفلسطيني للكاراتيه")
+
+# Shared geometry, in millimetres from the card's top-left corner.
+HEADER_HEIGHT = 10.5
+PHOTO_BOX = (3.5, 13.5, 19.0, 24.0)   # x, y, width, height
+QR_BOX = (68.5, 36.0, 14.5)           # x, y, size
+NAME_AR_POS = (82.5, 12.5)            # right-aligned
+NAME_EN_POS = (25.5, 18.0)
+FIELDS_ORIGIN = (25.5, 23.5)
+FIELD_ROW_HEIGHT = 4.3
+FIELD_VALUE_OFFSET = 15.5
+FIELD_VALUE_WIDTH = 26.0
+PKF_ID_POS = (3.5, 39.5)
+
+# Per-role layouts: title (en, ar), accent colour and the (context key, label) rows.
+ROLE_LAYOUTS = {
+    'Player': {
+        'title': ("PLAYER", "لاعب"),
+        'color': "#007A3D",
+        'fields': [
+            ('dob', "Birth"), ('club', "Club"), ('belt', "Belt"),
+            ('weight', "Weight"), ('rank_loc', "Nat. Rank"), ('rank_intl', "Intl. Rank"),
+        ],
+    },
+    'Coach': {
+        'title': ("COACH", "مدرب"),
+        'color': "#1F4E79",
+        'fields': [
+            ('dob', "Birth"), ('club', "Club"), ('coach_nat', "National"),
+            ('coach_intl', "International"), ('coach_asia', "Asian"),
+        ],
+    },
+    'Referee': {
+        'title': ("REFEREE", "حكم"),
+        'color': "#222222",
+        'fields': [
+            ('dob', "Birth"), ('club', "Club"), ('ref_kumite_rb', "Kumite"),
+            ('ref_kata_ja', "Kata"), ('license_date', "License"),
+        ],
+    },
+    'Admin': {
+        'title': ("ADMINISTRATOR", "إداري"),
+        'color': "#CE1126",
+        'fields': [('dob', "Birth"), ('club', "Club"), ('admin_title', "Title")],
+    },
+}
+
+_RAQM = features.check('raqm')
+
+
+@lru_cache(maxsize=64)
+def _font(size_px):
+    layout = ImageFont.Layout.RAQM if _RAQM else ImageFont.Layout.BASIC
+    return ImageFont.truetype(FONT_PATH, size_px, layout_engine=layout)
+
+
+class _Canvas:
+    """Millimetre-based drawing helpers over one card image."""
+
+    def __init__(self, dpi):
+        self.dpi = dpi
+        self.image = Image.new('RGB', (self.px(CARD_SIZE_MM[0]), self.px(CARD_SIZE_MM[1])), 'white')
+        self.draw = ImageDraw.Draw(self.image)
+
+    def px(self, mm):
+        return int(round(mm * self.dpi / 25.4))
+
+    def text(self, x_mm, y_mm, text, size_pt, fill='black', anchor='la', max_width_mm=None):
+        """Draws one line; the font shrinks (down to 60%) until the text fits max_width_mm."""
+        text = str(text) if text is not None else ""
+        if not text:
+            return
+        kwargs = {}
+        if _RAQM:
+            if is_rtl_text(text):
+                kwargs['direction'] = 'rtl'
+        else:
+            text = display_arabic(text)
+        size = max(1, int(size_pt * self.dpi / 72))
+        font = _font(size)
+        if max_width_mm:
+            limit, floor = self.px(max_width_mm), int(size * 0.6)
+            while size > floor and self.draw.textlength(text, font=font, **kwargs) > limit:
+                size -= 1
+                font = _font(size)
+        self.draw.text((self.px(x_mm), self.px(y_mm)), text, font=font, fill=fill, anchor=anchor, **kwargs)
+
+    def rect(self, x_mm, y_mm, w_mm, h_mm, fill=None, outline=None):
+        self.draw.rectangle([self.px(x_mm), self.px(y_mm), self.px(x_mm + w_mm) - 1, self.px(y_mm + h_mm) - 1],
+                            fill=fill, outline=outline, width=max(1, self.dpi // 150))
+
+    def paste(self, image, x_mm, y_mm):
+        self.image.paste(image, (self.px(x_mm), self.px(y_mm)))
+
+
+def _photo_image(photo_path, size_px):
+    with Image.open(photo_path) as photo:
+        photo = ImageOps.exif_transpose(photo).convert('RGB')
+        return ImageOps.fit(photo, size_px, Image.LANCZOS)
+
+
+def render_card(member_data, dpi=CARD_DPI):
+    """Renders the member's card and returns it as a PIL RGB image at `dpi`."""
+    role, context, photo_path = card_context(member_data)
+    layout = ROLE_LAYOUTS.get(role)
+    if layout is None:
+        raise ValueError(f"No card layout defined for role: {role}")
+    canvas = _Canvas(dpi)
+    width_mm = CARD_SIZE_MM[0]
+
+    # --- Header ---
+    canvas.rect(0, 0, width_mm, HEADER_HEIGHT, fill=layout['color'])
+    canvas.text(3.5, 2.0, FEDERATION_NAME[0], 7, fill='white', max_width_mm=40)
+    canvas.text(width_mm - 3.5, 2.0, FEDERATION_NAME[1], 7, fill='white', anchor='ra', max_width_mm=38)
+    canvas.text(3.5, 6.3, layout['title'][0], 6, fill='white')
+    canvas.text(width_mm - 3.5, 6.3, layout['title'][1], 6, fill='white', anchor='ra')
+
+    # --- Photo ---
+    x, y, w, h = PHOTO_BOX
+    if photo_path:
+        canvas.paste(_photo_image(photo_path, (canvas.px(w), canvas.px(h))), x, y)
+    else:
+        canvas.rect(x, y, w, h, fill="#D3D3D3")
+        canvas.text(x + w / 2, y + h / 2, "PHOTO", 6, fill="#666666", anchor='mm')
+    canvas.rect(x, y, w, h, outline=layout['color'])
+    canvas.text(x, PKF_ID_POS[1], context.get('pkf_id', ''), 7, fill=layout['color'], max_width_mm=w + 2)
+
+    # --- Names ---
+    canvas.text(*NAME_AR_POS, context.get('name_ar', ''), 9, anchor='ra', max_width_mm=width_mm - NAME_EN_POS[0] - 3.5)
+    canvas.text(*NAME_EN_POS, context.get('name_en', ''), 8, max_width_mm=width_mm - NAME_EN_POS[0] - 3.5)
+
+    # --- Role fields ---
+    fx, fy = FIELDS_ORIGIN
+    for row, (key, label) in enumerate(layout['fields']):
+        baseline = fy + row * FIELD_ROW_HEIGHT + 2.5
+        canvas.text(fx, baseline, label, 5.5, fill="#555555", anchor='ls')
+        canvas.text(fx + FIELD_VALUE_OFFSET, baseline, context.get(key, ''), 6.5, anchor='ls', max_width_mm=FIELD_VALUE_WIDTH)
+
+    # --- QR Code ---
+    qx, qy, qsize = QR_BOX
+    canvas.paste(qr_image(member_payload(member_data), canvas.px(qsize)), qx, qy)
+    return canvas.image
+
+
+BACK_TEXT = (
+    "This card is the property of the Palestine Karate Federation. If found, please return it to the federation.",
+    "هذه البطاقة ملك للاتحاد الفلسطيني للكاراتيه، يرجى إعادتها إلى الاتحاد في حال العثور عليها.",
+)
+
+
+def render_card_back(member_data, dpi=CARD_DPI):
+    """Renders the reverse side printed on duplex sheets: federation name, validity and return notice."""
+    role = member_data.get('role', 'Player')
+    layout = ROLE_LAYOUTS.get(role)
+    if layout is None:
+        raise ValueError(f"No card layout defined for role: {role}")
+    canvas = _Canvas(dpi)
+    width_mm, height_mm = CARD_SIZE_MM
+    centre = width_mm / 2
+
+    canvas.rect(0, 0, width_mm, HEADER_HEIGHT, fill=layout['color'])
+    canvas.text(centre, HEADER_HEIGHT / 2, FEDERATION_NAME[1], 8, fill='white', anchor='mm', max_width_mm=width_mm - 7)
+    canvas.text(centre, 17.0, FEDERATION_NAME[0], 8, fill=layout['color'], anchor='mm', max_width_mm=width_mm - 7)
+    canvas.text(centre, 23.0, f"{layout['title'][0]} / {layout['title'][1]}", 7, anchor='mm')
+    canvas.text(centre, 30.0, f"ID: {member_data.get('pkf_id', '')}", 7, anchor='mm')
+    if member_data.get('expiry_date'):
+        canvas.text(centre, 35.0, f"Valid until: {member_data['expiry_date']}", 7, anchor='mm')
+    canvas.text(centre, 42.5, BACK_TEXT[0], 5, fill="#555555", anchor='mm', max_width_mm=width_mm - 7)
+    canvas.text(centre, 47.0, BACK_TEXT[1], 5, fill="#555555", anchor='mm', max_width_mm=width_mm - 7)
+    canvas.rect(0, height_mm - 2.5, width_mm, 2.5, fill=layout['color'])
+    return canvas.image
+
+
+def render_card_preview(member_data):
+    """Low-resolution render of the member's real card for on-screen previews."""
+    return render_card(member_data, dpi=PREVIEW_DPI)
+
+
+def render_card_file(member_data, card_format='png', dpi=CARD_DPI):
+    """Renders a print-ready card and returns (file_name, bytes); card_format is 'png' or 'pdf'."""
+    if card_format not in CARD_FORMATS:
+        raise ValueError(f"Unsupported card format: {card_format}")
+    image = render_card(member_data, dpi)
+    buffer = io.BytesIO()
+    if card_format == 'png':
+        image.save(buffer, format='PNG', dpi=(dpi, dpi))
+    else:
+        image.save(buffer, format='PDF', resolution=dpi, quality=95)
+    file_name = os.path.splitext(card_file_name(member_data))[0] + '.' + card_format
+    return file_name, buffer.getvalue()
@@ -0,0 +1,240 @@
+import threading
+import time
+import psycopg2
+from psycopg2 import extensions
+
+import config
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no pooled connection becomes free within the acquire timeout."""
+
+
+class PooledConnection:
+    """
+    A thin proxy around a borrowed psycopg2 connection.
+
+    It behaves like the raw connection (cursor(), commit(), rollback(), ...),
+    except that close() hands the connection back to the pool instead of
+    closing the socket. This keeps the existing `conn.close()` pattern in
+    database.py working unchanged.
+    """
+    def __init__(self, pool, raw_conn):
+        self._pool = pool
+        self._raw = raw_conn
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get('_raw')
+        if raw is None:
+            raise psycopg2.InterfaceError("connection already returned to the pool")
+        return getattr(raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @property
+    def raw(self):
+        return self._raw
+
+    def close(self):
+        """Returns the connection to the pool. Safe to call more than once."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool.release(raw)
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    - Keeps up to `max_size` connections; callers block (up to `acquire_timeout`)
+      when all of them are in use.
+    - Connections idle for longer than `health_check_interval` are pinged with
+      SELECT 1 before being handed out, and replaced if the ping fails.
+    - Connections idle for longer than `max_idle` are closed, down to `min_size`.
+    - Opening a new connection is retried `connect_retries` times with backoff.
+    - On release, any open or failed transaction is rolled back; broken
+      connections are discarded instead of being returned to the pool.
+    """
+    def __init__(self, dsn, min_size=1, max_size=8, max_idle=300.0,
+                 health_check_interval=30.0, acquire_timeout=10.0, connect_retries=2):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.dsn = dsn
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_retries = connect_retries
+
+        self._cond = threading.Condition()
+        self._idle = []      # [(raw_conn, last_used_monotonic)], most recently used last
+        self._in_use = 0
+        self._closed = False
+        self._stats = {"created": 0, "reused": 0, "discarded": 0, "health_checks": 0, "waits": 0}
+
+    # --- Public API ---
+    def acquire(self):
+        """Borrows a connection, returning a PooledConnection proxy."""
+        deadline = time.monotonic() + self.acquire_timeout
+        raw, last_used = None, None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                self._evict_idle_locked()
+                if self._idle:
+                    raw, last_used = self._idle.pop()
+                    break
+                if self._in_use < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No database connection available within {self.acquire_timeout}s "
+                                      f"(pool size {self.max_size}).")
+                self._bump("waits")
+                self._cond.wait(remaining)
+            self._in_use += 1
+
+        # Network work happens outside the lock so other threads are not blocked.
+        try:
+            if raw is not None and not self._is_usable(raw, last_used):
+                self._discard(raw)
+                raw = None
+            if raw is None:
+                raw = self._connect()
+            else:
+                self._bump("reused")
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        """Returns a raw connection to the pool (called by PooledConnection.close)."""
+        healthy = not raw.closed
+        if healthy:
+            try:
+                if raw.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    raw.rollback()
+                if raw.autocommit:
+                    raw.autocommit = False
+            except psycopg2.Error:
+                healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            keep = healthy and not self._closed
+            if keep:
+                self._idle.append((raw, time.monotonic()))
+            self._cond.notify()
+        if not keep:
+            self._discard(raw)
+
+    def close_all(self):
+        """Closes every idle connection and refuses further acquisitions."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        """Returns a snapshot of pool counters, useful for diagnostics and benchmarks."""
+        with self._cond:
+            return dict(self._stats, idle=len(self._idle), in_use=self._in_use, max_size=self.max_size)
+
+    # --- Internals ---
+    def _bump(self, counter):
+        # The condition wraps an RLock, so this is safe from inside locked sections too.
+        with self._cond:
+            self._stats[counter] += 1
+
+    def _connect(self):
+        last_error = None
+        for attempt in range(self.connect_retries + 1):
+            try:
+                raw = psycopg2.connect(self.dsn)
+                self._bump("created")
+                return raw
+            except psycopg2.OperationalError as e:
+                last_error = e
+                if attempt < self.connect_retries:
+                    time.sleep(min(0.25 * (2 ** attempt), 2.0))
+        raise last_error
+
+    def _is_usable(self, raw, last_used):
+        if raw.closed:
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        self._bump("health_checks")
+        try:
+            with raw.cursor() as cur:
+                cur.execute("SELECT 1")
+            raw.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _evict_idle_locked(self):
+        """Closes connections idle longer than max_idle, keeping at least min_size open."""
+        if not self._idle:
+            return
+        now = time.monotonic()
+        # The oldest connections sit at the front of the list.
+        while self._idle and len(self._idle) + self._in_use > self.min_size:
+            raw, last_used = self._idle[0]
+            if now - last_used <= self.max_idle:
+                break
+            self._idle.pop(0)
+            self._discard(raw)
+
+    def _discard(self, raw):
+        self._bump("discarded")
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+# --- Shared pool instance ---
+# The module is imported once per process, so this pool is shared by every
+# Streamlit rerun (app.py is re-executed, database.py is not re-imported) and
+# by the Tk background worker threads in ui_alerts / ui_reports.
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the process-wide connection pool, creating it on first use."""
+    global _shared_pool
+    if _shared_pool is None:
+        with _shared_pool_lock:
+            if _shared_pool is None:
+                _shared_pool = ConnectionPool(
+                    config.DB_URI,
+                    min_size=config.DB_POOL_MIN_SIZE,
+                    max_size=config.DB_POOL_MAX_SIZE,
+                    max_idle=config.DB_POOL_MAX_IDLE_SECONDS,
+                    health_check_interval=config.DB_POOL_HEALTH_CHECK_SECONDS,
+                    acquire_timeout=config.DB_POOL_ACQUIRE_TIMEOUT,
+                    connect_retries=config.DB_CONNECT_RETRIES,
+                )
+    return _shared_pool
+
+
+def close_pool():
+    """Closes the shared pool (e.g. on application shutdown)."""
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is not None:
+            _shared_pool.close_all()
+            _shared_pool = None
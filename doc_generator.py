@@ -1,19 +1,21 @@
 import os
 import json
+import re
+from functools import lru_cache
+from xml.sax.saxutils import escape
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.oxml.ns import nsdecls, qn
+from docx.oxml import OxmlElement, parse_xml
+
+from photos import photo_variant
+
+_ARABIC_RE = re.compile('[\u0600-\u06FF]')
 
 def is_arabic(text):
     """Checks if a string contains any Arabic characters."""
-    if not isinstance(text, str):
-        return False
-    for char in text:
-        if '\u0600' <= char <= '\u06FF':
-            return True
-    return False
+    return isinstance(text, str) and _ARABIC_RE.search(text) is not None
 
 def set_rtl(paragraph):
     """Sets paragraph direction to Right-to-Left."""
@@ -36,131 +38,188 @@ def set_cell_direction(cell, direction="rtl"):
         textDirection.set(qn('w:val'), "lrTb")
     tcPr.append(textDirection)
 
-def generate_bilingual_profile_doc(data, labels_en, labels_ar, attachments_meta_en, attachments_meta_ar, specific_labels_en, specific_labels_ar, doc_type='member'):
-    """Generates a bilingual Word document for a member or club profile."""
+def new_profile_document():
+    """A Document with the shared profile styles (Arial 11 for Latin and Arabic text) set up once."""
+    document = Document()
+    style = document.styles['Normal']
+    style.font.name = 'Arial'
+    style.font.size = Pt(11)
+    style._element.rPr.rFonts.set(qn('w:eastAsia'), 'Arial')
+    style._element.rPr.rFonts.set(qn('w:cs'), 'Arial')
+    return document
+
+PROFILE_TABLE_WIDTHS = (Inches(2.1), Inches(2.3), Inches(2.1))
+
+# --- Document assembly ---
+# Profile content is emitted as OOXML fragments instead of python-docx add_row().cells /
+# add_paragraph() calls: paragraph properties are fixed strings, label cells are built
+# once per label, style names are resolved once, and each fragment is inserted in
+# front of the body's final sectPr directly. Every fragment declares the w: namespace
+# on its root, so lxml does not have to reconcile namespaces when it is moved.
+_W_NS = nsdecls("w")
+_TWIPS = [int(width.twips) for width in PROFILE_TABLE_WIDTHS]
+_PPR_CENTER = '<w:pPr><w:jc w:val="center"/></w:pPr>'
+_PPR_RTL = '<w:pPr><w:bidi w:val="1"/><w:jc w:val="right"/></w:pPr>'
+_TABLE_START = (
+    f'<w:tbl {_W_NS}><w:tblPr><w:tblStyle w:val="{{style}}"/><w:tblW w:type="auto" w:w="0"/>'
+    '<w:tblLayout w:type="fixed"/>'
+    '<w:tblLook w:val="04A0" w:firstRow="1" w:lastRow="0" w:firstColumn="1" w:lastColumn="0" w:noHBand="0" w:noVBand="1"/>'
+    '</w:tblPr><w:tblGrid>' + "".join(f'<w:gridCol w:w="{w}"/>' for w in _TWIPS) + '</w:tblGrid>'
+)
+# Characters XML 1.0 does not allow; python-docx would refuse them too
+_INVALID_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def _runs_xml(text):
+    """A run for text, with line breaks and tabs as <w:br/> / <w:tab/> like python-docx's paragraph.text."""
+    text = escape(_INVALID_XML_RE.sub('', text))
+    text = text.replace('\t', '</w:t><w:tab/><w:t xml:space="preserve">')
+    text = text.replace('\r\n', '\n').replace('\r', '\n').replace('\n', '</w:t><w:br/><w:t xml:space="preserve">')
+    return f'<w:r><w:t xml:space="preserve">{text}</w:t></w:r>'
+
+def _cell_xml(column, text, ppr=''):
+    return f'<w:tc><w:tcPr><w:tcW w:w="{_TWIPS[column]}" w:type="dxa"/></w:tcPr><w:p>{ppr}{_runs_xml(text)}</w:p></w:tc>'
+
+@lru_cache(maxsize=1024)
+def _label_cells(label_en, label_ar):
+    """The English and Arabic label cells of a row; labels repeat across profiles, so they are built once."""
+    return _cell_xml(0, label_en), _cell_xml(2, label_ar, _PPR_RTL)
+
+_HEADER_ROW = '<w:tr>' + _cell_xml(0, 'Field') + _cell_xml(1, 'Details - التفاصيل', _PPR_CENTER) + _cell_xml(2, 'الحقل', _PPR_RTL) + '</w:tr>'
+
+_style_ids = {}
+
+def _style_id(document, name):
+    """Style id for a style name; python-docx resolves names by scanning every style, so each is looked up once."""
+    if name not in _style_ids:
+        _style_ids[name] = document.styles[name].style_id
+    return _style_ids[name]
+
+def _field_table_xml(document, rows):
+    """
+    A 3-column Field / Details / الحقل table with its header row.
+    rows: iterable of (label_en, value, label_ar); Arabic values are right-aligned RTL.
+    """
+    parts = [_TABLE_START.format(style=_style_id(document, 'Table Grid')), _HEADER_ROW]
+    for label_en, value, label_ar in rows:
+        value = str(value)
+        en_cell, ar_cell = _label_cells(label_en, label_ar)
+        parts.append(f'<w:tr>{en_cell}{_cell_xml(1, value, _PPR_RTL if is_arabic(value) else "")}{ar_cell}</w:tr>')
+    parts.append('</w:tbl>')
+    return "".join(parts)
+
+def _paragraph_xml(document, text='', style=None, align=None, bold=False):
+    """A paragraph with an optional style (by name), alignment ('center'/'right') and bold text."""
+    ppr = ''
+    if style or align:
+        ppr = '<w:pPr>' + (f'<w:pStyle w:val="{_style_id(document, style)}"/>' if style else '') + \
+              (f'<w:jc w:val="{align}"/>' if align else '') + '</w:pPr>'
+    run = _runs_xml(text) if text else ''
+    if bold and run:
+        run = run.replace('<w:r>', '<w:r><w:rPr><w:b/></w:rPr>', 1)
+    return f'<w:p {_W_NS}>{ppr}{run}</w:p>'
+
+_PAGE_BREAK = f'<w:p {_W_NS}><w:r><w:br w:type="page"/></w:r></w:p>'
+
+def _append_body_xml(document, parts):
+    """
+    Appends the fragments to the document body. python-docx searches the whole body
+    for its sectPr on every insert; here it is looked up once for the batch.
+    """
+    body = document.element.body
     try:
-        document = Document()
-        style = document.styles['Normal']
-        style.font.name = 'Arial'
-        style.font.size = Pt(11)
-        style._element.rPr.rFonts.set(qn('w:eastAsia'), 'Arial')
-        style._element.rPr.rFonts.set(qn('w:cs'), 'Arial')
-
-        title_en = "Member Profile" if doc_type == 'member' else "Club Profile"
-        title_ar = "ملف عضو" if doc_type == 'member' else "ملف هيئة"
-        p = document.add_paragraph()
-        p.add_run(f'{title_en} - {title_ar}').bold = True
-        p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        document.add_paragraph()
-
-        if doc_type == 'member' and data.get('photo_path') and os.path.exists(data['photo_path']):
-            try:
-                document.add_picture(data['photo_path'], width=Inches(1.5))
-                document.paragraphs[-1].alignment = WD_ALIGN_PARAGRAPH.CENTER
-            except Exception as e:
-                print(f"Could not add picture to Word doc: {e}")
-
-        # --- Main Information Table ---
-        document.add_heading('Basic Information - المعلومات الأساسية', level=1)
-        table = document.add_table(rows=1, cols=3)
-        table.style = 'Table Grid'
-        table.autofit = False
-        widths = (Inches(2.1), Inches(2.3), Inches(2.1))
-        for i, width in enumerate(widths):
-            table.columns[i].width = width
-
-        # Header Row
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Field'
-        hdr_cells[1].text = 'Details - التفاصيل'
-        hdr_cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        hdr_p_ar_field = hdr_cells[2].paragraphs[0]
-        hdr_p_ar_field.text = 'الحقل'
-        hdr_p_ar_field.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        set_rtl(hdr_p_ar_field)
-
-        for key, label_en in labels_en.items():
-            label_ar = labels_ar.get(key, label_en)
-            value = data.get(key, 'N/A')
-            if not value: value = 'N/A'
-
-            row_cells = table.add_row().cells
-            # Column 1: English Field
-            row_cells[0].text = label_en
-            
-            # Column 2: Details (Single language based on input)
-            p_details = row_cells[1].paragraphs[0]
-            p_details.text = str(value)
-            if is_arabic(value):
-                set_rtl(p_details)
-                p_details.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            
-            # Column 3: Arabic Field
-            p_ar_label = row_cells[2].paragraphs[0]
-            p_ar_label.text = label_ar
-            p_ar_label.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            set_rtl(p_ar_label)
-
-        # --- Specific Data ---
-        specific_data_key = 'specific_data' if doc_type == 'member' else 'attachments_data'
-        specific_data = data.get(specific_data_key, '{}')
-        if isinstance(specific_data, str):
+        last = body[-1]  # lxml's len() walks every child; a negative index only walks back from the end
+    except IndexError:
+        last = None
+    sect_pr = last if last is not None and last.tag == qn('w:sectPr') else None
+    for part in parts:
+        element = parse_xml(part)
+        if sect_pr is not None:
+            sect_pr.addprevious(element)
+        else:
+            body.append(element)
+    parts.clear()
+
+def profile_heading(data, doc_type='member'):
+    """Name and ID line used as the profile title in profile books and their table of contents."""
+    if doc_type == 'member':
+        name = data.get('full_name') or data.get('full_name_ar') or ''
+        if data.get('full_name') and data.get('full_name_ar'):
+            name = f"{data['full_name']} - {data['full_name_ar']}"
+        return f"{name} ({data.get('pkf_id') or 'N/A'})"
+    return f"{data.get('name') or ''} ({data.get('club_membership_id') or 'N/A'})"
+
+def add_profile(document, data, labels_en, labels_ar, attachments_meta_en, attachments_meta_ar, specific_labels_en, specific_labels_ar, doc_type='member', book=False):
+    """
+    Appends one bilingual member or club profile to document.
+    book=True starts the profile on a new page, titles it with a level-1 heading
+    (name and ID, picked up by the table of contents) and nests its sections one
+    level below it.
+    """
+    title_en = "Member Profile" if doc_type == 'member' else "Club Profile"
+    title_ar = "ملف عضو" if doc_type == 'member' else "ملف هيئة"
+    parts = []
+    if book:
+        parts.append(_PAGE_BREAK)
+        parts.append(_paragraph_xml(document, profile_heading(data, doc_type), style='Heading 1'))
+        parts.append(_paragraph_xml(document, f'{title_en} - {title_ar}', align='center'))
+        section_heading = 'Heading 2'
+    else:
+        parts.append(_paragraph_xml(document, f'{title_en} - {title_ar}', align='center', bold=True))
+        section_heading = 'Heading 1'
+    parts.append(_paragraph_xml(document))
+
+    photo_path = photo_variant(data.get('photo_path'), 'card') if doc_type == 'member' else None
+    if photo_path:
+        _append_body_xml(document, parts)  # The picture needs python-docx for its image part
+        try:
+            # Like document.add_picture(), without re-reading every paragraph to center the last one
+            photo_paragraph = document.add_paragraph()
+            photo_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            photo_paragraph.add_run().add_picture(photo_path, width=Inches(1.5))
+        except Exception as e:
+            print(f"Could not add picture to Word doc: {e}")
+
+    # --- Main Information Table ---
+    parts.append(_paragraph_xml(document, 'Basic Information - المعلومات الأساسية', style=section_heading))
+    parts.append(_field_table_xml(document, ((label_en, data.get(key) or 'N/A', labels_ar.get(key, label_en))
+                                             for key, label_en in labels_en.items())))
+
+    # --- Specific Data ---
+    specific_data_key = 'specific_data' if doc_type == 'member' else 'attachments_data'
+    specific_data = data.get(specific_data_key) or '{}'
+    if isinstance(specific_data, str):
+        try:
             specific_data = json.loads(specific_data)
+        except json.JSONDecodeError:
+            specific_data = {}
+
+    non_attachment_keys = {k: v for k, v in specific_data.items() if not k.endswith(('_docs', '_certs', '_receipts', '_license'))}
+    if non_attachment_keys:
+        parts.append(_paragraph_xml(document, 'Specialization Details - تفاصيل التخصص', style=section_heading))
+        parts.append(_field_table_xml(document, ((specific_labels_en.get(key, key.replace('_', ' ').title()), value,
+                                                  specific_labels_ar.get(key, key.replace('_', ' ').title()))
+                                                 for key, value in non_attachment_keys.items())))
+
+    # --- Attachments ---
+    attachment_keys = [k for k in specific_data if k.endswith(('_docs', '_certs', '_receipts', '_license'))]
+    if attachment_keys:
+        parts.append(_paragraph_xml(document, 'Attachments - المرفقات', style=section_heading))
+        for key in attachment_keys:
+            file_paths = specific_data.get(key)
+            if file_paths:
+                label_en = attachments_meta_en.get(key, key.replace('_', ' ').title())
+                label_ar = attachments_meta_ar.get(key, label_en)
+                parts.append(_paragraph_xml(document, f"{label_en} - {label_ar}", style='Intense Quote'))
+                for path in file_paths:
+                    parts.append(_paragraph_xml(document, os.path.basename(path), style='List Bullet'))
+    _append_body_xml(document, parts)
 
-        non_attachment_keys = {k: v for k, v in specific_data.items() if not k.endswith(('_docs', '_certs', '_receipts', '_license'))}
-        if non_attachment_keys:
-            document.add_heading('Specialization Details - تفاصيل التخصص', level=1)
-            spec_table = document.add_table(rows=1, cols=3)
-            spec_table.style = 'Table Grid'
-            spec_table.autofit = False
-            for i, width in enumerate(widths):
-                spec_table.columns[i].width = width
-            
-            # Header Row
-            spec_hdr_cells = spec_table.rows[0].cells
-            spec_hdr_cells[0].text = 'Field'
-            spec_hdr_cells[1].text = 'Details - التفاصيل'
-            spec_hdr_cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-            spec_hdr_p_ar_field = spec_hdr_cells[2].paragraphs[0]
-            spec_hdr_p_ar_field.text = 'الحقل'
-            spec_hdr_p_ar_field.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-            set_rtl(spec_hdr_p_ar_field)
-
-            for key, value in non_attachment_keys.items():
-                label_en = specific_labels_en.get(key, key.replace('_', ' ').title())
-                label_ar = specific_labels_ar.get(key, key.replace('_', ' ').title())
-                
-                row_cells = spec_table.add_row().cells
-                # Column 1: English Field
-                row_cells[0].text = label_en
-
-                # Column 2: Details (Single language based on input)
-                p_details = row_cells[1].paragraphs[0]
-                p_details.text = str(value)
-                if is_arabic(str(value)):
-                    set_rtl(p_details)
-                    p_details.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-                
-                # Column 3: Arabic Field
-                p_ar_label = row_cells[2].paragraphs[0]
-                p_ar_label.text = label_ar
-                p_ar_label.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-                set_rtl(p_ar_label)
-
-        # --- Attachments ---
-        attachment_keys = [k for k in specific_data if k.endswith(('_docs', '_certs', '_receipts', '_license'))]
-        if attachment_keys:
-            document.add_heading('Attachments - المرفقات', level=1)
-            for key in attachment_keys:
-                file_paths = specific_data.get(key)
-                if file_paths:
-                    label_en = attachments_meta_en.get(key, key.replace('_', ' ').title())
-                    label_ar = attachments_meta_ar.get(key, label_en)
-                    document.add_paragraph(f"{label_en} - {label_ar}", style='Intense Quote')
-                    for path in file_paths:
-                        document.add_paragraph(os.path.basename(path), style='List Bullet')
+def generate_bilingual_profile_doc(data, labels_en, labels_ar, attachments_meta_en, attachments_meta_ar, specific_labels_en, specific_labels_ar, doc_type='member'):
+    """Generates a bilingual Word document for a member or club profile."""
+    try:
+        document = new_profile_document()
+        add_profile(document, data, labels_en, labels_ar, attachments_meta_en, attachments_meta_ar,
+                    specific_labels_en, specific_labels_ar, doc_type)
 
         # --- Save temporary file ---
         temp_dir = os.path.join('assets', 'temp_reports')
@@ -176,4 +235,4 @@ def generate_bilingual_profile_doc(data, labels_en, labels_ar, attachments_meta_
 
     except Exception as e:
         print(f"Error generating Word document: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,268 @@
+"""
+Tournament draw engine.
+
+Turns per-category entry lists (entry_lists.py) into draws:
+
+  * Kumite: a single-elimination bracket. Ranked athletes are seeded
+    (international rank before national rank) into the standard seed
+    positions, byes go to the top seeds, and the other athletes are placed so
+    that team-mates from the same club meet as late as possible. Athletes who
+    lose to a finalist enter the repechage of their half; the two repechage
+    winners take the bronze medals.
+  * Kata: pools of at most KATA_POOL_MAX_SIZE, with the seeds spread over the
+    pools in snake order and club-mates kept in different pools where
+    possible; the best KATA_POOL_ADVANCE of each pool go on to the next round.
+
+Every random choice comes from a generator seeded with the draw seed and the
+category, and athletes are ordered by PKF ID first, so the same entries and
+draw seed always give the same draw, whatever the order of the input.
+"""
+import math
+import random
+import re
+from collections import Counter
+
+from entry_lists import category_title
+
+KATA_POOL_MAX_SIZE = 8
+KATA_POOL_ADVANCE = 4
+# (largest bracket size, number of seeds); brackets beyond the last size use the last count
+KUMITE_SEEDS = ((8, 2), (32, 4), (None, 8))
+
+_RANK_RE = re.compile(r"\d+")
+
+
+def rank_value(text):
+    """The first number in a rank field ('3', '3rd', 'Rank 12'), or None."""
+    match = _RANK_RE.search(str(text or ""))
+    return int(match.group()) if match else None
+
+
+def athlete_from_row(row):
+    """Draw athlete from an entry-list row or a members row."""
+    return {
+        'pkf_id': str(row.get('pkf_id') or ""),
+        'name': row.get('full_name') or row.get('full_name_ar') or "",
+        'club': row.get('club') or row.get('club_name') or "",
+        'rank_local': rank_value(row.get('rank_local')),
+        'rank_intl': rank_value(row.get('rank_intl')),
+    }
+
+
+def athletes_from_entries(roster, entries):
+    """{Category: [athlete, ...]} from entry_lists.assign_categories() output."""
+    columns = roster.columns
+    athletes = [athlete_from_row({name: columns[name][i] for name in ('pkf_id', 'full_name', 'full_name_ar', 'club',
+                                                                       'rank_local', 'rank_intl')})
+                for i in range(len(roster))]
+    return {category: [athletes[i] for i in rows] for category, rows in entries.items()}
+
+
+def _rng(draw_seed, category):
+    # random.Random hashes str seeds with SHA-512, so this is stable across runs and machines
+    return random.Random(f"{draw_seed}|{category_title(category)}")
+
+
+def _ranked(athletes, rng):
+    """Athletes ordered by PKF ID and shuffled by rng, then split into (seed order, unranked)."""
+    athletes = sorted(athletes, key=lambda a: a['pkf_id'])
+    rng.shuffle(athletes)  # ties in rank, and the unranked, in draw order
+    ranked = [a for a in athletes if a['rank_intl'] is not None or a['rank_local'] is not None]
+    ranked.sort(key=lambda a: (0, a['rank_intl']) if a['rank_intl'] is not None else (1, a['rank_local']))
+    unranked = [a for a in athletes if a['rank_intl'] is None and a['rank_local'] is None]
+    return ranked, unranked
+
+
+def _by_club_size(athletes):
+    """Largest clubs first (the hardest to separate), keeping the draw order within a club."""
+    sizes = {}
+    for a in athletes:
+        sizes[a['club']] = sizes.get(a['club'], 0) + 1
+    return sorted(athletes, key=lambda a: -sizes[a['club']] if a['club'] else 0)
+
+
+# --- Kumite brackets ---
+
+def bracket_order(size):
+    """Seed number at each bracket position, e.g. [1, 8, 4, 5, 2, 7, 3, 6] for 8: seeds 1 and 2 meet only in the final."""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for s in order for seed in (s, total - s)]
+    return order
+
+
+def seed_count(size):
+    for largest, seeds in KUMITE_SEEDS:
+        if largest is None or size <= largest:
+            return seeds
+    return KUMITE_SEEDS[-1][1]
+
+
+def _meeting_round(p, q):
+    """1-based round in which bracket positions p and q would meet."""
+    return (p ^ q).bit_length()
+
+
+def _separate_clubs(free, athletes, slots, rng):
+    """Places athletes into the free positions, each where its nearest club-mate is met as late as possible."""
+    free = list(free)
+    rng.shuffle(free)
+    placed = {}
+    for position, athlete in enumerate(slots):
+        if athlete and athlete['club']:
+            placed.setdefault(athlete['club'], []).append(position)
+    latest = (len(slots) - 1).bit_length()  # the final
+    for athlete in _by_club_size(athletes):
+        mates = placed.get(athlete['club'], []) if athlete['club'] else []
+        # First free position with the latest meeting round; stops early at the final or when no club-mate is placed
+        best, best_round = 0, -1
+        for i, p in enumerate(free):
+            meets = math.inf
+            for q in mates:
+                r = (p ^ q).bit_length()  # _meeting_round, inlined: this is the hot loop of a large draw
+                if r < meets:
+                    meets = r
+                    if meets <= best_round:
+                        break
+            if meets > best_round:
+                best, best_round = i, meets
+                if meets >= latest:
+                    break
+        position = free.pop(best)
+        slots[position] = athlete
+        if athlete['club']:
+            placed.setdefault(athlete['club'], []).append(position)
+
+
+def _bracket_rounds(slots):
+    """
+    Rounds of nodes over the slots: round 0 holds one node per slot, every later
+    node is the winner of two nodes. A node is {'athlete', 'match', 'children'}:
+    'match' is the bout number, or None when the athlete is known without a
+    bout (a slot, or a bye). Bouts are numbered round by round.
+    """
+    rounds = [[{'athlete': a, 'match': None, 'children': None} for a in slots]]
+    number = 0
+    while len(rounds[-1]) > 1:
+        previous, current = rounds[-1], []
+        for left, right in zip(previous[0::2], previous[1::2]):
+            empty_left = left['match'] is None and left['athlete'] is None
+            empty_right = right['match'] is None and right['athlete'] is None
+            if empty_left or empty_right:
+                # Bye: the other side goes through without a bout
+                node = right if empty_left else left
+                current.append({'athlete': node['athlete'], 'match': node['match'], 'children': (left, right)})
+            else:
+                number += 1
+                current.append({'athlete': None, 'match': number, 'children': (left, right)})
+        rounds.append(current)
+    return rounds
+
+
+def repechage_rounds(rounds):
+    """
+    Number of rounds before the final, i.e. the athletes per half who can lose
+    to that half's finalist (first round to semi-final). In the repechage of a
+    half the first of them meets the second, the winner meets the third, and
+    so on; the last winner takes bronze. 0 when the bracket is just a final.
+    """
+    return max(0, len(rounds) - 2)
+
+
+def kumite_bracket(category, athletes, draw_seed=0):
+    """Single-elimination bracket with seeds, byes, club separation and repechage."""
+    rng = _rng(draw_seed, category)
+    ranked, unranked = _ranked(athletes, rng)
+    count = len(ranked) + len(unranked)
+    size = 1 << max(1, math.ceil(math.log2(max(count, 2))))
+    seeds = ranked[:min(seed_count(size), count)]
+    others = ranked[len(seeds):] + unranked
+
+    order = bracket_order(size)
+    position_of_seed = {seed: position for position, seed in enumerate(order)}
+    slots = [None] * size
+    for number, athlete in enumerate(seeds, start=1):
+        slots[position_of_seed[number]] = dict(athlete, seed=number)
+    # Byes take the highest seed numbers, so they face the top seeds
+    byes = {position_of_seed[number] for number in range(count + 1, size + 1)}
+    free = [p for p in range(size) if slots[p] is None and p not in byes]
+    _separate_clubs(free, others, slots, rng)
+
+    rounds = _bracket_rounds(slots)
+    return {
+        'category': category,
+        'title': category_title(category),
+        'discipline': 'Kumite',
+        'athletes': count,
+        'size': size,
+        'slots': slots,
+        'rounds': rounds,
+        'bouts': rounds[-1][0]['match'] or 0,  # bouts are numbered round by round, so the final is the last
+        'repechage_rounds': repechage_rounds(rounds),
+    }
+
+
+# --- Kata pools ---
+
+def pool_count(count):
+    """1 pool up to 3 athletes, else the smallest power of two giving pools of at most KATA_POOL_MAX_SIZE."""
+    if count <= 3:
+        return 1
+    pools = 2
+    while math.ceil(count / pools) > KATA_POOL_MAX_SIZE:
+        pools *= 2
+    return pools
+
+
+def kata_pools(category, athletes, draw_seed=0):
+    """Kata pools with the seeds snaked over the pools and club-mates spread apart; lists are in performance order."""
+    rng = _rng(draw_seed, category)
+    ranked, unranked = _ranked(athletes, rng)
+    count = len(ranked) + len(unranked)
+    n_pools = pool_count(count)
+    capacity = math.ceil(count / n_pools) if count else 0
+    seeds = ranked[:n_pools * 2 if n_pools > 1 else 0]
+    pools = [[] for _ in range(n_pools)]
+
+    for number, athlete in enumerate(seeds):
+        lap, offset = divmod(number, n_pools)
+        pools[offset if lap % 2 == 0 else n_pools - 1 - offset].append(dict(athlete, seed=number + 1))
+    clubs = [Counter(a['club'] for a in pool if a['club']) for pool in pools]
+    for athlete in _by_club_size(ranked[len(seeds):] + unranked):
+        # Fewest club-mates, then the smallest pool, then the first
+        best = min((i for i in range(n_pools) if len(pools[i]) < capacity),
+                   key=lambda i: (clubs[i][athlete['club']] if athlete['club'] else 0, len(pools[i]), i))
+        pools[best].append(athlete)
+        if athlete['club']:
+            clubs[best][athlete['club']] += 1
+    for pool in pools:
+        rng.shuffle(pool)  # performance order
+    return {
+        'category': category,
+        'title': category_title(category),
+        'discipline': 'Kata',
+        'athletes': count,
+        'pools': pools,
+        # Athletes going on from each pool (0 with a single pool, which is the final)
+        'advance': [min(KATA_POOL_ADVANCE, len(pool)) if n_pools > 1 else 0 for pool in pools],
+    }
+
+
+def generate_draws(athletes_by_category, draw_seed=0, progress_callback=None):
+    """
+    Draws for every category with at least one athlete, in the order given.
+    athletes_by_category: {Category: [athlete, ...]} (see athletes_from_entries).
+    progress_callback(done, total) is called after every category.
+    """
+    categories = [c for c, athletes in athletes_by_category.items() if athletes]
+    draws = []
+    for done, category in enumerate(categories, start=1):
+        athletes = athletes_by_category[category]
+        if category.discipline == 'Kata':
+            draws.append(kata_pools(category, athletes, draw_seed))
+        else:
+            draws.append(kumite_bracket(category, athletes, draw_seed))
+        if progress_callback:
+            progress_callback(done, len(categories))
+    return draws
@@ -0,0 +1,142 @@
+"""
+Compiled competition eligibility index.
+
+The rule tables in competition_categories (age ranges, Kumite weight classes
+and Kata categories per age group and gender) are compiled once into:
+
+  * age segments: sorted, non-overlapping age intervals, each mapped to the
+    tuple of age group keys that apply (U21 and Seniors overlap at 18-20);
+  * per (age group, gender): the sorted upper weight bounds of the Kumite
+    classes, searched with bisect.
+
+so a lookup is two binary searches instead of a scan over every table. The
+index is built from plain tables, so a revised WKF rule set is loaded with
+load_rule_set(kumite, kata, age_ranges) without touching the lookup code.
+"""
+import logging
+import math
+from bisect import bisect_left, bisect_right
+
+import competition_categories
+
+logger = logging.getLogger(__name__)
+
+GENDERS = ("Male", "Female")
+
+
+class EligibilityIndex:
+    """
+    Eligibility lookups over one rule set.
+
+    kumite: {age_key: {gender: [{'label', 'min_weight', 'max_weight'}, ...]}}
+    kata: {age_key: {gender: [label, ...]}}
+    age_ranges: [(min_age, max_age, age_key), ...], bounds inclusive.
+    Raises ValueError if the weight classes of a group overlap.
+    """
+
+    def __init__(self, kumite, kata, age_ranges):
+        self._age_starts, self._age_keys = self._compile_ages(age_ranges)
+        self._weights = {}
+        for age_key, by_gender in kumite.items():
+            for gender, classes in by_gender.items():
+                self._weights[(age_key, gender)] = self._compile_weights(age_key, gender, classes)
+        self._kata = {(age_key, gender): tuple(labels)
+                      for age_key, by_gender in kata.items() for gender, labels in by_gender.items()}
+
+    @staticmethod
+    def _compile_ages(age_ranges):
+        """Splits the (possibly overlapping) age ranges at every bound into segments."""
+        bounds = sorted({a for a, _, _ in age_ranges} | {b + 1 for _, b, _ in age_ranges})
+        starts, keys = [], []
+        for start in bounds:
+            matching = tuple(key for a, b, key in age_ranges if a <= start <= b)
+            if keys and keys[-1] == matching:
+                continue
+            starts.append(start)
+            keys.append(matching)
+        return starts, keys
+
+    @staticmethod
+    def _compile_weights(age_key, gender, classes):
+        """(upper bounds, lower bounds, labels) sorted by weight; None bounds become -inf/+inf."""
+        ordered = sorted(classes, key=lambda wc: math.inf if wc["max_weight"] is None else wc["max_weight"])
+        uppers, lowers, labels = [], [], []
+        for wc in ordered:
+            lower = -math.inf if wc["min_weight"] is None else wc["min_weight"]
+            upper = math.inf if wc["max_weight"] is None else wc["max_weight"]
+            if uppers and lower <= uppers[-1]:
+                raise ValueError(f"Overlapping weight classes in {age_key}/{gender}: {labels[-1]} and {wc['label']}")
+            uppers.append(upper)
+            lowers.append(lower)
+            labels.append(wc["label"])
+        return uppers, lowers, labels
+
+    @property
+    def age_segments(self):
+        """(segment start ages, age group keys per segment); for vectorized lookups with searchsorted."""
+        return self._age_starts, self._age_keys
+
+    @property
+    def kumite_tables(self):
+        """{(age_key, gender): (upper bounds, lower bounds, labels)} sorted by weight."""
+        return self._weights
+
+    @property
+    def kata_tables(self):
+        """{(age_key, gender): (labels, ...)}."""
+        return self._kata
+
+    def age_groups(self, age):
+        """The age group keys that include age (e.g. ('U21', 'Seniors') for 19)."""
+        if age is None:
+            return ()
+        i = bisect_right(self._age_starts, age) - 1
+        return self._age_keys[i] if i >= 0 else ()
+
+    def kumite_class(self, age_key, gender, weight_kg):
+        """The label of the Kumite weight class for weight_kg, or None (no class, or between two classes)."""
+        compiled = self._weights.get((age_key, gender))
+        if compiled is None:
+            return None
+        uppers, lowers, labels = compiled
+        i = bisect_left(uppers, weight_kg)
+        if i < len(uppers) and weight_kg >= lowers[i]:
+            return labels[i]
+        return None
+
+    def lookup(self, age, gender, weight_kg):
+        """(eligible kumite labels, eligible kata labels) for an age in years, gender and weight."""
+        kumite, kata = [], []
+        for age_key in self.age_groups(age):
+            label = self.kumite_class(age_key, gender, weight_kg)
+            if label is not None:
+                kumite.append(label)
+            kata.extend(self._kata.get((age_key, gender), ()))
+        logger.debug("eligibility lookup age=%s gender=%s weight=%s -> kumite=%s kata=%s",
+                     age, gender, weight_kg, kumite, kata)
+        return kumite, kata
+
+
+_index = EligibilityIndex(competition_categories.KUMITE_CATEGORIES, competition_categories.KATA_CATEGORIES,
+                          competition_categories.AGE_RANGES)
+
+
+def get_index():
+    """The index for the rule set in use."""
+    return _index
+
+
+def load_rule_set(kumite, kata, age_ranges):
+    """Compiles and switches to another rule set (e.g. a revised WKF category table); returns the new index."""
+    global _index
+    _index = EligibilityIndex(kumite, kata, age_ranges)
+    logger.info("eligibility rule set loaded: %d age groups, %d weight tables",
+                len({key for _, _, key in age_ranges}), len(_index._weights))
+    return _index
+
+
+def lookup(age, gender, weight_kg):
+    """(eligible kumite labels, eligible kata labels) using the current rule set."""
+    if age is None or gender not in GENDERS:
+        return [], []
+    return _index.lookup(age, gender, weight_kg)
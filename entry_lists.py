@@ -0,0 +1,189 @@
+"""
+Tournament entry lists.
+
+Assigns every active player to their age group, Kumite weight class and Kata
+category for a tournament, and groups them into per-category entry lists.
+
+The roster is loaded with one query into columnar NumPy arrays (date of birth
+as a YYYYMMDD integer, gender code, weight), and the categories are assigned
+with searchsorted against the compiled eligibility index (eligibility.py):
+one pass over the age segments and one per (age group, gender) weight table,
+instead of a per-player lookup. Ages are taken on the tournament reference
+date, not on the day the list is built.
+"""
+from collections import namedtuple
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+import eligibility
+from config import TOURNAMENT_REFERENCE_DATE
+from database import PLAYER_ROSTER_COLUMNS, get_player_roster
+
+# One entry list: discipline is 'Kumite' or 'Kata'; label is the weight class or Kata category label
+Category = namedtuple('Category', 'discipline age_group gender label')
+
+
+def category_title(category):
+    """Display name, e.g. 'Kumite U21 Male -60kg' or 'Kata Individual (U21) Male'."""
+    if category.discipline == 'Kumite':
+        return f"Kumite {category.age_group} {category.gender} {category.label}"
+    return f"{category.label} {category.gender}"
+
+
+def reference_date_or_default(value=None):
+    """value (date or 'YYYY-MM-DD'), else config.TOURNAMENT_REFERENCE_DATE, else today."""
+    value = value or TOURNAMENT_REFERENCE_DATE
+    if not value:
+        return date.today()
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), '%Y-%m-%d').date()
+
+
+class Roster:
+    """
+    Players as columns: dob (int YYYYMMDD, 0 if unknown), gender (index into
+    eligibility.GENDERS, -1 if unknown), weight (float, NaN if unknown), plus
+    object arrays for the other PLAYER_ROSTER_COLUMNS.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self.dob = columns['dob']
+        self.gender = columns['gender']
+        self.weight = columns['weight']
+
+    def __len__(self):
+        return len(self.dob)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """From get_player_roster() rows (tuples in PLAYER_ROSTER_COLUMNS order)."""
+        columns = {}
+        for i, name in enumerate(PLAYER_ROSTER_COLUMNS):
+            values = [row[i] for row in rows]
+            if name == 'dob':
+                columns[name] = np.array(values, dtype=np.int64)
+            elif name == 'weight':
+                columns[name] = np.array(values, dtype=np.float64)  # None -> NaN
+            elif name == 'gender':
+                codes = {g.casefold(): n for n, g in enumerate(eligibility.GENDERS)}
+                columns[name] = np.array([codes.get((g or '').strip().casefold(), -1) for g in values], dtype=np.int8)
+            else:
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+                columns[name] = column
+        return cls(columns)
+
+
+def load_roster(reference_date=None, include_expired=False, club=None):
+    """Active players (membership not expired on the reference date), optionally of one club."""
+    reference_date = reference_date_or_default(reference_date)
+    return Roster.from_rows(get_player_roster(reference_date, include_expired=include_expired, club=club))
+
+
+def ages_on(dob, reference_date):
+    """Completed years on reference_date for YYYYMMDD integers; -1 where the date of birth is unknown."""
+    reference_date = reference_date_or_default(reference_date)
+    ref = reference_date.year * 10000 + reference_date.month * 100 + reference_date.day
+    return np.where(dob > 0, (ref - dob) // 10000, -1)
+
+
+def assign_categories(roster, reference_date=None, index=None):
+    """
+    {Category: ascending array of roster row indices}, in rule-set order.
+    Categories without players are left out. A player in two age groups (e.g.
+    U21 and Seniors) is entered in both, as in the registration form.
+    """
+    index = index or eligibility.get_index()
+    age = ages_on(roster.dob, reference_date)
+    starts, segment_keys = index.age_segments
+    segment = np.searchsorted(np.asarray(starts), age, side='right') - 1
+    segment[age < 0] = -1
+    segments_of = {}
+    for n, keys in enumerate(segment_keys):
+        for key in keys:
+            segments_of.setdefault(key, []).append(n)
+
+    # Rows per (age group, gender), computed once and shared by Kumite and Kata
+    groups = {}
+    for age_key, segments in segments_of.items():
+        in_group = np.isin(segment, segments)
+        for code, gender in enumerate(eligibility.GENDERS):
+            groups[(age_key, gender)] = np.flatnonzero(in_group & (roster.gender == code))
+
+    entries = {}
+    for (age_key, gender), (uppers, lowers, labels) in index.kumite_tables.items():
+        rows = groups.get((age_key, gender))
+        if rows is None or not len(rows):
+            continue
+        weight = roster.weight[rows]
+        position = np.searchsorted(np.asarray(uppers), weight, side='left')  # NaN sorts past the last class
+        clipped = np.minimum(position, len(labels) - 1)
+        eligible = (position < len(labels)) & (weight >= np.asarray(lowers)[clipped])
+        position, rows = position[eligible], rows[eligible]
+        for n, label in enumerate(labels):
+            members = rows[position == n]
+            if len(members):
+                entries[Category('Kumite', age_key, gender, label)] = members
+    for (age_key, gender), labels in index.kata_tables.items():
+        rows = groups.get((age_key, gender))
+        if rows is None or not len(rows):
+            continue
+        for label in labels:
+            entries[Category('Kata', age_key, gender, label)] = rows
+    return entries
+
+
+def registered_only(roster, entries):
+    """Keeps only players who ticked the category label in their member form (specific_data)."""
+    registered = roster.columns['registered']
+    filtered = {}
+    for category, rows in entries.items():
+        keep = np.fromiter((bool(registered[i]) and category.label in registered[i] for i in rows),
+                           dtype=bool, count=len(rows))
+        if keep.any():
+            filtered[category] = rows[keep]
+    return filtered
+
+
+ENTRY_LIST_COLUMNS = ['category', 'discipline', 'age_group', 'gender', 'pkf_id', 'full_name', 'full_name_ar', 'club',
+                      'age', 'weight', 'rank_local', 'rank_intl']
+
+
+def entry_list_frame(roster, entries, reference_date=None):
+    """One row per (category, player), for display and CSV/Excel export."""
+    if not entries:
+        return pd.DataFrame(columns=ENTRY_LIST_COLUMNS)
+    categories = list(entries)
+    # All entries as one gather: row indices, plus the category of each entry as a code into categories
+    rows = np.concatenate([entries[c] for c in categories])
+    codes = np.repeat(np.arange(len(categories)), [len(entries[c]) for c in categories])
+    per_category = {
+        'category': [category_title(c) for c in categories],
+        'discipline': [c.discipline for c in categories],
+        'age_group': [c.age_group for c in categories],
+        'gender': [c.gender for c in categories],
+    }
+    frame = pd.DataFrame({name: np.array(values, dtype=object)[codes] for name, values in per_category.items()})
+    for name in ('pkf_id', 'full_name', 'full_name_ar', 'club'):
+        frame[name] = roster.columns[name][rows]
+    frame['age'] = ages_on(roster.dob[rows], reference_date)
+    frame['weight'] = roster.weight[rows]
+    for name in ('rank_local', 'rank_intl'):
+        frame[name] = roster.columns[name][rows]
+    return frame
+
+
+def build_entry_lists(reference_date=None, include_expired=False, club=None, only_registered=False):
+    """Loads the roster and returns (roster, {Category: row indices}) for the tournament date."""
+    reference_date = reference_date_or_default(reference_date)
+    roster = load_roster(reference_date, include_expired=include_expired, club=club)
+    entries = assign_categories(roster, reference_date)
+    if only_registered:
+        entries = registered_only(roster, entries)
+    return roster, entries
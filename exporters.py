@@ -0,0 +1,106 @@
+"""
+Streaming full-database export.
+
+Headers come from a pre-pass done in SQL (table columns + the flattened keys of
+specific_data), then rows are streamed from a server-side cursor and written
+one at a time to a write-only workbook or a CSV file. Memory use stays flat
+regardless of how many members are exported.
+"""
+import csv
+import json
+
+from openpyxl import Workbook
+
+from database import get_member_export_schema, iter_members_for_export
+
+# Columns that lead the export, in this order; the rest follow alphabetically.
+PREFERRED_MEMBER_COLUMNS = [
+    'pkf_id', 'full_name', 'full_name_ar', 'id_number', 'role', 'club_name',
+    'admin_title', 'dob', 'expiry_date', 'current_belt', 'phone', 'email', 'notes', 'club_id',
+    'passport_number', 'passport_expiry_date'
+]
+
+PROGRESS_EVERY = 1000
+
+
+def flatten_dict(d, parent_key='', sep='_'):
+    """
+    Flattens a nested dictionary for CSV/Excel export.
+    Example: {'a': 1, 'c': {'a': 2, 'b': {'x': 5}}} -> {'a': 1, 'c_a': 2, 'c_b_x': 5}
+    """
+    items = []
+    for k, v in d.items():
+        new_key = parent_key + sep + k if parent_key else k
+        if isinstance(v, dict) and v:
+            items.extend(flatten_dict(v, new_key, sep=sep).items())
+        else:
+            items.append((new_key, v))
+    return dict(items)
+
+
+def _member_headers(columns, specific_keys):
+    available = set(columns) | set(specific_keys)
+    headers = [h for h in PREFERRED_MEMBER_COLUMNS if h in available]
+    headers.extend(sorted(h for h in available if h not in headers))
+    return headers
+
+
+def _flatten_member(member):
+    flat = dict(member)
+    specific_data = flat.pop('specific_data', None)
+    try:
+        flat.update(flatten_dict(json.loads(specific_data or '{}')))
+    except (json.JSONDecodeError, TypeError, AttributeError):
+        pass  # Ignore if specific_data is not valid JSON
+    return flat
+
+
+def _cell(value):
+    """Lists/dicts (e.g. attachment paths) are written as JSON text; None as an empty cell."""
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def export_members(filepath, progress_callback=None, chunk_size=2000):
+    """
+    Exports every member to `filepath` (.xlsx or .csv) and returns the number of rows.
+    progress_callback(done, total) is called every PROGRESS_EVERY rows and at the end.
+    """
+    if not filepath.endswith(('.xlsx', '.csv')):
+        raise ValueError("Unsupported file format. Please use .xlsx or .csv.")
+
+    columns, specific_keys, total = get_member_export_schema()
+    if not total:
+        raise ValueError("There is no data to export.")
+    headers = _member_headers(columns, specific_keys)
+
+    def rows():
+        for done, member in enumerate(iter_members_for_export(chunk_size), start=1):
+            flat = _flatten_member(member)
+            yield [_cell(flat.get(h)) for h in headers]
+            if progress_callback and done % PROGRESS_EVERY == 0:
+                progress_callback(done, total)
+
+    count = 0
+    if filepath.endswith('.xlsx'):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("PKF Members")
+        ws.append(headers)
+        for row in rows():
+            ws.append(row)
+            count += 1
+        wb.save(filepath)
+    else:
+        with open(filepath, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            writer.writerow(headers)
+            for row in rows():
+                writer.writerow(row)
+                count += 1
+
+    if progress_callback and count % PROGRESS_EVERY:
+        progress_callback(count, total)
+    return count
@@ -1,10 +1,15 @@
 import os
 import io
 import json
-from docxtpl import DocxTemplate, InlineImage
+from docxtpl import InlineImage
 from docx.shared import Mm
 from PIL import Image, ImageDraw, ImageFont
-import qrcode
+
+from card_renderer import render_card_preview
+from photos import photo_variant
+from qr_codes import member_payload, qr_png_bytes
+from render_cache import RenderCache
+from template_cache import TemplateCache
 
 # --- Path Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -41,6 +46,15 @@ def get_template_path(role):
         raise FileNotFoundError(f"Template file not found: {path}")
     return path
 
+# Parsed templates, keyed by role and re-validated against the file's mtime.
+_templates = TemplateCache(get_template_path)
+
+# Bump when the rendering code below changes, so cached cards are not reused.
+RENDER_VERSION = 1
+
+# Rendered cards, keyed by their context, template version and photo bytes.
+render_cache = RenderCache(OUTPUT_DIR)
+
 def get_static_preview_image(role):
     """
     Looks for a static preview image for the given role in the assets folder.
@@ -74,9 +88,6 @@ def generate_card_image(member_data):
     """
     try:
         role = member_data.get('role', 'Player')
-        template_path = get_template_path(role)
-        doc = DocxTemplate(template_path)
-        
         specific_data = json.loads(member_data.get('specific_data', '{}'))
 
         # --- General Information ---
@@ -91,22 +102,11 @@ def generate_card_image(member_data):
             'belt_date': specific_data.get('current_belt_date', ''), # Assuming this might be in specific_data
         }
 
-        # --- Photo ---
-        photo_path = member_data.get('photo_path')
-        if photo_path and os.path.exists(photo_path):
-            context['photo'] = InlineImage(doc, photo_path, width=Mm(22), height=Mm(28))
-        else:
+        # --- Photo (the pre-sized card variant when it exists) ---
+        photo_path = photo_variant(member_data.get('photo_path'), 'card')
+        if not photo_path:
             placeholder_path = os.path.join(ASSETS_DIR, 'placeholder.jpg')
-            if os.path.exists(placeholder_path):
-                context['photo'] = InlineImage(doc, placeholder_path, width=Mm(22), height=Mm(28))
-
-        # --- QR Code ---
-        qr_data = f"Name: {context['name_en']}\nID: {context['pkf_id']}\nRole: {context['role']}"
-        qr_img = qrcode.make(qr_data)
-        qr_buffer = io.BytesIO()
-        qr_img.save(qr_buffer, format='PNG')
-        qr_buffer.seek(0)
-        context['qr'] = InlineImage(doc, qr_buffer, width=Mm(20))
+            photo_path = placeholder_path if os.path.exists(placeholder_path) else None
 
         # --- Player Specific ---
         if role == 'Player':
@@ -143,17 +143,37 @@ def generate_card_image(member_data):
         elif role == 'Admin':
             context['admin_title'] = member_data.get('admin_title', specific_data.get('admin_title', ''))
 
-        # Render the document
-        doc.render(context)
-
-        # Save the generated .docx file
         safe_pkf_id = "".join(c for c in context['pkf_id'] if c.isalnum()).rstrip()
         output_filename = f"Card_{context['name_en'].replace(' ', '_')}_{safe_pkf_id}.docx"
         output_path = os.path.join(OUTPUT_DIR, output_filename)
-        doc.save(output_path)
 
-        # Get the static preview image for the UI
-        preview_image = get_static_preview_image(role)
+        # Signed verification payload (pkf_id + expiry), see qr_codes
+        qr_data = member_payload(member_data)
+
+        # An unchanged card is served from the render cache without rendering it again.
+        key = render_cache.make_key(context, _templates.version(role), photo_path, renderer='id_card',
+                                    version=RENDER_VERSION, qr=qr_data)
+        if not render_cache.link(key, output_path):
+            doc = _templates.get(role)
+            if photo_path:
+                context['photo'] = InlineImage(doc, photo_path, width=Mm(22), height=Mm(28))
+
+            # --- QR Code ---
+            context['qr'] = InlineImage(doc, io.BytesIO(qr_png_bytes(qr_data)), width=Mm(20))
+
+            # Render the document
+            doc.render(context, jinja_env=_templates.jinja_env)
+
+            # Save the generated .docx file
+            buffer = io.BytesIO()
+            doc.save(buffer)
+            render_cache.put(key, buffer.getvalue(), link_to=output_path)
+
+        # Preview of the member's real card; the static template image if it cannot be drawn
+        try:
+            preview_image = render_card_preview(member_data)
+        except Exception:
+            preview_image = get_static_preview_image(role)
         
         return output_path, preview_image
 
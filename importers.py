@@ -0,0 +1,376 @@
+"""
+Bulk Excel import pipelines.
+
+The workbook is streamed with openpyxl in read_only mode, rows are validated
+and normalized in batches, and every batch is written with execute_values on
+a single connection inside one transaction. A failing batch is retried row by
+row under savepoints so that one bad row is reported instead of aborting the
+whole import. Rejected rows are collected and can be written to an .xlsx
+rejects report with write_rejects_report().
+"""
+import json
+from datetime import date, datetime
+
+from openpyxl import Workbook, load_workbook
+from psycopg2.extras import execute_values
+
+from database import (get_connection, invalidate_stats_cache, member_search_keys, advance_club_membership_id_seq,
+                      allocate_club_membership_ids, duplicate_club_membership_ids, duplicate_club_membership_ids_message)
+
+# Columns read from the sheet into members; every other header goes into specific_data.
+MEMBER_MAIN_KEYS = (
+    'pkf_id', 'id_number', 'full_name', 'full_name_ar', 'dob', 'phone', 'email',
+    'role', 'expiry_date', 'current_belt', 'notes', 'admin_title',
+    'passport_number', 'passport_expiry_date',
+)
+MEMBER_DATE_KEYS = ('dob', 'expiry_date', 'passport_expiry_date')
+MEMBER_ROLES = ('Player', 'Coach', 'Referee', 'Admin')
+
+# Fixed column list for the batched INSERT (execute_values needs one shape per statement).
+_MEMBER_INSERT_COLUMNS = MEMBER_MAIN_KEYS + ('club_id', 'club_name', 'specific_data', 'search_key', 'name_ar_key')
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+class RowRejected(ValueError):
+    """Raised by row normalizers for rows that fail validation."""
+
+
+def iter_sheet_rows(filepath):
+    """
+    Streams (row_number, {header: value}) from the active sheet of an .xlsx file.
+    Completely empty rows are skipped.
+    """
+    workbook = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if not headers:
+            return
+        headers = [str(h).strip() if h is not None else None for h in headers]
+        for row_number, values in enumerate(rows, start=2):
+            if all(v is None or (isinstance(v, str) and not v.strip()) for v in values):
+                continue
+            yield row_number, {h: v for h, v in zip(headers, values) if h}
+    finally:
+        workbook.close()
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _clean(value):
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _normalize_date(value, key):
+    """Excel dates arrive as datetime objects, typed-in dates as text; both become 'YYYY-MM-DD'."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    text = str(value).strip()
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise RowRejected(f"Invalid {key} '{text}', expected YYYY-MM-DD.")
+
+
+def normalize_member_row(row, clubs_map):
+    """
+    Converts one sheet row into a members row dict, raising RowRejected on invalid data.
+    clubs_map maps club name -> club id (loaded once per import).
+    """
+    member = {}
+    specific_data = {}
+    for key, value in row.items():
+        value = _clean(value)
+        if value is None or key == 'club_name':
+            continue
+        if key in MEMBER_MAIN_KEYS:
+            member[key] = value
+        elif isinstance(value, (int, float)) and value == 1:
+            specific_data[key] = True  # Checkbox columns are filled with 1
+        elif isinstance(value, (datetime, date)):
+            specific_data[key] = _normalize_date(value, key)
+        else:
+            specific_data[key] = value
+
+    for key, value in member.items():
+        if isinstance(value, float) and value.is_integer():
+            member[key] = int(value)  # Numeric cells (IDs, phones) would otherwise end in ".0"
+    if not member.get('pkf_id'):
+        raise RowRejected("Missing pkf_id.")
+    if not member.get('full_name_ar') and not member.get('full_name'):
+        raise RowRejected("Missing member name (full_name_ar or full_name).")
+    if member.get('role') and member['role'] not in MEMBER_ROLES:
+        raise RowRejected(f"Unknown role '{member['role']}'.")
+    for key in MEMBER_DATE_KEYS:
+        if key in member:
+            member[key] = _normalize_date(member[key], key)
+    for key in MEMBER_MAIN_KEYS:
+        if key in member and not isinstance(member[key], str):
+            member[key] = str(member[key])
+
+    club_name = _clean(row.get('club_name'))
+    if club_name:
+        club_name = str(club_name)
+        if club_name not in clubs_map:
+            raise RowRejected(f"Unknown club '{club_name}'.")
+        member['club_id'] = clubs_map[club_name]
+        member['club_name'] = club_name
+
+    member['specific_data'] = json.dumps(specific_data, ensure_ascii=False)
+    member['search_key'], member['name_ar_key'] = member_search_keys(member)
+    return member
+
+
+def _reject(summary, row_number, row, key, reason):
+    summary['rejected'].append({'row': row_number, 'id': row.get(key), 'reason': reason, 'values': row})
+
+
+def _insert_members(cur, members):
+    """Inserts a batch; returns {pkf_id: 'inserted'} for the rows that were actually inserted."""
+    values = [tuple(m.get(c) for c in _MEMBER_INSERT_COLUMNS) for m in members]
+    inserted = execute_values(
+        cur,
+        f"INSERT INTO members ({', '.join(_MEMBER_INSERT_COLUMNS)}) VALUES %s "
+        "ON CONFLICT (pkf_id) DO NOTHING RETURNING pkf_id",
+        values, page_size=len(values), fetch=True,
+    )
+    return {row[0]: 'inserted' for row in inserted}
+
+
+def _write_batch(cur, valid, summary, key, write_fn, missing_reason):
+    """
+    Writes one validated batch with write_fn(cur, records) -> {key: 'inserted' | 'updated'}.
+    On a database error the batch is retried one savepoint per row, so only the failing
+    rows are rejected. Records missing from the result are rejected with missing_reason.
+    """
+    failed = set()
+    cur.execute("SAVEPOINT import_batch")
+    try:
+        results = write_fn(cur, [record for _, _, record in valid])
+        cur.execute("RELEASE SAVEPOINT import_batch")
+    except Exception:
+        cur.execute("ROLLBACK TO SAVEPOINT import_batch")
+        results = {}
+        for row_number, row, record in valid:
+            cur.execute("SAVEPOINT import_row")
+            try:
+                results.update(write_fn(cur, [record]))
+                cur.execute("RELEASE SAVEPOINT import_row")
+            except Exception as e:
+                cur.execute("ROLLBACK TO SAVEPOINT import_row")
+                _reject(summary, row_number, row, key, str(e).strip().splitlines()[0])
+                failed.add(record[key])
+
+    for row_number, row, record in valid:
+        status = results.get(record[key])
+        if status:
+            summary[status] += 1
+        elif record[key] not in failed:
+            _reject(summary, row_number, row, key, missing_reason)
+
+
+def _run_import(filepath, summary, key, make_normalizer, write_fn, missing_reason,
+                batch_size, progress_callback, prepare_batch=None):
+    """
+    Shared driver: streams the sheet, normalizes rows in batches with the function
+    returned by make_normalizer(cur) (called once per import), rejects duplicate keys
+    within the file and writes each batch. Everything runs in one transaction; if the
+    import fails outright it is rolled back and nothing is written.
+    """
+    conn = get_connection()
+    if not conn:
+        raise ConnectionError("No database connection.")
+    try:
+        with conn.cursor() as cur:
+            normalize = make_normalizer(cur)
+            seen_keys = set()
+            for batch in _batched(iter_sheet_rows(filepath), batch_size):
+                valid = []
+                for row_number, row in batch:
+                    try:
+                        record = normalize(row)
+                    except RowRejected as e:
+                        _reject(summary, row_number, row, key, str(e))
+                        continue
+                    if record.get(key) is not None:
+                        if record[key] in seen_keys:
+                            _reject(summary, row_number, row, key, f"Duplicate {key} in file.")
+                            continue
+                        seen_keys.add(record[key])
+                    valid.append((row_number, row, record))
+
+                if valid:
+                    if prepare_batch:
+                        prepare_batch(cur, [record for _, _, record in valid])
+                        # Keys assigned by prepare_batch count as seen: a later row cannot reuse them
+                        seen_keys.update(record[key] for _, _, record in valid if record.get(key) is not None)
+                    _write_batch(cur, valid, summary, key, write_fn, missing_reason)
+                summary['processed'] += len(batch)
+                if progress_callback:
+                    progress_callback(summary['processed'])
+        conn.commit()
+        invalidate_stats_cache()
+        return summary
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def import_members_from_excel(filepath, batch_size=DEFAULT_BATCH_SIZE, progress_callback=None):
+    """
+    Imports members from an .xlsx file in one transaction.
+
+    Returns a summary dict: {'inserted': int, 'rejected': [{'row', 'id', 'reason', 'values'}],
+    'processed': int}. Rows whose pkf_id already exists (in the database or earlier in
+    the file) are rejected, not updated. progress_callback(processed_rows) is called
+    after each batch.
+    """
+    def make_normalizer(cur):
+        # Club names are resolved to ids with a single query for the whole file.
+        cur.execute("SELECT name, id FROM clubs WHERE name IS NOT NULL")
+        clubs_map = dict(cur.fetchall())
+        return lambda row: normalize_member_row(row, clubs_map)
+
+    summary = {'inserted': 0, 'rejected': [], 'processed': 0}
+    return _run_import(filepath, summary, 'pkf_id', make_normalizer, _insert_members, "pkf_id already exists.",
+                       batch_size, progress_callback)
+
+
+# --- Clubs ---
+CLUB_IMPORT_COLUMNS = (
+    'club_membership_id', 'name', 'representative_name', 'representative_gender',
+    'address', 'phone', 'email', 'classification', 'points',
+    'affiliation_date', 'subscription_expiry_date',
+    'club_subscription_fee', 'admin_subscription_fee',
+)
+CLUB_DATE_KEYS = ('affiliation_date', 'subscription_expiry_date')
+
+
+def normalize_club_row(row):
+    """Converts one sheet row into a clubs row dict, raising RowRejected on invalid data."""
+    club = {}
+    for key in CLUB_IMPORT_COLUMNS:
+        value = _clean(row.get(key))
+        if isinstance(value, float) and value.is_integer() and key not in ('club_subscription_fee', 'admin_subscription_fee'):
+            value = int(value)
+        club[key] = value
+
+    if not club['name']:
+        raise RowRejected("Club 'name' is missing.")
+    for key in CLUB_DATE_KEYS:
+        if club[key] is not None:
+            club[key] = _normalize_date(club[key], key)
+    try:
+        if club['points'] is not None:
+            club['points'] = int(club['points'])
+        for key in ('club_subscription_fee', 'admin_subscription_fee'):
+            if club[key] is not None:
+                club[key] = float(club[key])
+    except (TypeError, ValueError):
+        raise RowRejected("points and subscription fees must be numbers.")
+    for key, value in club.items():
+        if value is not None and key not in ('points', 'club_subscription_fee', 'admin_subscription_fee'):
+            club[key] = str(value)
+    return club
+
+
+def _assign_club_membership_ids(cur, clubs):
+    """
+    Allocates IDs for every club in the batch that has none, with one sequence query.
+    The sequence is first moved past the explicit IDs of the batch and the stored clubs,
+    so an allocated ID never names an existing club. Allocated records are marked 'allocated'.
+    """
+    missing = [club for club in clubs if not club['club_membership_id']]
+    if not missing:
+        return
+    advance_club_membership_id_seq(cur, [club['club_membership_id'] for club in clubs if club['club_membership_id']])
+    for club, new_id in zip(missing, allocate_club_membership_ids(cur, len(missing))):
+        club['club_membership_id'] = new_id
+        club['allocated'] = True
+
+
+def _upsert_clubs(cur, clubs):
+    """
+    Inserts new clubs and updates existing ones (matched on club_membership_id).
+    Empty cells keep the stored value. Clubs with a newly allocated ID are only
+    inserted: if the ID exists after all, the insert fails and the row is rejected
+    instead of overwriting another club. Returns {club_membership_id: 'inserted' | 'updated'}.
+    """
+    template = f"({', '.join(['%s'] * len(CLUB_IMPORT_COLUMNS))}, '{{}}')"
+    insert = f"INSERT INTO clubs ({', '.join(CLUB_IMPORT_COLUMNS)}, attachments_data) VALUES %s "
+    results = {}
+    allocated = [club for club in clubs if club.get('allocated')]
+    if allocated:
+        values = [tuple(club[c] for c in CLUB_IMPORT_COLUMNS) for club in allocated]
+        rows = execute_values(cur, insert + "RETURNING club_membership_id", values, template=template,
+                              page_size=len(values), fetch=True)
+        results.update((row[0], 'inserted') for row in rows)
+    explicit = [club for club in clubs if not club.get('allocated')]
+    if explicit:
+        updates = ", ".join(f"{c} = COALESCE(EXCLUDED.{c}, clubs.{c})" for c in CLUB_IMPORT_COLUMNS[1:])
+        values = [tuple(club[c] for c in CLUB_IMPORT_COLUMNS) for club in explicit]
+        rows = execute_values(
+            cur,
+            insert + f"ON CONFLICT (club_membership_id) DO UPDATE SET {updates} "
+            "RETURNING club_membership_id, (xmax = 0) AS inserted",
+            values, template=template, page_size=len(values), fetch=True,
+        )
+        results.update((row[0], 'inserted' if row[1] else 'updated') for row in rows)
+    return results
+
+
+def import_clubs_from_excel(filepath, batch_size=DEFAULT_BATCH_SIZE, progress_callback=None):
+    """
+    Imports the club registry from an .xlsx file in one transaction.
+
+    Rows with a club_membership_id update the matching club (or insert it); rows without
+    one get a newly allocated ID. Returns {'inserted': int, 'updated': int,
+    'rejected': [{'row', 'id', 'reason', 'values'}], 'processed': int}.
+    Raises ValueError while the stored clubs have duplicate IDs (see database.duplicate_club_membership_ids).
+    """
+    duplicates = duplicate_club_membership_ids()
+    if duplicates:
+        # The upsert needs the unique index that init_db could not create
+        raise ValueError(duplicate_club_membership_ids_message(duplicates))
+    summary = {'inserted': 0, 'updated': 0, 'rejected': [], 'processed': 0}
+    return _run_import(filepath, summary, 'club_membership_id', lambda cur: normalize_club_row,
+                       _upsert_clubs, "Club was not written.", batch_size, progress_callback,
+                       prepare_batch=_assign_club_membership_ids)
+
+
+def write_rejects_report(rejected, filepath):
+    """Writes rejected rows (row number, reason and the original cell values) to an .xlsx file."""
+    value_headers = []
+    for item in rejected:
+        for key in item['values']:
+            if key not in value_headers:
+                value_headers.append(key)
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Rejected Rows")
+    ws.append(['row', 'reason'] + value_headers)
+    for item in rejected:
+        ws.append([item['row'], item['reason']] + [_cell_value(item['values'].get(h)) for h in value_headers])
+    wb.save(filepath)
+    return filepath
+
+
+def _cell_value(value):
+    return value if value is None or isinstance(value, (str, int, float, bool, date, datetime)) else str(value)
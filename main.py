@@ -1,31 +1,32 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
-import csv
-import json
 import random
 import os
 import shutil
 import threading
 from queue import Queue, Empty
 from datetime import datetime, timedelta
-from openpyxl import Workbook
-from database import init_db, get_all_members, get_all_clubs, add_club, add_member, get_next_pkf_id, get_next_club_membership_id, delete_fake_data, delete_all_data
+from database import init_db, duplicate_club_membership_ids, duplicate_club_membership_ids_message, get_all_clubs, add_club, add_member, get_next_pkf_id, get_next_club_membership_id, delete_fake_data, delete_all_data
 from ui_forms import AddMemberFrame, CollapsibleFrame
 from ui_alerts import AlertsFrame
 from ui_reports import ReportsFrame
 from ui_clubs import AddClubFrame
+from db_pool import close_pool
+from exporters import export_members
 
 try:
     from faker import Faker
 except ImportError:
     Faker = None # Will be handled in the function
 
+APP_TITLE = "PKF - Palestine Karate Federation Database"
+
 class App(ctk.CTk):
     def __init__(self):
         super().__init__()
 
         # --- Window Setup ---
-        self.title("PKF - Palestine Karate Federation Database")
+        self.title(APP_TITLE)
         self.geometry("1200x750")
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(1, weight=1)
@@ -92,33 +93,64 @@ class App(ctk.CTk):
         self.reports_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
     def _process_export_queue(self):
-        """Processes results from the background export worker thread."""
+        """Processes every result queued by the background export workers since the last tick."""
         try:
-            result_type, data = self.export_queue.get_nowait()
-            if result_type == "export_finished":
-                filepath = data
-                messagebox.showinfo("Success", f"Data exported successfully to:\n{filepath}")
-            elif result_type == "export_error":
-                error_message = data
-                messagebox.showerror("Export Error", f"An error occurred during export: {error_message}")
-            elif result_type == "download_finished":
-                copied, missing, errors = data
-                message = f"Download complete.\n\nSuccessfully copied: {copied} files.\nMissing or failed: {missing} files."
-                if errors:
-                    print("\n--- Attachment Download Errors ---")
-                    for error in errors:
-                        print(error)
-                    message += "\n\nSome files could not be copied. Check the console for details."
-                messagebox.showinfo("Download Complete", message)
-            elif result_type == "download_error":
-                error_message = data
-                messagebox.showerror("Download Error", f"An error occurred during download: {error_message}")
+            while True:
+                self._handle_export_result(*self.export_queue.get_nowait())
         except Empty:
             pass
         finally:
             # Reschedule the poller
             self.after(100, self._process_export_queue)
 
+    def _handle_export_result(self, result_type, data):
+        """Handles one (result_type, data) message from a background export worker."""
+        if result_type == "export_progress":
+            done, total = data
+            self.title(f"{APP_TITLE} — Exporting {done}/{total}")
+        elif result_type == "export_finished":
+            self.title(APP_TITLE)
+            filepath = data
+            messagebox.showinfo("Success", f"Data exported successfully to:\n{filepath}")
+        elif result_type == "export_error":
+            self.title(APP_TITLE)
+            error_message = data
+            messagebox.showerror("Export Error", f"An error occurred during export: {error_message}")
+        elif result_type == "download_progress":
+            done, total = data
+            self.title(f"{APP_TITLE} — Exporting attachments {done}/{total}")
+        elif result_type == "download_finished":
+            self.title(APP_TITLE)
+            filepath, summary = data
+            missing = summary['missing']
+            message = (f"Download complete.\n\n{summary['written']} files from {summary['owners']} members/clubs "
+                       f"saved to:\n{filepath}\nMissing: {len(missing)} files.")
+            if missing:
+                message += "\n\n" + "\n".join(f"{owner_id} ({category}): {name}" for owner_id, category, name, _ in missing[:10])
+                if len(missing) > 10:
+                    message += f"\n... and {len(missing) - 10} more."
+                message += "\n\nSee manifest.csv in the ZIP for the full list."
+            messagebox.showinfo("Download Complete", message)
+        elif result_type == "cards_progress":
+            done, total = data
+            self.title(f"{APP_TITLE} — Printing cards {done}/{total}")
+        elif result_type == "cards_finished":
+            self.title(APP_TITLE)
+            filepath, summary = data
+            message = f"{summary['written']} cards saved to:\n{filepath}"
+            if 'pages' in summary:
+                message += f"\n\n{summary['pages']} pages, {summary['per_page']} cards per sheet."
+            if summary['failed']:
+                message += f"\n\nFailed ({len(summary['failed'])}):\n" + "\n".join(f"{pkf_id}: {error}" for pkf_id, error in summary['failed'][:10])
+            messagebox.showinfo("Cards Ready", message)
+        elif result_type == "cards_error":
+            self.title(APP_TITLE)
+            messagebox.showerror("Card Printing Error", f"An error occurred while printing cards: {data}")
+        elif result_type == "download_error":
+            self.title(APP_TITLE)
+            error_message = data
+            messagebox.showerror("Download Error", f"An error occurred during download: {error_message}")
+
     def _show_faker_install_message(self):
         """Shows a message box explaining how to install the Faker library."""
         messagebox.showinfo(
@@ -426,20 +458,6 @@ class App(ctk.CTk):
 
         messagebox.showinfo("Success", f"Successfully added {len(all_clubs)} fake clubs and {len(all_member_roles_to_create)} fake member entries.")
 
-    def _flatten_dict(self, d: dict, parent_key: str = '', sep: str = '_') -> dict:
-        """
-        Flattens a nested dictionary for CSV/Excel export.
-        Example: {'a': 1, 'c': {'a': 2, 'b': {'x': 5}}} -> {'a': 1, 'c_a': 2, 'c_b_x': 5}
-        """
-        items = []
-        for k, v in d.items():
-            new_key = parent_key + sep + k if parent_key else k
-            if isinstance(v, dict) and v:
-                items.extend(self._flatten_dict(v, new_key, sep=sep).items())
-            else:
-                items.append((new_key, v))
-        return dict(items)
-
     def _export_data_worker(self, filepath):
         """Worker function to handle the data processing and file saving in the background."""
         try:
@@ -463,63 +481,9 @@ class App(ctk.CTk):
         thread.start()
 
     def _process_and_save_data(self, filepath):
-        """The actual logic for processing and saving the data, to be called by the worker."""
-        members = get_all_members()
-        if not members:
-            raise ValueError("There is no data to export.")
-
-        # Flatten the data
-        processed_data = []
-        for member in members:
-            try:
-                specific_data = json.loads(member.get('specific_data', '{}'))
-                flat_specific_data = self._flatten_dict(specific_data)
-                member.update(flat_specific_data)
-            except (json.JSONDecodeError, AttributeError):
-                pass # Ignore if specific_data is not valid JSON
-            if 'specific_data' in member:
-                del member['specific_data'] # Remove the original JSON field
-            processed_data.append(member)
-
-        # --- Define headers dynamically ---
-        preferred_order = [
-            'pkf_id', 'full_name', 'full_name_ar', 'id_number', 'role', 'club_name', 
-            'admin_title', 'dob', 'expiry_date', 'current_belt', 'phone', 'email', 'notes', 'club_id',
-            'passport_number', 'passport_expiry_date'
-        ]
-
-        all_available_headers = set()
-        for member in processed_data:
-            all_available_headers.update(member.keys())
-
-        headers = []
-        for h in preferred_order:
-            if h in all_available_headers:
-                headers.append(h)
-        headers.extend(sorted([h for h in all_available_headers if h not in headers]))
-
-        if filepath.endswith('.xlsx'):
-            # Export to Excel
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "PKF Members"
-            ws.append(headers)
-            for member in processed_data:
-                row = [member.get(h, "") for h in headers]
-                ws.append(row)
-            wb.save(filepath)
-
-        elif filepath.endswith('.csv'):
-            # Export to CSV
-            with open(filepath, 'w', newline='', encoding='utf-8-sig') as f:
-                writer = csv.DictWriter(f, fieldnames=headers)
-                writer.writeheader()
-                for member in processed_data:
-                    filtered_member = {k: member.get(k, "") for k in headers}
-                    writer.writerow(filtered_member)
-        else:
-            raise ValueError("Unsupported file format. Please use .xlsx or .csv.")
-
+        """The actual logic for processing and saving the data, to be called by the worker.
+        Rows are streamed from the database straight into the file (see exporters.py)."""
+        export_members(filepath, progress_callback=lambda done, total: self.export_queue.put(("export_progress", (done, total))))
 
 import sqlite3
 
@@ -673,4 +637,7 @@ if __name__ == "__main__":
     migrate_db() # Ensure the schema is up-to-date
     init_db()  # Ensure the database and table are created before the app runs
     app = App()
+    if duplicate_club_membership_ids():
+        messagebox.showwarning("Duplicate Club IDs", duplicate_club_membership_ids_message(duplicate_club_membership_ids()))
     app.mainloop()
+    close_pool()  # Close pooled database connections on exit
@@ -0,0 +1,181 @@
+"""
+Member photo ingestion.
+
+At upload time a photo is decoded once and stored as three files in the
+member's folder:
+
+    personal_photo.jpg        master: EXIF orientation applied, RGB JPEG, capped at MASTER_MAX_SIDE
+    personal_photo.card.jpg   card resolution (CARD_PHOTO_SIZE, cropped to the card's photo box)
+    personal_photo.thumb.jpg  thumbnail (fits THUMB_SIZE) for the desktop and web UIs
+
+members.photo_path points at the master; readers ask photo_variant() for the
+size they need and fall back to the master for photos that were never ingested.
+
+Backfill existing photos once with:
+    python photos.py [--dry-run]
+"""
+import argparse
+import io
+import os
+
+from PIL import Image, ImageOps
+
+MEMBER_FILES_DIR = os.path.join("assets", "member_files")
+PHOTO_BASENAME = "personal_photo"
+
+MASTER_MAX_SIDE = 3000
+CARD_PHOTO_SIZE = (300, 380)   # ~25.4 x 32 mm at 300 dpi, the aspect ratio of the card photo boxes
+THUMB_SIZE = (150, 150)
+VARIANTS = ('card', 'thumb')
+
+_JPEG_QUALITY = {'master': 92, 'card': 90, 'thumb': 85}
+
+
+def member_files_dir(pkf_id):
+    """assets/member_files/<sanitized pkf_id>, created if needed."""
+    safe_pkf_id = "".join(c for c in str(pkf_id) if c.isalnum() or c in ('-', '_')).rstrip()
+    if not safe_pkf_id:
+        raise ValueError("A Membership No. (PKF ID) is required to store member files.")
+    path = os.path.join(MEMBER_FILES_DIR, safe_pkf_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def variant_path(master_path, variant):
+    """Path of a pre-sized variant ('card' or 'thumb') stored next to the master."""
+    stem, _ = os.path.splitext(master_path)
+    return f"{stem}.{variant}.jpg"
+
+
+def photo_variant(photo_path, variant):
+    """
+    The pre-sized variant of a member photo when it exists and is up to date,
+    otherwise the photo itself; None when there is no photo on disk.
+    """
+    if not photo_path:
+        return None
+    try:
+        master_mtime = os.stat(photo_path).st_mtime_ns
+    except OSError:
+        return None
+    path = variant_path(photo_path, variant)
+    try:
+        if os.stat(path).st_mtime_ns >= master_mtime:
+            return path
+    except OSError:
+        pass
+    return photo_path
+
+
+def _normalized(source):
+    """Decodes a path, bytes or file object into an upright RGB image (alpha flattened onto white)."""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            return background
+        return image.convert('RGB')
+
+
+def _save_jpeg(image, path, variant):
+    tmp_path = f"{path}.tmp"
+    image.save(tmp_path, format='JPEG', quality=_JPEG_QUALITY[variant], optimize=True)
+    os.replace(tmp_path, path)
+
+
+def write_variants(image, master_path):
+    """Writes the card and thumbnail variants of an already normalized image."""
+    card = ImageOps.fit(image, CARD_PHOTO_SIZE, Image.LANCZOS, centering=(0.5, 0.35))
+    _save_jpeg(card, variant_path(master_path, 'card'), 'card')
+    thumb = image.copy()
+    thumb.thumbnail(THUMB_SIZE, Image.LANCZOS)
+    _save_jpeg(thumb, variant_path(master_path, 'thumb'), 'thumb')
+
+
+def ingest_photo(source, dest_dir, basename=PHOTO_BASENAME):
+    """
+    Stores an uploaded photo (path, bytes or file object) as master + variants in
+    dest_dir and returns the master's path, to be saved as members.photo_path.
+    Raises ValueError if the file is not a readable image.
+    """
+    try:
+        image = _normalized(source)
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError(f"The selected file is not a readable image: {e}")
+    if max(image.size) > MASTER_MAX_SIDE:
+        image.thumbnail((MASTER_MAX_SIDE, MASTER_MAX_SIDE), Image.LANCZOS)
+    os.makedirs(dest_dir, exist_ok=True)
+    master_path = os.path.join(dest_dir, f"{basename}.jpg")
+    _save_jpeg(image, master_path, 'master')
+    write_variants(image, master_path)
+    return master_path
+
+
+def ingest_member_photo(source, pkf_id):
+    """ingest_photo() into the member's assets folder."""
+    return ingest_photo(source, member_files_dir(pkf_id))
+
+
+def _is_master(photo_path):
+    stem, ext = os.path.splitext(photo_path)
+    return ext.lower() == '.jpg' and os.path.basename(stem) == PHOTO_BASENAME
+
+
+def _variants_current(photo_path):
+    return all(photo_variant(photo_path, v) != photo_path for v in VARIANTS)
+
+
+def backfill_photos(dry_run=False, progress_callback=None):
+    """
+    Ingests every existing member photo that has no master/variants yet and points
+    members.photo_path at the new master. Original files are left in place.
+    Returns {'processed', 'ingested', 'missing', 'failed': [(pkf_id, error), ...]}.
+    """
+    from database import get_member_photo_paths, update_member_photo_paths
+
+    rows = get_member_photo_paths()
+    summary = {'processed': 0, 'ingested': 0, 'missing': 0, 'failed': []}
+    updates = []
+    for member_id, pkf_id, photo_path in rows:
+        summary['processed'] += 1
+        if not os.path.exists(photo_path):
+            summary['missing'] += 1
+        elif not (_is_master(photo_path) and _variants_current(photo_path)):
+            try:
+                if dry_run:
+                    pass
+                elif _is_master(photo_path):
+                    write_variants(_normalized(photo_path), photo_path)  # Only the variants are missing
+                else:
+                    updates.append((member_id, ingest_photo(photo_path, os.path.dirname(photo_path))))
+                summary['ingested'] += 1
+            except (OSError, ValueError) as e:
+                summary['failed'].append((pkf_id, str(e)))
+        if progress_callback:
+            progress_callback(summary['processed'], len(rows))
+    update_member_photo_paths(updates)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create the master, card and thumbnail variants for existing member photos.")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be processed")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        if done % 100 == 0 or done == total:
+            print(f"{done}/{total} photos checked")
+
+    summary = backfill_photos(dry_run=args.dry_run, progress_callback=progress)
+    action = "would be ingested" if args.dry_run else "ingested"
+    print(f"{summary['ingested']} photos {action}, {summary['missing']} missing files, {len(summary['failed'])} failed.")
+    for pkf_id, error in summary['failed']:
+        print(f"  {pkf_id}: {error}")
+
+
+if __name__ == "__main__":
+    main()
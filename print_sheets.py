@@ -0,0 +1,267 @@
+"""
+Print-sheet imposition: many cards per A4 page in one PDF.
+
+Cards from card_renderer are laid out in a grid on each A4 sheet (10 per page
+with the defaults). Every card is extended by a bleed margin, crop marks are
+drawn in the page margins at the trim lines, and with duplex printing each
+front page is followed by a back page with the card backs mirrored into the
+matching slots.
+
+The PDF is written page by page straight to the output, with each card
+embedded once as a JPEG, so memory use does not grow with the selection: a
+500-member club prints as one 50-page job.
+"""
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image
+
+from card_renderer import CARD_DPI, CARD_SIZE_MM, render_card, render_card_back
+
+PAGE_SIZE_MM = (210.0, 297.0)  # A4 portrait
+DEFAULT_MARGIN_MM = 5.0
+DEFAULT_BLEED_MM = 1.5
+DUPLEX_MODES = (None, 'long', 'short')
+
+CROP_MARK_OFFSET_MM = 1.0
+CROP_MARK_LENGTH_MM = 4.0
+JPEG_QUALITY = 90
+PROGRESS_EVERY = 25  # cards between progress_callback calls (see batch_cards.PROGRESS_EVERY)
+
+_PT_PER_MM = 72 / 25.4
+
+
+def sheet_grid(bleed_mm=DEFAULT_BLEED_MM, margin_mm=DEFAULT_MARGIN_MM,
+               card_size_mm=CARD_SIZE_MM, page_size_mm=PAGE_SIZE_MM):
+    """(columns, rows) of cards, bleed included, that fit on one page inside the margins."""
+    cell_w = card_size_mm[0] + 2 * bleed_mm
+    cell_h = card_size_mm[1] + 2 * bleed_mm
+    cols = int((page_size_mm[0] - 2 * margin_mm) // cell_w)
+    rows = int((page_size_mm[1] - 2 * margin_mm) // cell_h)
+    if cols < 1 or rows < 1:
+        raise ValueError("The card does not fit on the page with these margins.")
+    return cols, rows
+
+
+def _with_bleed(image, bleed_px):
+    """Extends the card's edge pixels outwards by bleed_px on every side."""
+    if bleed_px <= 0:
+        return image
+    w, h = image.size
+    out = Image.new('RGB', (w + 2 * bleed_px, h + 2 * bleed_px))
+    out.paste(image, (bleed_px, bleed_px))
+    out.paste(image.crop((0, 0, w, 1)).resize((w, bleed_px)), (bleed_px, 0))
+    out.paste(image.crop((0, h - 1, w, h)).resize((w, bleed_px)), (bleed_px, h + bleed_px))
+    out.paste(out.crop((bleed_px, 0, bleed_px + 1, h + 2 * bleed_px)).resize((bleed_px, h + 2 * bleed_px)), (0, 0))
+    out.paste(out.crop((w + bleed_px - 1, 0, w + bleed_px, h + 2 * bleed_px)).resize((bleed_px, h + 2 * bleed_px)), (w + bleed_px, 0))
+    return out
+
+
+def _jpeg(image):
+    buffer = io.BytesIO()
+    # 4:4:4 sampling keeps small coloured text sharp.
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, subsampling=0)
+    return image.size, buffer.getvalue()
+
+
+def _render_sheet_card(member_data, bleed_mm, dpi, with_back):
+    """Runs in a worker process; never raises so one bad card does not stop the job."""
+    try:
+        bleed_px = int(round(bleed_mm * dpi / 25.4))
+        front = _jpeg(_with_bleed(render_card(member_data, dpi), bleed_px))
+        back = _jpeg(_with_bleed(render_card_back(member_data, dpi), bleed_px)) if with_back else None
+        return member_data.get('pkf_id'), front, back, None
+    except Exception as e:
+        return member_data.get('pkf_id'), None, None, str(e)
+
+
+class PdfStream:
+    """Minimal PDF writer that emits each page as soon as it is complete."""
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.pos = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.next_id = 3  # 1: catalog, 2: page tree (both written at the end)
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _write(self, data):
+        self.fh.write(data)
+        self.pos += len(data)
+
+    def _new_id(self):
+        obj_id = self.next_id
+        self.next_id += 1
+        return obj_id
+
+    def _object(self, obj_id, body, stream=None):
+        self.offsets[obj_id] = self.pos
+        self._write(f"{obj_id} 0 obj\n".encode('ascii') + body)
+        if stream is not None:
+            self._write(b"\nstream\n" + stream + b"\nendstream")
+        self._write(b"\nendobj\n")
+
+    def add_jpeg(self, size, data):
+        obj_id = self._new_id()
+        body = (f"<< /Type /XObject /Subtype /Image /Width {size[0]} /Height {size[1]} "
+                f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>")
+        self._object(obj_id, body.encode('ascii'), data)
+        return obj_id
+
+    def add_flate_gray(self, size, data):
+        """Lossless greyscale image (zlib-compressed 8-bit pixels), for line art and small text that JPEG would blur."""
+        obj_id = self._new_id()
+        body = (f"<< /Type /XObject /Subtype /Image /Width {size[0]} /Height {size[1]} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode /Length {len(data)} >>")
+        self._object(obj_id, body.encode('ascii'), data)
+        return obj_id
+
+    def add_page(self, width_pt, height_pt, content, images):
+        content_id = self._new_id()
+        self._object(content_id, f"<< /Length {len(content)} >>".encode('ascii'), content)
+        xobjects = " ".join(f"/{name} {obj_id} 0 R" for name, obj_id in images.items())
+        page_id = self._new_id()
+        self._object(page_id, (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width_pt:.2f} {height_pt:.2f}] "
+                               f"/Resources << /XObject << {xobjects} >> >> /Contents {content_id} 0 R >>").encode('ascii'))
+        self.page_ids.append(page_id)
+
+    def close(self):
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode('ascii'))
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_pos = self.pos
+        lines = [f"xref\n0 {self.next_id}\n", "0000000000 65535 f \n"]
+        lines.extend(f"{self.offsets[obj_id]:010d} 00000 n \n" for obj_id in range(1, self.next_id))
+        lines.append(f"trailer\n<< /Size {self.next_id} /Root 1 0 R >>\nstartxref\n{xref_pos}\n%%EOF\n")
+        self._write("".join(lines).encode('ascii'))
+
+
+class _SheetLayout:
+    """Page geometry in PDF points (origin at the bottom-left corner)."""
+
+    def __init__(self, cols, rows, bleed_mm):
+        self.cols, self.rows = cols, rows
+        self.page_w, self.page_h = (v * _PT_PER_MM for v in PAGE_SIZE_MM)
+        self.bleed = bleed_mm * _PT_PER_MM
+        self.card_w, self.card_h = (v * _PT_PER_MM for v in CARD_SIZE_MM)
+        self.cell_w = self.card_w + 2 * self.bleed
+        self.cell_h = self.card_h + 2 * self.bleed
+        self.x0 = (self.page_w - cols * self.cell_w) / 2
+        self.y0 = (self.page_h - rows * self.cell_h) / 2  # bottom of the grid
+
+    def cell_origin(self, row, col):
+        """Bottom-left corner of the bleed box of slot (row, col), row 0 at the top."""
+        return self.x0 + col * self.cell_w, self.y0 + (self.rows - 1 - row) * self.cell_h
+
+    def crop_marks(self):
+        """PDF path operators drawing trim marks in the margins around the grid."""
+        offset = CROP_MARK_OFFSET_MM * _PT_PER_MM
+        length = min(CROP_MARK_LENGTH_MM * _PT_PER_MM, self.x0 - offset, self.y0 - offset)
+        if length <= 0:
+            return ""
+        top, right = self.y0 + self.rows * self.cell_h, self.x0 + self.cols * self.cell_w
+        ops = []
+        for col in range(self.cols):
+            for x in (self.x0 + col * self.cell_w + self.bleed, self.x0 + col * self.cell_w + self.bleed + self.card_w):
+                ops.append(f"{x:.2f} {top + offset:.2f} m {x:.2f} {top + offset + length:.2f} l")
+                ops.append(f"{x:.2f} {self.y0 - offset:.2f} m {x:.2f} {self.y0 - offset - length:.2f} l")
+        for row in range(self.rows):
+            for y in (self.y0 + row * self.cell_h + self.bleed, self.y0 + row * self.cell_h + self.bleed + self.card_h):
+                ops.append(f"{self.x0 - offset:.2f} {y:.2f} m {self.x0 - offset - length:.2f} {y:.2f} l")
+                ops.append(f"{right + offset:.2f} {y:.2f} m {right + offset + length:.2f} {y:.2f} l")
+        return "0.25 w 0 0 0 RG\n" + "\n".join(ops) + "\nS\n"
+
+    def slot(self, index, back=False, duplex=None):
+        """(row, col) of the index-th card on a page; backs are mirrored for the chosen flip edge."""
+        row, col = divmod(index, self.cols)
+        if back and duplex == 'long':
+            col = self.cols - 1 - col
+        elif back and duplex == 'short':
+            row = self.rows - 1 - row
+        return row, col
+
+
+def _write_page(pdf, layout, cards, back, duplex, crop_marks):
+    images, ops = {}, []
+    for index, (size, data) in enumerate(cards):
+        name = f"Im{index}"
+        images[name] = pdf.add_jpeg(size, data)
+        row, col = layout.slot(index, back, duplex)
+        x, y = layout.cell_origin(row, col)
+        ops.append(f"q {layout.cell_w:.2f} 0 0 {layout.cell_h:.2f} {x:.2f} {y:.2f} cm /{name} Do Q")
+    content = "\n".join(ops) + "\n"
+    if crop_marks:
+        content += layout.crop_marks()
+    pdf.add_page(layout.page_w, layout.page_h, content.encode('ascii'), images)
+
+
+def _iter_sheet_cards(members, render, workers):
+    """Render results in selection order; workers <= 1 renders in this process."""
+    if workers <= 1:
+        for member in members:
+            yield render(member)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(render, members, chunksize=4)
+
+
+def impose_cards_pdf(members, output, duplex=None, bleed_mm=DEFAULT_BLEED_MM, margin_mm=DEFAULT_MARGIN_MM,
+                     crop_marks=True, dpi=CARD_DPI, workers=None, progress_callback=None):
+    """
+    Lays the members' cards out on A4 sheets and writes them as one PDF.
+
+    output: a file path or a writable binary file object (e.g. io.BytesIO for Streamlit).
+    duplex: None (fronts only), 'long' or 'short' (the printer's flip edge); each front
+            page is then followed by its back page.
+    progress_callback(done, total) is called every PROGRESS_EVERY cards and after the last one.
+    Returns {'written': int, 'pages': int, 'per_page': int, 'failed': [(pkf_id, error), ...]}.
+    """
+    if duplex not in DUPLEX_MODES:
+        raise ValueError(f"Unsupported duplex mode: {duplex}")
+    members = list(members)
+    total = len(members)
+    cols, rows = sheet_grid(bleed_mm, margin_mm)
+    layout = _SheetLayout(cols, rows, bleed_mm)
+    per_page = cols * rows
+    workers = max(1, min(workers or os.cpu_count() or 1, total or 1))
+    render = partial(_render_sheet_card, bleed_mm=bleed_mm, dpi=dpi, with_back=duplex is not None)
+    summary = {'written': 0, 'pages': 0, 'per_page': per_page, 'failed': []}
+
+    fh = open(output, 'wb') if isinstance(output, (str, os.PathLike)) else output
+    try:
+        pdf = PdfStream(fh)
+        fronts, backs = [], []
+
+        def flush():
+            _write_page(pdf, layout, fronts, False, duplex, crop_marks)
+            summary['pages'] += 1
+            if duplex:
+                _write_page(pdf, layout, backs, True, duplex, crop_marks)
+                summary['pages'] += 1
+            fronts.clear()
+            backs.clear()
+
+        for done, (pkf_id, front, back, error) in enumerate(_iter_sheet_cards(members, render, workers), start=1):
+            if error:
+                summary['failed'].append((pkf_id, error))
+            else:
+                fronts.append(front)
+                if back:
+                    backs.append(back)
+                summary['written'] += 1
+                if len(fronts) == per_page:
+                    flush()
+            if progress_callback and (done % PROGRESS_EVERY == 0 or done == total):
+                progress_callback(done, total)
+        if fronts:
+            flush()
+        if not summary['pages']:
+            raise ValueError("No cards could be rendered.")
+        pdf.close()
+    finally:
+        if fh is not output:
+            fh.close()
+    return summary
@@ -0,0 +1,122 @@
+"""
+Batch profile book.
+
+Writes any selection of member and club profiles into a single Word document
+(the annual roster book): a title page, a table of contents, and one profile
+per page. Profiles are consumed from an iterable of (doc_type, row) pairs, so
+callers can feed a generator that pages through the database instead of
+loading the whole selection first; the shared document styles are set up once.
+
+The table of contents is a Word TOC field. It is pre-filled with one line per
+profile, and Word refreshes it with page numbers when the document is opened.
+"""
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from docx.text.paragraph import Paragraph
+
+from bilingual_labels import (ATTACHMENT_LABELS_AR, ATTACHMENT_LABELS_EN, CLUB_LABELS_AR, CLUB_LABELS_EN,
+                              MEMBER_LABELS_AR, MEMBER_LABELS_EN, SPECIFIC_LABELS_AR, SPECIFIC_LABELS_EN)
+from database import get_all_clubs, get_members_by_pkf_ids, search_members_page
+from doc_generator import add_profile, new_profile_document, profile_heading
+
+# Label sets passed to add_profile() per profile type
+PROFILE_LABELS = {
+    'member': (MEMBER_LABELS_EN, MEMBER_LABELS_AR, ATTACHMENT_LABELS_EN, ATTACHMENT_LABELS_AR,
+               SPECIFIC_LABELS_EN, SPECIFIC_LABELS_AR),
+    'club': (CLUB_LABELS_EN, CLUB_LABELS_AR, ATTACHMENT_LABELS_EN, ATTACHMENT_LABELS_AR, {}, {}),
+}
+
+PAGE_SIZE = 500
+
+
+def iter_member_profiles(pkf_ids=None, page_size=PAGE_SIZE, **filters):
+    """
+    ('member', row) for an explicit list of pkf_ids, or for every member matching
+    the Reports filters, fetched page_size rows at a time.
+    """
+    if pkf_ids:
+        pkf_ids = list(pkf_ids)
+        for start in range(0, len(pkf_ids), page_size):
+            for member in get_members_by_pkf_ids(pkf_ids[start:start + page_size]):
+                yield 'member', member
+        return
+    after_id = None
+    while True:
+        page = search_members_page(page_size=page_size, after_id=after_id, **filters)
+        for member in page['rows']:
+            yield 'member', member
+        after_id = page['next_after_id']
+        if after_id is None:
+            return
+
+
+def iter_club_book(club_name, club=None, page_size=PAGE_SIZE):
+    """A club's profile (looked up by name unless given) followed by the profiles of all its members."""
+    if club is None:
+        club = next((c for c in get_all_clubs() if c.get('name') == club_name), None)
+    if club:
+        yield 'club', club
+    yield from iter_member_profiles(page_size=page_size, club=club_name)
+
+
+def _field_run(paragraph, fld_char_type):
+    fld_char = OxmlElement('w:fldChar')
+    fld_char.set(qn('w:fldCharType'), fld_char_type)
+    paragraph.add_run()._r.append(fld_char)
+
+
+def _add_toc(document):
+    """
+    Adds a TOC field over the level-1 headings and returns the paragraph that
+    closes it; entries are inserted before that paragraph as profiles are added.
+    """
+    document.add_paragraph('Contents - المحتويات', style='TOC Heading')
+    begin = document.add_paragraph()
+    _field_run(begin, 'begin')
+    instr = OxmlElement('w:instrText')
+    instr.set(qn('xml:space'), 'preserve')
+    instr.text = 'TOC \\o "1-1" \\h \\z \\u'
+    begin.add_run()._r.append(instr)
+    _field_run(begin, 'separate')
+    end = document.add_paragraph()
+    _field_run(end, 'end')
+
+    # Ask Word to refresh the field (page numbers) when the document is opened
+    update_fields = OxmlElement('w:updateFields')
+    update_fields.set(qn('w:val'), 'true')
+    document.settings.element.append(update_fields)
+    return end
+
+
+def _add_toc_entry(toc_end, text):
+    entry = OxmlElement('w:p')
+    toc_end._p.addprevious(entry)
+    Paragraph(entry, toc_end._parent).add_run(text)
+
+
+def generate_profile_book(profiles, output, title="PKF Profile Book - كتاب الملفات الشخصية", progress_callback=None):
+    """
+    Writes the profiles into one Word document.
+
+    profiles: iterable of (doc_type, row) with doc_type 'member' or 'club',
+    e.g. iter_member_profiles() or iter_club_book().
+    output: a file path or a writable binary file object (e.g. io.BytesIO for Streamlit).
+    progress_callback(done) is called after every profile.
+    Returns {'members': int, 'clubs': int}.
+    """
+    document = new_profile_document()
+    heading = document.add_heading(title, level=0)
+    heading.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    toc_end = _add_toc(document)
+
+    counts = {'member': 0, 'club': 0}
+    for done, (doc_type, data) in enumerate(profiles, start=1):
+        add_profile(document, data, *PROFILE_LABELS[doc_type], doc_type=doc_type, book=True)
+        _add_toc_entry(toc_end, profile_heading(data, doc_type))
+        counts[doc_type] += 1
+        if progress_callback:
+            progress_callback(done)
+
+    document.save(output)
+    return {'members': counts['member'], 'clubs': counts['club']}
@@ -0,0 +1,217 @@
+"""
+Signed QR payloads for member cards.
+
+A card's QR code carries a compact, signed payload:
+
+    PKF1:<pkf_id>:<expiry YYYYMMDD or 0>:<signature>
+
+The signature is an HMAC-SHA256 of "<pkf_id>:<expiry>" with a key kept in a
+local file (config.QR_KEY_FILE, created on first use), truncated to 80 bits and
+base32-encoded. Everything except the pkf_id is upper-case alphanumeric, so the
+code stays small. verify_payload() needs nothing but the key file, so check-in
+desks can validate scans offline.
+
+QR bitmaps are cached in memory by payload hash, so reprinting or previewing a
+card never re-runs the QR encoder.
+"""
+import base64
+import datetime
+import hashlib
+import hmac
+import io
+import os
+import secrets
+import tempfile
+import threading
+from collections import OrderedDict
+
+import qrcode
+from PIL import Image
+
+from config import QR_KEY_FILE
+
+PAYLOAD_PREFIX = "PKF1"
+SIGNATURE_BYTES = 10
+NO_EXPIRY = "0"
+QR_CACHE_SIZE = 4096
+
+_key_lock = threading.Lock()
+_signer = None  # hmac object for the loaded key; copied for every signature
+
+
+def load_signing_key(path=QR_KEY_FILE):
+    """
+    Reads the local signing key, creating it (readable by the owner only) on first use.
+
+    A new key is written to a temp file next to path and published with os.link(),
+    which fails if the key already exists, so concurrent first uses agree on one key
+    and no reader ever sees a partly written file.
+    """
+    try:
+        return _read_signing_key(path)
+    except FileNotFoundError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".qr_key_")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secrets.token_bytes(32))
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass  # another process published its key first; use that one
+    finally:
+        os.remove(tmp_path)
+    return _read_signing_key(path)
+
+
+def _read_signing_key(path):
+    with open(path, 'rb') as f:
+        key = f.read()
+    if len(key) < 16:
+        raise ValueError(f"QR signing key file is invalid: {path}")
+    return key
+
+
+def _get_signer(key=None):
+    global _signer
+    if key is not None:
+        return hmac.new(key, digestmod=hashlib.sha256)
+    if _signer is None:
+        with _key_lock:
+            if _signer is None:
+                _signer = hmac.new(load_signing_key(), digestmod=hashlib.sha256)
+    return _signer
+
+
+def _signature(pkf_id, expiry, key=None):
+    mac = _get_signer(key).copy()
+    mac.update(f"{pkf_id}:{expiry}".encode('utf-8'))
+    return base64.b32encode(mac.digest()[:SIGNATURE_BYTES]).decode('ascii')
+
+
+def _expiry_token(expiry):
+    """YYYYMMDD for a date or an ISO date string; NO_EXPIRY when there is no (valid) date."""
+    if not expiry:
+        return NO_EXPIRY
+    if isinstance(expiry, (datetime.date, datetime.datetime)):
+        return expiry.strftime("%Y%m%d")
+    try:
+        return datetime.date.fromisoformat(str(expiry).strip()[:10]).strftime("%Y%m%d")
+    except ValueError:
+        return NO_EXPIRY
+
+
+def make_payload(pkf_id, expiry=None, key=None):
+    """Signed QR payload for a member ID and optional expiry date."""
+    pkf_id = str(pkf_id or "").strip()
+    if not pkf_id:
+        raise ValueError("A pkf_id is required to sign a QR payload.")
+    expiry = _expiry_token(expiry)
+    return f"{PAYLOAD_PREFIX}:{pkf_id}:{expiry}:{_signature(pkf_id, expiry, key)}"
+
+
+def member_payload(member_data, key=None):
+    """Signed QR payload for a member row (pkf_id + expiry_date)."""
+    return make_payload(member_data.get('pkf_id'), member_data.get('expiry_date'), key)
+
+
+def verify_payload(payload, today=None, key=None):
+    """
+    Validates a scanned payload without any database access.
+    Returns {'valid': bool, 'pkf_id': str|None, 'expiry': date|None, 'reason': str|None};
+    reason is one of 'malformed', 'bad_signature', 'expired'.
+    """
+    result = {'valid': False, 'pkf_id': None, 'expiry': None, 'reason': 'malformed'}
+    parts = (payload or "").strip().split(':')
+    if len(parts) < 4 or parts[0] != PAYLOAD_PREFIX:
+        return result
+    pkf_id, expiry, signature = ':'.join(parts[1:-2]), parts[-2], parts[-1]
+    if expiry != NO_EXPIRY:
+        if len(expiry) != 8 or not expiry.isdigit():
+            return result
+        try:
+            result['expiry'] = datetime.date(int(expiry[:4]), int(expiry[4:6]), int(expiry[6:8]))
+        except ValueError:
+            return result
+    if not hmac.compare_digest(signature, _signature(pkf_id, expiry, key)):
+        result['reason'] = 'bad_signature'
+        result['expiry'] = None
+        return result
+    result['pkf_id'] = pkf_id
+    if result['expiry'] is not None and result['expiry'] < (today or datetime.date.today()):
+        result['reason'] = 'expired'
+        return result
+    result['valid'] = True
+    result['reason'] = None
+    return result
+
+
+def verify_payloads(payloads, today=None, key=None):
+    """verify_payload() over a batch of scans (e.g. a check-in desk's queue)."""
+    today = today or datetime.date.today()
+    return [verify_payload(p, today, key) for p in payloads]
+
+
+# --- Cached QR bitmaps ---
+_qr_cache = OrderedDict()  # (payload sha256, size) -> PIL image / PNG bytes
+_qr_cache_lock = threading.Lock()
+_qr_stats = {'hits': 0, 'misses': 0}
+
+
+def _cached(key, build):
+    with _qr_cache_lock:
+        value = _qr_cache.get(key)
+        if value is not None:
+            _qr_cache.move_to_end(key)
+            _qr_stats['hits'] += 1
+            return value
+        _qr_stats['misses'] += 1
+    value = build()
+    with _qr_cache_lock:
+        _qr_cache[key] = value
+        while len(_qr_cache) > QR_CACHE_SIZE:
+            _qr_cache.popitem(last=False)
+    return value
+
+
+def _payload_hash(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _qr_modules(payload):
+    """One pixel per module (1-module quiet zone), black on white."""
+    qr = qrcode.QRCode(border=1, box_size=1)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").get_image().convert('L')
+
+
+def _modules_for(digest, payload):
+    return _cached((digest, None), lambda: _qr_modules(payload))
+
+
+def qr_image(payload, size_px):
+    """RGB QR bitmap of size_px x size_px; callers must not modify the returned image."""
+    digest = _payload_hash(payload)
+    return _cached((digest, size_px),
+                   lambda: _modules_for(digest, payload).resize((size_px, size_px), Image.NEAREST).convert('RGB'))
+
+
+def qr_png_bytes(payload, box_size=10):
+    """PNG-encoded QR code (e.g. for a DocxTemplate InlineImage)."""
+    digest = _payload_hash(payload)
+
+    def build():
+        modules = _modules_for(digest, payload)
+        size = modules.size[0] * box_size
+        buffer = io.BytesIO()
+        modules.resize((size, size), Image.NEAREST).save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+    return _cached((digest, 'png', box_size), build)
+
+
+def qr_cache_stats():
+    with _qr_cache_lock:
+        return dict(_qr_stats, entries=len(_qr_cache))
@@ -0,0 +1,198 @@
+"""
+Content-addressed cache for rendered card documents.
+
+A card's key is the SHA-256 of its template context, the template version
+(path, mtime, size) and the photo bytes, so reprinting an unchanged card returns
+the stored artifact instead of rendering it again. Entries live under
+<output dir>/.cache/<key[:2]>/<key><suffix>; named output files are hard links to
+them where the filesystem allows it.
+
+Eviction is LRU by mtime (touched on every hit) and covers every artifact in the
+output directory, named files included; hard links to the same entry are
+counted and removed together. The cache is shared between processes through the
+filesystem, while the hit/miss counters are per process.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+
+from config import RENDER_CACHE_MAX_MB
+
+# Eviction trims the directory down to this fraction of max_bytes, so it does not run on every put.
+_LOW_WATER = 0.8
+
+
+class RenderCache:
+    def __init__(self, root, suffix='.docx', max_bytes=RENDER_CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.store = os.path.join(root, '.cache')
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._digests = {}          # (path, mtime_ns, size) -> sha256 of the file
+        self._approx_bytes = None   # bytes on disk, measured by the first eviction scan
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evicted_files': 0, 'evicted_bytes': 0}
+
+    # --- Keys ---
+    def file_digest(self, path):
+        """SHA-256 of a file, remembered while its mtime and size stay the same."""
+        stat = os.stat(path)
+        stamp = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(stamp)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    h.update(block)
+            digest = h.hexdigest()
+            with self._lock:
+                self._digests[stamp] = digest
+        return digest
+
+    def make_key(self, context, template_version, photo_path=None, **extra):
+        """
+        Cache key for one render. `context` must hold plain values (no InlineImage);
+        `extra` carries anything else that changes the output, such as a renderer version.
+        """
+        payload = {
+            'context': context,
+            'template': template_version,
+            'photo': self.file_digest(photo_path) if photo_path else None,
+            'extra': extra,
+        }
+        data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    # --- Entries ---
+    def _entry_path(self, key):
+        return os.path.join(self.store, key[:2], key + self.suffix)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, key):
+        """The cached bytes for `key`, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        self._touch(path)
+        self._count('hits')
+        return content
+
+    def put(self, key, content, link_to=None):
+        """
+        Stores a rendered artifact (atomically, so concurrent processes never see a
+        partial file) and optionally points the named file `link_to` at it.
+        """
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        if link_to:
+            self._link(path, link_to)
+        self._count('stores')
+        self._grow(len(content))
+        return path
+
+    def _link(self, path, dest_path):
+        """Hard-links dest_path to the entry, or copies it where links are not supported."""
+        if os.path.exists(dest_path) and os.path.samefile(path, dest_path):
+            return
+        tmp_path = f"{dest_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.link(path, tmp_path)
+        except OSError:
+            shutil.copyfile(path, tmp_path)
+            self._grow(os.path.getsize(tmp_path))
+        os.replace(tmp_path, dest_path)
+
+    def link(self, key, dest_path):
+        """Points the named file `dest_path` at the cached artifact for `key`; returns False on a miss."""
+        path = self._entry_path(key)
+        try:
+            self._link(path, dest_path)
+        except FileNotFoundError:
+            self._count('misses')
+            return False
+        self._touch(path)
+        self._count('hits')
+        return True
+
+    # --- Eviction ---
+    def _grow(self, size):
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += size
+            over = self._approx_bytes is None or self._approx_bytes > self.max_bytes
+        if over:
+            self.evict()
+
+    def _scan(self):
+        """{inode: [mtime, size, [paths]]} for every artifact under the output directory."""
+        files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith(self.suffix):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entry = files.setdefault((stat.st_dev, stat.st_ino), [stat.st_mtime, stat.st_size, []])
+                entry[2].append(path)
+        return files
+
+    def evict(self):
+        """Deletes the least recently used artifacts until the directory fits in max_bytes."""
+        files = self._scan()
+        total = sum(size for _, size, _ in files.values())
+        if total > self.max_bytes:
+            target = self.max_bytes * _LOW_WATER
+            for mtime, size, paths in sorted(files.values(), key=lambda e: e[0]):
+                if total <= target:
+                    break
+                for path in paths:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass  # Open on Windows or already removed by another process
+                total -= size
+                self._count('evicted_files')
+                self._count('evicted_bytes', size)
+        with self._lock:
+            self._approx_bytes = total
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current size of the output directory."""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        files = self._scan()
+        stats['files'] = len(files)
+        stats['bytes'] = sum(size for _, size, _ in files.values())
+        stats['max_bytes'] = self.max_bytes
+        return stats
+
+    def report(self):
+        s = self.stats()
+        return (f"render cache {self.root}: hits={s['hits']} misses={s['misses']} "
+                f"hit_rate={s['hit_rate']:.1%} files={s['files']} size={s['bytes'] / 1048576:.1f}/"
+                f"{s['max_bytes'] / 1048576:.0f} MB evicted={s['evicted_files']}")
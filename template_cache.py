@@ -0,0 +1,103 @@
+"""
+Parsed .docx template cache for card rendering.
+
+DocxTemplate(path) re-unzips and re-parses the role template on every card, and
+docxtpl compiles every document part with Jinja again on every render. Here each
+template file is read and parsed once per process; each render gets a deep copy
+of the pristine python-docx Document, and the compiled Jinja templates are reused.
+
+A lookup costs one os.stat of the already-resolved path: a changed mtime or size
+reloads the file, a vanished file re-resolves the role's path.
+"""
+import copy
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from docx import Document
+from docxtpl import DocxTemplate
+from jinja2 import Environment
+
+
+class CompiledTemplateEnvironment(Environment):
+    """Jinja environment that returns the already compiled template for a source string it has seen."""
+
+    def __init__(self, max_entries=64, **options):
+        super().__init__(**options)
+        self._compiled = OrderedDict()
+        self._max_entries = max_entries
+        self._compiled_lock = threading.Lock()
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals is not None or template_class is not None or not isinstance(source, str):
+            return super().from_string(source, globals, template_class)
+        with self._compiled_lock:
+            template = self._compiled.get(source)
+            if template is not None:
+                self._compiled.move_to_end(source)
+                return template
+        template = super().from_string(source)
+        with self._compiled_lock:
+            self._compiled[source] = template
+            while len(self._compiled) > self._max_entries:
+                self._compiled.popitem(last=False)
+        return template
+
+
+class TemplateCache:
+    """
+    Per-role cache of parsed DocxTemplate sources.
+
+    resolve_path(role) returns the template path for a role (raising ValueError /
+    FileNotFoundError like get_template_path); it is only called on a miss.
+    """
+
+    def __init__(self, resolve_path):
+        self._resolve_path = resolve_path
+        self._paths = {}    # role -> resolved template path
+        self._entries = {}  # path -> ((mtime_ns, size), raw bytes, pristine Document)
+        self._lock = threading.Lock()
+        self.jinja_env = CompiledTemplateEnvironment()
+
+    def _stat(self, role):
+        path = self._paths.get(role)
+        if path is not None:
+            try:
+                return path, os.stat(path)
+            except FileNotFoundError:
+                self._paths.pop(role, None)
+        path = self._resolve_path(role)
+        stat = os.stat(path)
+        self._paths[role] = path
+        return path, stat
+
+    def version(self, role):
+        """(path, mtime_ns, size) of the role's template; changes whenever the asset file does."""
+        path, stat = self._stat(role)
+        return path, stat.st_mtime_ns, stat.st_size
+
+    def get(self, role):
+        """A fresh DocxTemplate for `role`, ready to render(context, jinja_env=self.jinja_env)."""
+        path, stat = self._stat(role)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None or entry[0] != stamp:
+            with open(path, 'rb') as f:
+                data = f.read()
+            entry = (stamp, data, Document(io.BytesIO(data)))
+            with self._lock:
+                self._entries[path] = entry
+
+        _, data, pristine = entry
+        # template_file is only read again if the template is re-rendered or saved unrendered.
+        doc = DocxTemplate(io.BytesIO(data))
+        doc.docx = copy.deepcopy(pristine)
+        return doc
+
+    def clear(self):
+        """Forgets every resolved path and parsed template (e.g. after adding a new asset file)."""
+        with self._lock:
+            self._paths.clear()
+            self._entries.clear()
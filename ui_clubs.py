@@ -3,11 +3,12 @@ from tkinter import messagebox
 import threading
 from queue import Queue, Empty
 from database import add_club, update_club, get_next_club_membership_id, get_club_points_history
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
+from importers import import_clubs_from_excel, write_rejects_report
 from ui_forms import CollapsibleFrame
 from utils import bind_mouse_wheel, DateEntry
+from attachment_store import attachment_names, is_blob_path, release_attachments, stage_files
 import os
-import shutil
 import json
 from tkinter import filedialog
 from tkinter.ttk import Treeview, Style
@@ -32,6 +33,10 @@ class AddClubFrame(ctk.CTkFrame):
         self.import_queue = Queue()
         self.after(100, self._process_import_queue)
 
+        # Queue for background attachment uploads
+        self.upload_queue = Queue()
+        self.after(100, self._process_upload_queue)
+
         # --- Main Scrollable Frame ---
         scrollable_frame = ctk.CTkScrollableFrame(self)
         scrollable_frame.grid(row=0, column=0, sticky="nsew")
@@ -44,8 +49,8 @@ class AddClubFrame(ctk.CTkFrame):
         import_frame.pack(fill="x", padx=10, pady=10)
         import_frame.grid_columnconfigure(0, weight=1)
 
-        import_button = ctk.CTkButton(import_frame, text="Import Clubs from Excel", command=self._import_from_excel)
-        import_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.import_button = ctk.CTkButton(import_frame, text="Import Clubs from Excel", command=self._import_from_excel)
+        self.import_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
 
         template_button = ctk.CTkButton(import_frame, text="Download Excel Template", command=self._download_club_excel_template, fg_color="gray")
         template_button.grid(row=0, column=1, padx=5, pady=5, sticky="e")
@@ -207,13 +212,24 @@ class AddClubFrame(ctk.CTkFrame):
         """Processes results from the background Excel import worker thread."""
         try:
             result_type, data = self.import_queue.get_nowait()
-            if result_type == "import_finished":
-                success_count, fail_count, failed_items = data
-                summary_message = f"Club import complete.\n\nSuccessfully imported: {success_count} clubs.\nFailed to import: {fail_count} clubs."
-                if failed_items:
-                    summary_message += f"\n\nFailed Club Names/IDs:\n" + ",\n".join(failed_items)
-                
-                messagebox.showinfo("Import Summary", summary_message)
+            if result_type == "import_progress":
+                self.import_button.configure(text=f"Importing... {data} rows processed")
+            elif result_type == "import_finished":
+                self.import_button.configure(text="Import Clubs from Excel", state="normal")
+                summary = data
+                rejected = summary['rejected']
+                summary_message = (f"Club import complete.\n\nNew clubs: {summary['inserted']}\n"
+                                   f"Updated clubs: {summary['updated']}\nRejected rows: {len(rejected)}")
+                if rejected:
+                    preview = [f"Row {r['row']} ({r['id'] or 'no ID'}): {r['reason']}" for r in rejected[:10]]
+                    summary_message += "\n\n" + "\n".join(preview)
+                    if len(rejected) > len(preview):
+                        summary_message += f"\n... and {len(rejected) - len(preview)} more."
+                    summary_message += "\n\nSave the rejected rows report?"
+                    if messagebox.askyesno("Import Summary", summary_message):
+                        self._save_rejects_report(rejected)
+                else:
+                    messagebox.showinfo("Import Summary", summary_message)
                 
                 # Refresh club lists in other frames
                 if hasattr(self.master.master, 'add_member_frame'):
@@ -222,6 +238,7 @@ class AddClubFrame(ctk.CTkFrame):
                     self.master.master.reports_frame.update_club_filter()
 
             elif result_type == "import_error":
+                self.import_button.configure(text="Import Clubs from Excel", state="normal")
                 error_message = data
                 messagebox.showerror("Import Error", f"An error occurred during the import process: {error_message}")
         except Empty:
@@ -238,44 +255,35 @@ class AddClubFrame(ctk.CTkFrame):
             return
 
         messagebox.showinfo("Importing", "Importing clubs from Excel in the background. You will be notified upon completion.")
-        
+        self.import_button.configure(state="disabled")
+
         thread = threading.Thread(target=self._import_clubs_from_excel_worker, args=(filepath,), daemon=True)
         thread.start()
 
     def _import_clubs_from_excel_worker(self, filepath):
-        """Worker function to handle reading the Excel file and inserting clubs into DB."""
+        """Worker function: streams the sheet and upserts the clubs in one transaction (see importers.py)."""
         try:
-            workbook = load_workbook(filepath, data_only=True)
-            sheet = workbook.active
-            headers = [cell.value for cell in sheet[1]]
-            success_count, fail_count, failed_items = 0, 0, []
-
-            for row_index in range(2, sheet.max_row + 1):
-                row_dict = {}
-                try:
-                    row_values = [cell.value for cell in sheet[row_index]]
-                    if not any(row_values): continue
-                    row_dict = dict(zip(headers, row_values))
-                    club_data = {}
-                    if not row_dict.get('club_membership_id'):
-                        club_data['club_membership_id'] = get_next_club_membership_id()
-                    if not row_dict.get('name'): raise ValueError("Club 'name' is missing.")
-                    for key in headers:
-                        if key in row_dict and row_dict[key] is not None:
-                            club_data[key] = row_dict[key]
-                    club_data.setdefault('points', 0)
-                    club_data.setdefault('attachments_data', {})
-                    add_club(club_data)
-                    success_count += 1
-                except Exception as e:
-                    fail_count += 1
-                    failed_items.append(str(row_dict.get('name', f'Row {row_index}')))
-                    print(f"Failed to import club at row {row_index}: {e}")
-            
-            self.import_queue.put(("import_finished", (success_count, fail_count, failed_items)))
+            summary = import_clubs_from_excel(
+                filepath, progress_callback=lambda processed: self.import_queue.put(("import_progress", processed))
+            )
+            self.import_queue.put(("import_finished", summary))
         except Exception as e:
             self.import_queue.put(("import_error", str(e)))
 
+    def _save_rejects_report(self, rejected):
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel file", "*.xlsx")],
+            initialfile="pkf_clubs_import_rejects.xlsx"
+        )
+        if not filepath:
+            return
+        try:
+            write_rejects_report(rejected, filepath)
+            messagebox.showinfo("Success", f"Rejected rows report saved to:\n{filepath}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save the report: {e}")
+
     def _create_entry_fields(self, master, fields):
         master.grid_columnconfigure(1, weight=1)
         for i, (key, placeholder) in enumerate(fields):
@@ -312,6 +320,7 @@ class AddClubFrame(ctk.CTkFrame):
         if category_key not in self.multi_attachments:
             self.multi_attachments[category_key] = {}
         self.multi_attachments[category_key]['tree'] = tree
+        self.multi_attachments[category_key]['upload_button'] = upload_button
         remove_button = ctk.CTkButton(main_frame, text="Remove Selected File", command=lambda: self._remove_attachment_from_tree(category_key))
         remove_button.grid(row=2, column=0, sticky="w", padx=5, pady=(0, 5))
         return main_frame
@@ -319,25 +328,53 @@ class AddClubFrame(ctk.CTkFrame):
     def _upload_multiple_files(self, category_key):
         filepaths = filedialog.askopenfilenames(title=f"Select File(s) for {category_key.replace('_', ' ').title()}")
         if not filepaths: return
-        club_id = self.entries['club_membership_id'].get()
-        if not club_id:
-            messagebox.showwarning("Warning", "Please enter a Club Membership ID before uploading files.")
-            return
-        safe_club_id = "".join(c for c in club_id if c.isalnum() or c in ('-', '_')).rstrip()
-        club_assets_dir = os.path.join("assets", "club_files", safe_club_id)
-        os.makedirs(club_assets_dir, exist_ok=True)
-        tree = self.multi_attachments[category_key]['tree']
-        for filepath in filepaths:
-            destination_path = os.path.join(club_assets_dir, f"{category_key}_{os.path.basename(filepath)}")
-            
-            counter = 1
-            while os.path.exists(destination_path):
-                name, ext = os.path.splitext(f"{category_key}_{os.path.basename(filepath)}")
-                destination_path = os.path.join(club_assets_dir, f"{name}_{counter}{ext}")
-                counter += 1
-
-            shutil.copy(filepath, destination_path)
-            tree.insert("", "end", iid=destination_path, values=(os.path.basename(destination_path),))
+        attachment_info = self.multi_attachments[category_key]
+        attachment_info['upload_button'].configure(state="disabled", text="Uploading...")
+        existing_paths = set(attachment_info['tree'].get_children())
+        thread = threading.Thread(target=self._upload_files_worker, args=(category_key, filepaths, existing_paths), daemon=True)
+        thread.start()
+
+    def _upload_files_worker(self, category_key, filepaths, existing_paths):
+        """Worker function: hashes and copies the files into the attachment store; they are attached when the club is saved."""
+        try:
+            summary = stage_files(
+                filepaths, skip_paths=existing_paths,
+                progress_callback=lambda done, total: self.upload_queue.put(("upload_progress", (category_key, done, total))),
+                on_staged=lambda upload: self.upload_queue.put(("upload_file", (category_key, upload)))
+            )
+            self.upload_queue.put(("upload_finished", (category_key, summary)))
+        except Exception as e:
+            self.upload_queue.put(("upload_error", (category_key, str(e))))
+
+    def _process_upload_queue(self):
+        """Processes results from the background attachment upload workers."""
+        try:
+            while True:
+                result_type, (category_key, data) = self.upload_queue.get_nowait()
+                attachment_info = self.multi_attachments[category_key]
+                if result_type == "upload_progress":
+                    done, total = data
+                    percent = int(done * 100 / total) if total else 100
+                    attachment_info['upload_button'].configure(text=f"Uploading... {percent}%")
+                elif result_type == "upload_file":
+                    tree = attachment_info['tree']
+                    if not tree.exists(data['path']):
+                        tree.insert("", "end", iid=data['path'], values=(data['original_name'],))
+                elif result_type == "upload_finished":
+                    attachment_info['upload_button'].configure(state="normal", text="Upload Files")
+                    summary = data
+                    if summary['failed']:
+                        details = "\n".join(f"{name}: {error}" for name, error in summary['failed'][:10])
+                        messagebox.showerror("Upload Error", f"{len(summary['failed'])} file(s) could not be uploaded:\n\n{details}")
+                    if summary['skipped']:
+                        messagebox.showinfo("Upload", f"{summary['skipped']} file(s) are already attached to this list and were skipped.")
+                elif result_type == "upload_error":
+                    attachment_info['upload_button'].configure(state="normal", text="Upload Files")
+                    messagebox.showerror("Upload Error", f"Failed to upload files: {data}")
+        except Empty:
+            pass
+        finally:
+            self.after(100, self._process_upload_queue)
 
     def _remove_attachment_from_tree(self, category_key):
         tree = self.multi_attachments[category_key]['tree']
@@ -345,14 +382,14 @@ class AddClubFrame(ctk.CTkFrame):
         if not selected_items:
             messagebox.showwarning("Warning", "Please select a file to remove.")
             return
-        if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to remove {len(selected_items)} selected file(s) from the list and delete them from disk? This action cannot be undone."):
-            for item_id in selected_items:
-                filepath = item_id
-                try:
-                    if os.path.exists(filepath): os.remove(filepath)
-                    tree.delete(item_id)
-                except Exception as e:
-                    messagebox.showerror("Error", f"Could not delete file: {e}")
+        if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to remove {len(selected_items)} selected file(s) from the list? Files not used by any other member or club are deleted from disk. This action cannot be undone."):
+            try:
+                release_attachments('club', self.entries['club_membership_id'].get(), category_key, selected_items)
+                for filepath in selected_items:
+                    if not is_blob_path(filepath) and os.path.exists(filepath): os.remove(filepath)
+                    tree.delete(filepath)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not remove the selected files: {e}")
 
     def set_next_club_id(self):
         """Fetches the next club ID and displays it in the form."""
@@ -416,6 +453,7 @@ class AddClubFrame(ctk.CTkFrame):
         # Populate attachments
         try:
             attachments_data = json.loads(self.club_data.get('attachments_data', '{}'))
+            names = attachment_names('club', self.club_data.get('club_membership_id'))
             for key, attachment_info in self.multi_attachments.items():
                 if key in attachments_data:
                     tree = attachment_info.get('tree')
@@ -423,8 +461,8 @@ class AddClubFrame(ctk.CTkFrame):
                         file_paths = attachments_data[key]
                         if isinstance(file_paths, list):
                             for path in file_paths:
-                                if os.path.exists(path):
-                                    tree.insert("", "end", iid=path, values=(os.path.basename(path),))
+                                if os.path.exists(path) and not tree.exists(path):
+                                    tree.insert("", "end", iid=path, values=(names.get(path, os.path.basename(path)),))
         except (json.JSONDecodeError, TypeError):
             print("Could not parse or populate club attachments.")
 
@@ -4,11 +4,16 @@ import threading
 from queue import Queue, Empty
 from tkinter.ttk import Treeview, Style
 import os
-import shutil
 from database import add_member, update_member, get_belts, get_achievements, get_all_clubs, get_next_pkf_id, find_member_by_name
-from openpyxl import Workbook, load_workbook
+from openpyxl import Workbook
+from importers import import_members_from_excel, write_rejects_report
 from utils import bind_mouse_wheel, DateEntry, get_eligible_categories, calculate_age
+from photos import ingest_member_photo
+from attachment_store import attachment_names, is_blob_path, release_attachments, stage_files
 import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CollapsibleFrame(ctk.CTkFrame):
@@ -57,6 +62,10 @@ class AddMemberFrame(ctk.CTkFrame):
         self.club_queue = Queue()
         self.after(100, self._process_club_queue)
 
+        # Queue for background attachment uploads
+        self.upload_queue = Queue()
+        self.after(100, self._process_upload_queue)
+
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=1)
 
@@ -73,8 +82,8 @@ class AddMemberFrame(ctk.CTkFrame):
         import_frame.pack(fill="x", padx=10, pady=10)
         import_frame.grid_columnconfigure(0, weight=1)
 
-        import_button = ctk.CTkButton(import_frame, text="Import Members from Excel", command=self._import_from_excel)
-        import_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
+        self.import_button = ctk.CTkButton(import_frame, text="Import Members from Excel", command=self._import_from_excel)
+        self.import_button.grid(row=0, column=0, padx=5, pady=5, sticky="ew")
 
         template_button = ctk.CTkButton(import_frame, text="Download Excel Template", command=self._download_excel_template, fg_color="gray")
         template_button.grid(row=0, column=1, padx=5, pady=5, sticky="e")
@@ -439,7 +448,7 @@ class AddMemberFrame(ctk.CTkFrame):
         Calculates and updates age, and eligible Kumite and Kata categories
         based on DOB, Gender, and Weight.
         """
-        print(f"DEBUG: _update_age_and_categories called by event: {event}")
+        logger.debug("_update_age_and_categories called by event: %s", event)
         dob_str = self.entries['dob'].get()
 
         # --- Age Calculation ---
@@ -456,11 +465,10 @@ class AddMemberFrame(ctk.CTkFrame):
         
         # Ensure 'Player' specific widgets are initialized before accessing
         if 'Player' not in self.specific_widgets or 'weight' not in self.specific_widgets['Player']['widgets']:
-            print("DEBUG: Player specific widgets not initialized or visible. Returning.")
+            logger.debug("Player specific widgets not initialized or visible")
             return # Player fields not yet created or visible
 
         weight_str = self.specific_widgets['Player']['widgets']['weight'][1].get()
-        print(f"DEBUG: dob_str='{dob_str}', gender='{gender}', weight_str='{weight_str}'")
 
         # --- New logic for populating checkboxes ---
         player_widgets = self.specific_widgets['Player']['widgets']
@@ -473,7 +481,7 @@ class AddMemberFrame(ctk.CTkFrame):
 
         if not dob_str or not gender or not weight_str:
             # If essential info is missing, show a message and stop.
-            print("DEBUG: Missing essential info. Clearing categories.")
+            logger.debug("Missing DOB, gender or weight; clearing categories")
             no_cat_label = ctk.CTkLabel(self.eligible_categories_frame, text="Enter DOB, Gender, and Weight to see categories.")
             no_cat_label.pack(pady=10)
             self._update_selected_categories_display() # This will clear the display
@@ -481,17 +489,15 @@ class AddMemberFrame(ctk.CTkFrame):
 
         try:
             weight_kg = float(weight_str)
-            print(f"DEBUG: weight_kg={weight_kg}")
         except ValueError:
             # messagebox.showwarning("Invalid Input", "Please enter a valid number for Weight (kg).") # Too many popups
-            print(f"DEBUG: Invalid weight_str='{weight_str}'. Returning.")
+            logger.debug("Invalid weight_str=%r", weight_str)
             no_cat_label = ctk.CTkLabel(self.eligible_categories_frame, text="Invalid weight. Please enter a number.")
             no_cat_label.pack(pady=10)
             self._update_selected_categories_display() # This will clear the display
             return
 
         eligible_kumite, eligible_kata = get_eligible_categories(dob_str, gender, weight_kg)
-        print(f"DEBUG: Eligible Kumite: {eligible_kumite}, Eligible Kata: {eligible_kata}")
 
         all_eligible_categories = sorted(list(set(eligible_kata + eligible_kumite)))
 
@@ -515,17 +521,28 @@ class AddMemberFrame(ctk.CTkFrame):
         """Processes results from the background Excel import worker thread."""
         try:
             result_type, data = self.import_queue.get_nowait()
-            if result_type == "import_finished":
-                success_count, fail_count, failed_ids = data
-                summary_message = f"Import complete.\n\nSuccessfully imported: {success_count} members.\nFailed to import: {fail_count} members."
-                if failed_ids:
-                    summary_message += f"\n\nFailed PKF IDs:\n" + ",\n".join(failed_ids)
-                
-                messagebox.showinfo("Import Summary", summary_message)
-                
+            if result_type == "import_progress":
+                self.import_button.configure(text=f"Importing... {data} rows processed")
+            elif result_type == "import_finished":
+                self.import_button.configure(text="Import Members from Excel", state="normal")
+                summary = data
+                rejected = summary['rejected']
+                summary_message = f"Import complete.\n\nSuccessfully imported: {summary['inserted']} members.\nRejected: {len(rejected)} rows."
+                if rejected:
+                    preview = [f"Row {r['row']} ({r['id'] or 'no ID'}): {r['reason']}" for r in rejected[:10]]
+                    summary_message += "\n\n" + "\n".join(preview)
+                    if len(rejected) > len(preview):
+                        summary_message += f"\n... and {len(rejected) - len(preview)} more."
+                    summary_message += "\n\nSave the rejected rows report?"
+                    if messagebox.askyesno("Import Summary", summary_message):
+                        self._save_rejects_report(rejected)
+                else:
+                    messagebox.showinfo("Import Summary", summary_message)
+
                 if self.on_save_callback:
                     self.on_save_callback()
             elif result_type == "import_error":
+                self.import_button.configure(text="Import Members from Excel", state="normal")
                 error_message = data
                 messagebox.showerror("Import Error", f"An error occurred during the import process: {error_message}")
         except Empty:
@@ -597,7 +614,8 @@ class AddMemberFrame(ctk.CTkFrame):
             return # User cancelled
 
         messagebox.showinfo("Importing", "Importing members from Excel in the background. You will be notified upon completion.")
-        
+        self.import_button.configure(state="disabled")
+
         # Run the heavy lifting in a separate thread
         thread = threading.Thread(target=self._import_from_excel_worker, args=(filepath,), daemon=True)
         thread.start()
@@ -614,62 +632,29 @@ class AddMemberFrame(ctk.CTkFrame):
             self.save_queue.put(("save_error", str(e)))
 
     def _import_from_excel_worker(self, filepath):
-        """Worker function to handle reading the Excel file and inserting into DB."""
+        """Worker function: streams the sheet and bulk-inserts it in one transaction (see importers.py)."""
         try:
-            workbook = load_workbook(filepath)
-            sheet = workbook.active
-
-            headers = [cell.value for cell in sheet[1]]
-            
-            main_keys = {
-                'pkf_id', 'id_number', 'full_name', 'full_name_ar', 'dob', 'phone', 'email',
-                'role', 'expiry_date', 'current_belt', 'notes', 'admin_title',
-                'passport_number', 'passport_expiry_date'
-            }
-            success_count = 0
-            fail_count = 0
-            failed_ids = []
-
-            for row_index in range(2, sheet.max_row + 1):
-                try:
-                    member_data = {}
-                    specific_data = {}
-                    row_values = [cell.value for cell in sheet[row_index]]
-                    row_dict = dict(zip(headers, row_values))
-
-                    if not row_dict.get('pkf_id'):
-                        continue
-
-                    for key, value in row_dict.items():
-                        if value is None: continue
-                        if key in main_keys:
-                            member_data[key] = value
-                        else:
-                            if isinstance(value, (int, float)) and value == 1:
-                                specific_data[key] = True
-                            else:
-                                specific_data[key] = value
-                    
-                    club_name_from_excel = row_dict.get('club_name')
-                    if club_name_from_excel:
-                        club_id = self.clubs_map.get(club_name_from_excel)
-                        if club_id:
-                            member_data['club_id'] = club_id
-
-                    member_data['specific_data'] = specific_data
-
-                    add_member(member_data)
-                    success_count += 1
-                except Exception as e:
-                    fail_count += 1
-                    failed_ids.append(str(member_data.get('pkf_id', 'Unknown')))
-                    print(f"Failed to import member {member_data.get('pkf_id')}: {e}")
-            
-            # Put the final results into the queue for the main thread to display
-            self.import_queue.put(("import_finished", (success_count, fail_count, failed_ids)))
+            summary = import_members_from_excel(
+                filepath, progress_callback=lambda processed: self.import_queue.put(("import_progress", processed))
+            )
+            self.import_queue.put(("import_finished", summary))
         except Exception as e:
             self.import_queue.put(("import_error", str(e)))
 
+    def _save_rejects_report(self, rejected):
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel file", "*.xlsx")],
+            initialfile="pkf_import_rejects.xlsx"
+        )
+        if not filepath:
+            return
+        try:
+            write_rejects_report(rejected, filepath)
+            messagebox.showinfo("Success", f"Rejected rows report saved to:\n{filepath}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not save the report: {e}")
+
     def _download_excel_template(self):
         filepath = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
@@ -728,7 +713,7 @@ class AddMemberFrame(ctk.CTkFrame):
         tree.configure(yscrollcommand=scrollbar.set)
 
         # Store the tree widget for later access
-        self.multi_attachments[category_key] = {'tree': tree}
+        self.multi_attachments[category_key] = {'tree': tree, 'upload_button': upload_button}
 
         # --- Remove Button ---
         remove_button = ctk.CTkButton(main_frame, text="Remove Selected File", command=lambda: self._remove_attachment_from_tree(category_key))
@@ -981,17 +966,13 @@ class AddMemberFrame(ctk.CTkFrame):
             messagebox.showwarning("Warning", "Please enter a Membership No. (PKF ID) before uploading files.")
             return
 
-        # Sanitize pkf_id for use in directory name
-        safe_pkf_id = "".join(c for c in pkf_id if c.isalnum() or c in ('-', '_')).rstrip()
-        member_assets_dir = os.path.join("assets", "member_files", safe_pkf_id)
-        os.makedirs(member_assets_dir, exist_ok=True)
-        
-        # Use a descriptive filename
-        original_filename = os.path.basename(filepath)
-        destination_filename = f"personal_photo_{original_filename}"
-        destination_path = os.path.join(member_assets_dir, destination_filename)
-        
-        shutil.copy(filepath, destination_path)
+        # Stores an orientation-corrected master plus the card-size and thumbnail variants
+        try:
+            destination_path = ingest_member_photo(filepath, pkf_id)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+
         self.photo_path_var.set(destination_path)
         self.photo_path_label.configure(text=os.path.basename(destination_path), text_color=("black", "white"))
 
@@ -1000,30 +981,53 @@ class AddMemberFrame(ctk.CTkFrame):
         if not filepaths:
             return
 
-        pkf_id = self.entries['pkf_id'].get()
-        if not pkf_id:
-            messagebox.showwarning("Warning", "Please enter a Membership No. (PKF ID) before uploading files.")
-            return
-
-        safe_pkf_id = "".join(c for c in pkf_id if c.isalnum() or c in ('-', '_')).rstrip()
-        member_assets_dir = os.path.join("assets", "member_files", safe_pkf_id)
-        os.makedirs(member_assets_dir, exist_ok=True)
+        attachment_info = self.multi_attachments[category_key]
+        attachment_info['upload_button'].configure(state="disabled", text="Uploading...")
+        existing_paths = set(attachment_info['tree'].get_children())
+        thread = threading.Thread(target=self._upload_files_worker, args=(category_key, filepaths, existing_paths), daemon=True)
+        thread.start()
 
-        tree = self.multi_attachments[category_key]['tree']
-        for filepath in filepaths:
-            original_filename = os.path.basename(filepath)
-            destination_filename = f"{category_key}_{original_filename}"
-            destination_path = os.path.join(member_assets_dir, destination_filename)
-            
-            counter = 1
-            while os.path.exists(destination_path):
-                name, ext = os.path.splitext(destination_filename)
-                destination_filename = f"{name}_{counter}{ext}"
-                destination_path = os.path.join(member_assets_dir, destination_filename)
-                counter += 1
+    def _upload_files_worker(self, category_key, filepaths, existing_paths):
+        """Worker function: hashes and copies the files into the attachment store; they are attached when the member is saved."""
+        try:
+            summary = stage_files(
+                filepaths, skip_paths=existing_paths,
+                progress_callback=lambda done, total: self.upload_queue.put(("upload_progress", (category_key, done, total))),
+                on_staged=lambda upload: self.upload_queue.put(("upload_file", (category_key, upload)))
+            )
+            self.upload_queue.put(("upload_finished", (category_key, summary)))
+        except Exception as e:
+            self.upload_queue.put(("upload_error", (category_key, str(e))))
 
-            shutil.copy(filepath, destination_path)
-            tree.insert("", "end", iid=destination_path, values=(os.path.basename(destination_path),))
+    def _process_upload_queue(self):
+        """Processes results from the background attachment upload workers."""
+        try:
+            while True:
+                result_type, (category_key, data) = self.upload_queue.get_nowait()
+                attachment_info = self.multi_attachments[category_key]
+                if result_type == "upload_progress":
+                    done, total = data
+                    percent = int(done * 100 / total) if total else 100
+                    attachment_info['upload_button'].configure(text=f"Uploading... {percent}%")
+                elif result_type == "upload_file":
+                    tree = attachment_info['tree']
+                    if not tree.exists(data['path']):
+                        tree.insert("", "end", iid=data['path'], values=(data['original_name'],))
+                elif result_type == "upload_finished":
+                    attachment_info['upload_button'].configure(state="normal", text="Upload Files")
+                    summary = data
+                    if summary['failed']:
+                        details = "\n".join(f"{name}: {error}" for name, error in summary['failed'][:10])
+                        messagebox.showerror("Upload Error", f"{len(summary['failed'])} file(s) could not be uploaded:\n\n{details}")
+                    if summary['skipped']:
+                        messagebox.showinfo("Upload", f"{summary['skipped']} file(s) are already attached to this list and were skipped.")
+                elif result_type == "upload_error":
+                    attachment_info['upload_button'].configure(state="normal", text="Upload Files")
+                    messagebox.showerror("Upload Error", f"Failed to upload files: {data}")
+        except Empty:
+            pass
+        finally:
+            self.after(100, self._process_upload_queue)
 
     def _remove_attachment_from_tree(self, category_key):
         tree = self.multi_attachments[category_key]['tree']
@@ -1033,18 +1037,17 @@ class AddMemberFrame(ctk.CTkFrame):
             return
 
         # Ask for confirmation for all selected files at once
-        if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to remove {len(selected_items)} selected file(s) from the list and delete them from disk? This action cannot be undone."):
-            for item_id in selected_items:
-                # The item_id (iid) is the full path to the file, which we set during upload
-                filepath = item_id
-                try:
-                    if os.path.exists(filepath):
+        if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to remove {len(selected_items)} selected file(s) from the list? Files not used by any other member or club are deleted from disk. This action cannot be undone."):
+            # The item_id (iid) is the file path, which we set during upload
+            try:
+                # Stored files are shared by content; dropping our reference deletes the file only when unused
+                release_attachments('member', self.entries['pkf_id'].get(), category_key, selected_items)
+                for filepath in selected_items:
+                    if not is_blob_path(filepath) and os.path.exists(filepath):
                         os.remove(filepath)
-                    
-                    # Remove from treeview
-                    tree.delete(item_id)
-                except Exception as e:
-                    messagebox.showerror("Error", f"Could not delete file {os.path.basename(filepath)}: {e}")
+                    tree.delete(filepath)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not remove the selected files: {e}")
 
     def _save_member(self):
         # Collect data from all entries
@@ -1271,15 +1274,16 @@ class AddMemberFrame(ctk.CTkFrame):
                             checkbox.select()
                     self._update_selected_categories_display() # Update the display textbox
             
-            # Populate multi-attachments
+            # Populate multi-attachments; stored files are shown under their original names
+            names = attachment_names('member', self.member_data.get('pkf_id'))
             for key, attachment_info in self.multi_attachments.items():
                 if key in specific_data:
                     tree = attachment_info['tree']
                     file_paths = specific_data[key]
                     if isinstance(file_paths, list):
                         for path in file_paths:
-                            if os.path.exists(path):
-                                tree.insert("", "end", iid=path, values=(os.path.basename(path),))
+                            if os.path.exists(path) and not tree.exists(path):
+                                tree.insert("", "end", iid=path, values=(names.get(path, os.path.basename(path)),))
         except (json.JSONDecodeError, TypeError):
             print("Could not parse or populate specific_data.")
         
@@ -8,7 +8,9 @@ import sys
 import subprocess
 import threading
 from queue import Queue, Empty
-from database import search_members_advanced, get_unique_clubs, search_clubs_advanced, get_club_by_id, delete_member, delete_club
+from database import search_members_advanced, search_members_page, get_unique_clubs, search_clubs_advanced, get_club_by_id, delete_member, delete_club
+from database import ATTACHMENT_CATEGORIES, get_attachments_for_owners, get_missing_attachments
+from attachment_export import club_owner, export_attachments_zip, member_owner
 from PIL import Image # New
 from openpyxl import Workbook
 from ui_forms import CollapsibleFrame
@@ -16,10 +18,15 @@ from ui_clubs import AddClubFrame
 # A forward-import for type hinting, will be properly imported inside methods
 from ui_forms import AddMemberFrame
 from utils import bind_mouse_wheel, DateEntry
+from ui_virtual_list import VirtualList
 from bilingual_labels import MEMBER_LABELS_EN, MEMBER_LABELS_AR, SPECIFIC_LABELS_EN, SPECIFIC_LABELS_AR, ATTACHMENT_LABELS_EN, ATTACHMENT_LABELS_AR, CLUB_LABELS_EN, CLUB_LABELS_AR
 from doc_generator import generate_bilingual_profile_doc
+from profile_book import generate_profile_book, iter_club_book
 # استدعاء دالة التوليد من الملف الذي أنشأناه
 from id_generator import generate_word_card
+from batch_cards import load_members_for_cards, generate_cards_zip
+from print_sheets import impose_cards_pdf
+from photos import photo_variant
 
 class MemberInfoWindow(ctk.CTkToplevel):
     """A pop-up window to display detailed member information."""
@@ -43,8 +50,8 @@ class MemberInfoWindow(ctk.CTkToplevel):
         photo_frame = ctk.CTkFrame(self, fg_color="transparent")
         photo_frame.grid(row=0, column=0, pady=10, sticky="ew")
         photo_frame.grid_columnconfigure(0, weight=1)
-        photo_path = member_data.get('photo_path')
-        if photo_path and os.path.exists(photo_path):
+        photo_path = photo_variant(member_data.get('photo_path'), 'thumb')
+        if photo_path:
             try:
                 pil_image = Image.open(photo_path)
                 pil_image.thumbnail((150, 150))
@@ -83,7 +90,7 @@ class MemberInfoWindow(ctk.CTkToplevel):
         # --- Action Buttons ---
         action_frame = ctk.CTkFrame(self)
         action_frame.grid(row=2, column=0, padx=10, pady=10, sticky="ew")
-        action_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
+        action_frame.grid_columnconfigure((0, 1, 2, 3, 4), weight=1)
 
         edit_button = ctk.CTkButton(action_frame, text="Edit Member Information", command=self._open_edit_window)
         edit_button.grid(row=0, column=0, padx=(0, 5), sticky="ew")
@@ -95,7 +102,10 @@ class MemberInfoWindow(ctk.CTkToplevel):
         export_button.grid(row=0, column=2, padx=(5, 5), sticky="ew")
 
         print_card_button = ctk.CTkButton(action_frame, text="طباعة البطاقة (Word)", command=self._print_card, fg_color="#27AE60", hover_color="#1E8449")
-        print_card_button.grid(row=0, column=3, padx=(5, 0), sticky="ew")
+        print_card_button.grid(row=0, column=3, padx=(5, 5), sticky="ew")
+
+        club_book_button = ctk.CTkButton(action_frame, text="Club Profile Book", command=self._export_club_book, fg_color="#1E88E5", hover_color="#1565C0")
+        club_book_button.grid(row=0, column=4, padx=(5, 0), sticky="ew")
 
     def _open_edit_window(self):
         """يفتح نافذة جديدة لتعديل بيانات العضو."""
@@ -162,6 +172,9 @@ class MemberInfoWindow(ctk.CTkToplevel):
                     shutil.copy(temp_path, save_path)
                     messagebox.showinfo("Success", f"Profile exported successfully to:\n{save_path}")
             
+            elif result_type == "book_export_finished":
+                filepath, summary = data
+                messagebox.showinfo("Success", f"Profile book with {summary['clubs']} club and {summary['members']} member profiles saved to:\n{filepath}")
             elif result_type == "word_export_error":
                 error_message = data
                 messagebox.showerror("Export Error", f"An error occurred during export: {error_message}")
@@ -190,6 +203,30 @@ class MemberInfoWindow(ctk.CTkToplevel):
         thread.daemon = True
         thread.start()
 
+    def _export_club_book(self):
+        """Exports the club profile and all of its members' profiles into one Word document."""
+        club_name = (self.member_data.get('club_name') or '').strip()
+        if not club_name:
+            messagebox.showwarning("No Club", "This member is not linked to a club.")
+            return
+        safe_name = "".join(c for c in club_name if c.isalnum() or c in (' ', '_', '-')).strip() or "club"
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".docx",
+            filetypes=[("Word Document", "*.docx")],
+            initialfile=f"{safe_name}_profile_book.docx"
+        )
+        if not filepath:
+            return
+        thread = threading.Thread(target=self._export_club_book_worker, args=(filepath, club_name), daemon=True)
+        thread.start()
+
+    def _export_club_book_worker(self, filepath, club_name):
+        try:
+            summary = generate_profile_book(iter_club_book(club_name), filepath, title=f"{club_name} - Profile Book - كتاب الملفات الشخصية")
+            self.result_queue.put(("book_export_finished", (filepath, summary)))
+        except Exception as e:
+            self.result_queue.put(("word_export_error", str(e)))
+
     def _populate_details(self, en_parent, ar_parent, data):
         """Populates the English and Arabic frames with member details."""
         # --- Basic Information ---
@@ -323,14 +360,16 @@ class ClubInfoWindow(ctk.CTkToplevel):
         # --- Action Buttons ---
         action_frame = ctk.CTkFrame(self)
         action_frame.grid(row=1, column=0, padx=10, pady=10, sticky="ew")
-        action_frame.grid_columnconfigure((0, 1, 2), weight=1)
+        action_frame.grid_columnconfigure((0, 1, 2, 3), weight=1)
 
         edit_button = ctk.CTkButton(action_frame, text="Edit Club Information", command=self._open_edit_window)
         edit_button.grid(row=0, column=0, padx=(0, 5), sticky="ew")
         delete_button = ctk.CTkButton(action_frame, text="Delete Club", command=self._delete_club, fg_color="#D32F2F", hover_color="#B71C1C")
         delete_button.grid(row=0, column=1, padx=5, sticky="ew")
         export_button = ctk.CTkButton(action_frame, text="Export to Word", command=self._export_to_word, fg_color="#1E88E5", hover_color="#1565C0")
-        export_button.grid(row=0, column=2, padx=(5, 0), sticky="ew")
+        export_button.grid(row=0, column=2, padx=5, sticky="ew")
+        club_book_button = ctk.CTkButton(action_frame, text="Club Profile Book", command=self._export_club_book, fg_color="#1E88E5", hover_color="#1565C0")
+        club_book_button.grid(row=0, column=3, padx=(5, 0), sticky="ew")
 
     def _open_edit_window(self):
         edit_window = ctk.CTkToplevel(self)
@@ -379,6 +418,9 @@ class ClubInfoWindow(ctk.CTkToplevel):
                 if save_path:
                     shutil.copy(temp_path, save_path)
                     messagebox.showinfo("Success", f"Profile exported successfully to:\n{save_path}")
+            elif result_type == "book_export_finished":
+                filepath, summary = data
+                messagebox.showinfo("Success", f"Profile book with {summary['clubs']} club and {summary['members']} member profiles saved to:\n{filepath}")
             elif result_type == "word_export_error":
                 error_message = data
                 messagebox.showerror("Export Error", f"An error occurred during export: {error_message}")
@@ -405,6 +447,30 @@ class ClubInfoWindow(ctk.CTkToplevel):
         thread.daemon = True
         thread.start()
 
+    def _export_club_book(self):
+        """Exports the club profile and all of its members' profiles into one Word document."""
+        club_name = (self.club_data.get('name') or '').strip()
+        if not club_name:
+            messagebox.showwarning("No Club", "This club has no name.")
+            return
+        safe_name = "".join(c for c in club_name if c.isalnum() or c in (' ', '_', '-')).strip() or "club"
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".docx",
+            filetypes=[("Word Document", "*.docx")],
+            initialfile=f"{safe_name}_profile_book.docx"
+        )
+        if not filepath:
+            return
+        thread = threading.Thread(target=self._export_club_book_worker, args=(filepath, club_name), daemon=True)
+        thread.start()
+
+    def _export_club_book_worker(self, filepath, club_name):
+        try:
+            summary = generate_profile_book(iter_club_book(club_name, self.club_data), filepath, title=f"{club_name} - Profile Book - كتاب الملفات الشخصية")
+            self.result_queue.put(("book_export_finished", (filepath, summary)))
+        except Exception as e:
+            self.result_queue.put(("word_export_error", str(e)))
+
     def _populate_details(self, en_parent, ar_parent, data):
         self._add_section_header(en_parent, ar_parent, "Club Information", "معلومات النادي")
         self._add_info_rows(en_parent, ar_parent, data, CLUB_LABELS_EN, CLUB_LABELS_AR)
@@ -504,7 +570,7 @@ class ReportsFrame(ctk.CTkFrame):
         self.attachment_tab = self.report_tab_view.tab("Attachments Report")
         self.attachment_tab.grid_columnconfigure(0, weight=1)
         self.attachment_tab.grid_rowconfigure(1, weight=1)
-        self.selected_attachment_entity = None
+        self.selected_attachment_entities = []
         self.attachment_type_checkboxes = {}
         self._create_attachment_report_widgets(self.attachment_tab)
 
@@ -603,6 +669,12 @@ class ReportsFrame(ctk.CTkFrame):
         clear_button = ctk.CTkButton(action_frame, text="Clear Filters", command=self._clear_filters, fg_color="gray")
         clear_button.pack(side="left", padx=10)
 
+        cards_button = ctk.CTkButton(action_frame, text="Print Cards (ZIP)", command=self._print_cards_zip, fg_color="#27AE60", hover_color="#1E8449")
+        cards_button.pack(side="left", padx=10)
+
+        sheets_button = ctk.CTkButton(action_frame, text="Print Sheets (PDF)", command=self._print_card_sheets, fg_color="#27AE60", hover_color="#1E8449")
+        sheets_button.pack(side="left", padx=10)
+
         tree_frame = ctk.CTkFrame(tab)
         tree_frame.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
         tree_frame.grid_rowconfigure(0, weight=1)
@@ -636,6 +708,17 @@ class ReportsFrame(ctk.CTkFrame):
         bind_mouse_wheel(self.results_tree)
         self.results_tree.configure(yscrollcommand=scrollbar.set)
 
+        # Keyset paging: results arrive one page at a time, "Load More" appends the next page.
+        pager_frame = ctk.CTkFrame(tree_frame, fg_color="transparent")
+        pager_frame.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        self.results_count_label = ctk.CTkLabel(pager_frame, text="")
+        self.results_count_label.pack(side="left", padx=10)
+        self.load_more_button = ctk.CTkButton(pager_frame, text="Load More", command=self._load_more_members, state="disabled")
+        self.load_more_button.pack(side="right", padx=10)
+        self.current_filters = None
+        self.next_after_id = None
+        self.results_total = None
+
     def _create_club_report_widgets(self, tab):
         """Creates and places all widgets for the club reports tab."""
         # --- Filters Frame ---
@@ -718,6 +801,9 @@ class ReportsFrame(ctk.CTkFrame):
         search_button = ctk.CTkButton(search_frame, text="Search", command=self._perform_attachment_search)
         search_button.grid(row=0, column=1, pady=5, sticky="e")
 
+        select_all_button = ctk.CTkButton(search_frame, text="Select All Results", command=self._select_all_attachment_entities)
+        select_all_button.grid(row=0, column=2, padx=(10, 0), pady=5, sticky="e")
+
         # --- Middle Content Frame ---
         content_frame = ctk.CTkFrame(tab, fg_color="transparent")
         content_frame.grid(row=1, column=0, padx=10, pady=0, sticky="nsew")
@@ -726,38 +812,53 @@ class ReportsFrame(ctk.CTkFrame):
         content_frame.grid_rowconfigure(0, weight=1)
 
         # --- Search Results (Left) ---
-        self.attachment_search_results_frame = ctk.CTkScrollableFrame(content_frame, label_text="Search Results")
-        self.attachment_search_results_frame.grid(row=0, column=0, padx=(0, 5), sticky="nsew")
-        bind_mouse_wheel(self.attachment_search_results_frame)
-        ctk.CTkLabel(self.attachment_search_results_frame, text="Enter a search term above.").pack(pady=20)
+        # Virtualized: only the visible rows are drawn, however many entities match; click a row to select it
+        self.attachment_search_results = VirtualList(
+            content_frame, [('type', "Type", 1), ('name', "Name", 4), ('id', "ID", 2)], selectable=True,
+            on_selection_changed=self._on_entity_selection_changed, empty_text="No members or clubs found."
+        )
+        self.attachment_search_results.grid(row=0, column=0, padx=(0, 5), sticky="nsew")
+        self.attachment_search_results.show_message("Enter a search term above.")
 
         # --- Attachment Types (Right) ---
         self.attachment_type_selection_frame = ctk.CTkScrollableFrame(content_frame, label_text="Available Attachments")
         self.attachment_type_selection_frame.grid(row=0, column=1, padx=(5, 0), sticky="nsew")
         bind_mouse_wheel(self.attachment_type_selection_frame)
-        ctk.CTkLabel(self.attachment_type_selection_frame, text="Select an entity from the results.").pack(pady=20)
+        ctk.CTkLabel(self.attachment_type_selection_frame, text="Select one or more entities from the results.").pack(pady=20)
 
         # --- Bottom Action Frame ---
         action_frame = ctk.CTkFrame(tab)
         action_frame.grid(row=2, column=0, padx=10, pady=(10, 10), sticky="ew")
         
-        self.download_button = ctk.CTkButton(action_frame, text="Download Selected Attachments", command=self._download_selected_attachments, height=40, fg_color="#008CBA", hover_color="#007B9E", state="disabled")
+        self.download_button = ctk.CTkButton(action_frame, text="Download Selected Attachments (ZIP)", command=self._download_selected_attachments, height=40, fg_color="#008CBA", hover_color="#007B9E", state="disabled")
         self.download_button.pack(fill="x", padx=10, pady=10)
 
+        # --- Federation-wide missing documents ---
+        missing_frame = ctk.CTkFrame(action_frame, fg_color="transparent")
+        missing_frame.pack(fill="x", padx=10, pady=(0, 10))
+        ctk.CTkLabel(missing_frame, text="Missing documents:").pack(side="left", padx=(0, 10))
+        self.missing_category_options = {
+            f"{'Club' if owner_type == 'club' else 'Member'}: {ATTACHMENT_LABELS_EN.get(category, category)}": (owner_type, category)
+            for owner_type, categories in ATTACHMENT_CATEGORIES.items() for category in categories
+        }
+        self.missing_category_menu = ctk.CTkOptionMenu(missing_frame, values=list(self.missing_category_options))
+        self.missing_category_menu.pack(side="left", padx=(0, 10))
+        self.missing_role_menu = ctk.CTkOptionMenu(missing_frame, values=["All Roles", "Player", "Coach", "Referee", "Admin"])
+        self.missing_role_menu.pack(side="left", padx=(0, 10))
+        ctk.CTkButton(missing_frame, text="Export Missing Documents Report", command=self._export_missing_documents).pack(side="left")
+
     def _perform_attachment_search(self):
         query = self.attachment_search_entry.get()
         if not query.strip():
             messagebox.showwarning("Input Needed", "Please enter a name or ID to search for.")
             return
 
-        for widget in self.attachment_search_results_frame.winfo_children():
-            widget.destroy()
-        ctk.CTkLabel(self.attachment_search_results_frame, text="Searching...").pack(pady=20)
+        self.attachment_search_results.show_message("Searching...")
 
         for widget in self.attachment_type_selection_frame.winfo_children():
             widget.destroy()
         self.attachment_type_checkboxes.clear()
-        self.selected_attachment_entity = None
+        self.selected_attachment_entities = []
         self.download_button.configure(state="disabled")
 
         thread = threading.Thread(target=self._perform_attachment_search_worker, args=(query,), daemon=True)
@@ -778,41 +879,97 @@ class ReportsFrame(ctk.CTkFrame):
         except Exception as e:
             self.search_queue.put(("search_error", f"Failed to search for entities: {e}"))
 
-    def _on_entity_selected(self, entity):
-        self.selected_attachment_entity = entity
+    def _select_all_attachment_entities(self):
+        self.attachment_search_results.select_all()
+
+    def _on_entity_selection_changed(self, selected_rows):
+        entities = [row['entity'] for row in selected_rows]
+        self.selected_attachment_entities = entities
 
         for widget in self.attachment_type_selection_frame.winfo_children():
             widget.destroy()
         self.attachment_type_checkboxes.clear()
+        self.download_button.configure(state="disabled")
+        if not entities:
+            ctk.CTkLabel(self.attachment_type_selection_frame, text="Select one or more entities from the results.").pack(pady=20)
+            return
+        ctk.CTkLabel(self.attachment_type_selection_frame, text="Loading attachments...").pack(pady=10)
 
-        attachment_data = {}
-        if entity['type'] == 'member':
-            try:
-                specific_data = json.loads(entity['data'].get('specific_data', '{}'))
-                attachment_data = {k: v for k, v in specific_data.items() if k.endswith(('_docs', '_certs', '_receipts')) and v}
-            except json.JSONDecodeError: pass
-        elif entity['type'] == 'club':
-            try:
-                attachment_data = json.loads(entity['data'].get('attachments_data', '{}'))
-                attachment_data = {k: v for k, v in attachment_data.items() if v}
-            except json.JSONDecodeError: pass
+        thread = threading.Thread(target=self._load_entity_attachments_worker, args=(entities,), daemon=True)
+        thread.start()
+
+    @staticmethod
+    def _attachment_owner(entity):
+        return member_owner(entity['data']) if entity['type'] == 'member' else club_owner(entity['data'])
 
-        if not attachment_data:
-            ctk.CTkLabel(self.attachment_type_selection_frame, text="No attachments found for this entity.").pack(pady=10)
+    def _load_entity_attachments_worker(self, entities):
+        """Lists the attachments of the selected entities from the attachments table (one indexed query)."""
+        try:
+            owners = [self._attachment_owner(entity) for entity in entities]
+            rows = get_attachments_for_owners([(o['owner_type'], o['owner_id']) for o in owners])
+            self.search_queue.put(("entity_attachments", (entities, rows)))
+        except Exception as e:
+            self.search_queue.put(("search_error", f"Failed to load attachments: {e}"))
+
+    def _show_entity_attachments(self, entities, rows):
+        if entities is not self.selected_attachment_entities:
+            return  # The selection has changed since this list was requested
+        for widget in self.attachment_type_selection_frame.winfo_children():
+            widget.destroy()
+
+        counts = {}
+        for row in rows:
+            counts[row['category']] = counts.get(row['category'], 0) + 1
+
+        if not counts:
+            ctk.CTkLabel(self.attachment_type_selection_frame, text="No attachments found for the selected entities.").pack(pady=10)
             self.download_button.configure(state="disabled")
             return
 
-        for key in sorted(attachment_data.keys()):
+        for key in sorted(counts):
             label = ATTACHMENT_LABELS_EN.get(key, key.replace('_', ' ').title())
-            chk = ctk.CTkCheckBox(self.attachment_type_selection_frame, text=label)
+            chk = ctk.CTkCheckBox(self.attachment_type_selection_frame, text=f"{label} ({counts[key]})")
             chk.pack(anchor="w", padx=10, pady=2)
             self.attachment_type_checkboxes[key] = chk
-        
+
         self.download_button.configure(state="normal")
 
+    def _export_missing_documents(self):
+        owner_type, category = self.missing_category_options[self.missing_category_menu.get()]
+        role = self.missing_role_menu.get()
+        role = None if role == "All Roles" or owner_type == 'club' else role
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[("Excel file", "*.xlsx")],
+            initialfile=f"pkf_missing_{category}.xlsx"
+        )
+        if not filepath:
+            return
+        thread = threading.Thread(target=self._export_missing_documents_worker, args=(filepath, owner_type, category, role), daemon=True)
+        thread.start()
+
+    def _export_missing_documents_worker(self, filepath, owner_type, category, role):
+        """Writes the members (or clubs) that have no attachment in the category to an Excel file."""
+        try:
+            rows = get_missing_attachments(category, owner_type=owner_type, role=role)
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(f"Missing {category}"[:31])
+            if owner_type == 'member':
+                ws.append(["PKF ID", "Full Name", "Full Name (Arabic)", "Role", "Club"])
+                for row in rows:
+                    ws.append([row['pkf_id'], row['full_name'], row['full_name_ar'], row['role'], row['club_name']])
+            else:
+                ws.append(["Club Membership ID", "Club Name"])
+                for row in rows:
+                    ws.append([row['club_membership_id'], row['name']])
+            wb.save(filepath)
+            self.app_queue.put(("export_finished", filepath))
+        except Exception as e:
+            self.app_queue.put(("export_error", str(e)))
+
     def _download_selected_attachments(self):
-        if not self.selected_attachment_entity:
-            messagebox.showwarning("No Selection", "Please search for and select a member or club first.")
+        if not self.selected_attachment_entities:
+            messagebox.showwarning("No Selection", "Please search for and select at least one member or club first.")
             return
 
         selected_types = [type_key for type_key, chk in self.attachment_type_checkboxes.items() if chk.get() == 1]
@@ -821,66 +978,125 @@ class ReportsFrame(ctk.CTkFrame):
             messagebox.showwarning("No Selection", "Please select at least one attachment type.")
             return
 
-        destination_folder = filedialog.askdirectory(title="Select Folder to Save Attachments")
-        if not destination_folder: return
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=[("ZIP archive", "*.zip")],
+            initialfile="pkf_attachments.zip"
+        )
+        if not filepath: return
 
-        messagebox.showinfo("Download Started", "Downloading selected attachments in the background. You will be notified upon completion.")
+        messagebox.showinfo("Download Started", "Exporting selected attachments in the background. You will be notified upon completion.")
 
-        thread = threading.Thread(target=self._download_attachments_worker, args=(destination_folder, self.selected_attachment_entity, selected_types), daemon=True)
+        owners = [self._attachment_owner(entity) for entity in self.selected_attachment_entities]
+        thread = threading.Thread(target=self._download_attachments_worker, args=(filepath, owners, selected_types), daemon=True)
         thread.start()
 
-    def _download_attachments_worker(self, destination_folder, entity, selected_types):
-        copied_count, missing_count, error_list = 0, 0, []
-
-        def copy_file(source_path, dest_folder):
-            nonlocal copied_count, missing_count
-            if os.path.exists(source_path):
-                try:
-                    os.makedirs(dest_folder, exist_ok=True)
-                    shutil.copy2(source_path, dest_folder) # copy2 preserves metadata
-                    copied_count += 1
-                except Exception as e:
-                    missing_count += 1
-                    error_list.append(f"Could not copy '{source_path}': {e}")
-            else:
-                missing_count += 1
-                error_list.append(f"File not found: '{source_path}'")
-
+    def _download_attachments_worker(self, filepath, owners, selected_types):
+        """Worker function: streams the attachments into one ZIP with a manifest (see attachment_export.py)."""
         try:
-            entity_data = entity['data']
-            
-            if entity['type'] == 'member':
-                name = entity_data.get('full_name', 'Unknown_Member')
-                id_str = entity_data.get('pkf_id', 'NO_ID')
-                attachment_source = json.loads(entity_data.get('specific_data', '{}'))
-            else: # club
-                name = entity_data.get('name', 'Unknown_Club')
-                id_str = entity_data.get('club_membership_id', 'NO_ID')
-                attachment_source = json.loads(entity_data.get('attachments_data', '{}'))
-
-            safe_name = "".join(c for c in f"{name} {id_str}" if c.isalnum() or c in (' ', '_', '-')).rstrip()
-            entity_folder_path = os.path.join(destination_folder, safe_name)
-
-            for type_key in selected_types:
-                if type_key in attachment_source:
-                    paths = attachment_source[type_key]
-                    if isinstance(paths, list):
-                        for path in paths: copy_file(path, entity_folder_path)
-                    elif isinstance(paths, str) and paths:
-                        copy_file(paths, entity_folder_path)
-
-            self.app_queue.put(("download_finished", (copied_count, missing_count, error_list)))
+            summary = export_attachments_zip(
+                owners, filepath, categories=selected_types,
+                progress_callback=lambda done, total: self.app_queue.put(("download_progress", (done, total)))
+            )
+            self.app_queue.put(("download_finished", (filepath, summary)))
         except Exception as e:
             self.app_queue.put(("download_error", str(e)))
+
     def _perform_search(self, event=None):
         filters = { "query": self.search_entry.get(), "role": self.role_filter.get(), "club": self.club_filter.get(), "current_belt": self.belt_filter.get(), "profession": self.profession_filter.get(), "expiry_from": self.expiry_from.get(), "expiry_to": self.expiry_to.get(), "dob_from": self.dob_from.get(), "dob_to": self.dob_to.get(), "has_kata": self.kata_filter.get() == 1, "has_kumite": self.kumite_filter.get() == 1, "coach_nat_rank": self.coach_nat_rank.get(), }
         for item in self.results_tree.get_children():
             self.results_tree.delete(item)
         self.results_tree.insert("", "end", iid="searching", values=("", "Searching, please wait...", "", "", ""))
         self.update_idletasks()
+        self.current_filters = filters
+        self.next_after_id = None
+        self.load_more_button.configure(state="disabled")
+        self.results_count_label.configure(text="")
         thread = threading.Thread(target=self._perform_search_worker, args=(filters,), daemon=True)
         thread.start()
 
+    def _card_selection(self):
+        """pkf_ids of the selected rows ([] = every member matching the current filters), or None if there is nothing to print."""
+        selected_ids = [self.members_data[int(iid)]['pkf_id'] for iid in self.results_tree.selection()
+                        if iid.isdigit() and int(iid) in self.members_data]
+        if not selected_ids and self.current_filters is None:
+            messagebox.showinfo("Info", "Select members or press 'Apply Filters' first.")
+            return None
+        return selected_ids
+
+    def _print_cards_zip(self):
+        """Renders ID cards for the selected rows (or every member matching the current filters) into one ZIP."""
+        selected_ids = self._card_selection()
+        if selected_ids is None:
+            return
+
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=[("ZIP archive", "*.zip")],
+            initialfile="pkf_cards.zip"
+        )
+        if not filepath:
+            return
+
+        scope = f"{len(selected_ids)} selected members" if selected_ids else "all members matching the current filters"
+        messagebox.showinfo("Printing Cards", f"Generating cards for {scope} in the background. You will be notified upon completion.")
+        thread = threading.Thread(target=self._print_cards_zip_worker, args=(filepath, selected_ids, dict(self.current_filters or {})), daemon=True)
+        thread.start()
+
+    def _print_cards_zip_worker(self, filepath, pkf_ids, filters):
+        try:
+            members = load_members_for_cards(pkf_ids=pkf_ids, **filters)
+            if not members:
+                raise ValueError("No members found to print.")
+            summary = generate_cards_zip(
+                members, filepath,
+                progress_callback=lambda done, total: self.app_queue.put(("cards_progress", (done, total)))
+            )
+            self.app_queue.put(("cards_finished", (filepath, summary)))
+        except Exception as e:
+            self.app_queue.put(("cards_error", str(e)))
+
+    def _print_card_sheets(self):
+        """Imposes the selected (or filtered) members' cards on A4 sheets in one PDF, optionally duplex."""
+        selected_ids = self._card_selection()
+        if selected_ids is None:
+            return
+
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF document", "*.pdf")],
+            initialfile="pkf_card_sheets.pdf"
+        )
+        if not filepath:
+            return
+
+        duplex = 'long' if messagebox.askyesno("Print Sheets", "Print the card backs as well (duplex, long-edge flip)?") else None
+        scope = f"{len(selected_ids)} selected members" if selected_ids else "all members matching the current filters"
+        messagebox.showinfo("Printing Cards", f"Generating card sheets for {scope} in the background. You will be notified upon completion.")
+        thread = threading.Thread(target=self._print_card_sheets_worker, args=(filepath, selected_ids, dict(self.current_filters or {}), duplex), daemon=True)
+        thread.start()
+
+    def _print_card_sheets_worker(self, filepath, pkf_ids, filters, duplex):
+        try:
+            members = load_members_for_cards(pkf_ids=pkf_ids, **filters)
+            if not members:
+                raise ValueError("No members found to print.")
+            summary = impose_cards_pdf(
+                members, filepath, duplex=duplex,
+                progress_callback=lambda done, total: self.app_queue.put(("cards_progress", (done, total)))
+            )
+            self.app_queue.put(("cards_finished", (filepath, summary)))
+        except Exception as e:
+            self.app_queue.put(("cards_error", str(e)))
+
+    def _load_more_members(self):
+        """Fetches the next page of the current member search and appends it to the tree."""
+        if self.current_filters is None or self.next_after_id is None:
+            return
+        self.load_more_button.configure(state="disabled", text="Loading...")
+        thread = threading.Thread(target=self._perform_search_worker, args=(self.current_filters, self.next_after_id), daemon=True)
+        thread.start()
+
     def _on_double_click(self, event):
         """Handles double-click event on the results tree."""
         item_id = self.results_tree.focus()
@@ -912,16 +1128,26 @@ class ReportsFrame(ctk.CTkFrame):
             result_type, data = self.search_queue.get_nowait()
 
             if result_type == "member_search_results":
-                for item in self.results_tree.get_children(): self.results_tree.delete(item)
-                self.members_data.clear()
-                results = data
-                if not results:
+                page = data
+                if page['filters'] is not self.current_filters:
+                    return  # a page of an earlier search (e.g. "Load More" before the filters changed)
+                if not page['append']:
+                    for item in self.results_tree.get_children(): self.results_tree.delete(item)
+                    self.members_data.clear()
+                    self.results_total = (page['total'], page['total_is_estimate'])
+                self.next_after_id = page['next_after_id']
+                self.load_more_button.configure(text="Load More", state="normal" if self.next_after_id is not None else "disabled")
+                results = page['rows']
+                if not results and not self.members_data:
+                    self.results_count_label.configure(text="")
                     self.results_tree.insert("", "end", iid="no_results", values=("", "No members found for the selected criteria.", "", "", ""))
                     return
                 for member_data in results:
                     db_id = member_data['id']
                     self.members_data[db_id] = member_data
                     self.results_tree.insert("", "end", iid=db_id, values=(member_data.get('full_name', 'N/A'), member_data.get('full_name_ar', 'N/A'), member_data.get('pkf_id', 'N/A'), member_data.get('club_name', 'N/A'), member_data.get('role', 'N/A')))
+                total, is_estimate = self.results_total
+                self.results_count_label.configure(text=f"Showing {len(self.members_data)} of {'~' if is_estimate else ''}{total}")
 
             elif result_type == "club_search_results":
                 for item in self.club_results_tree.get_children(): self.club_results_tree.delete(item)
@@ -940,24 +1166,23 @@ class ReportsFrame(ctk.CTkFrame):
                 self.club_filter.configure(values=["All Clubs"] + clubs, state="normal")
 
             elif result_type == "attachment_entity_search_results":
-                results = data
-                for widget in self.attachment_search_results_frame.winfo_children():
-                    widget.destroy()
-                if not results:
-                    ctk.CTkLabel(self.attachment_search_results_frame, text="No members or clubs found.").pack(pady=20)
-                else:
-                    for entity in results:
-                        if entity['type'] == 'member':
-                            label = f"Member: {entity['data']['full_name']}\n(ID: {entity['data']['pkf_id']})"
-                        else: # club
-                            label = f"Club: {entity['data']['name']}\n(ID: {entity['data'].get('club_membership_id', 'N/A')})"
-                        
-                        btn = ctk.CTkButton(self.attachment_search_results_frame, text=label, command=lambda e=entity: self._on_entity_selected(e), anchor="w")
-                        btn.pack(fill="x", padx=5, pady=3)
+                rows = []
+                for entity in data:
+                    if entity['type'] == 'member':
+                        rows.append({'type': "Member", 'name': entity['data'].get('full_name') or entity['data'].get('full_name_ar'),
+                                     'id': entity['data'].get('pkf_id'), 'entity': entity})
+                    else: # club
+                        rows.append({'type': "Club", 'name': entity['data'].get('name'),
+                                     'id': entity['data'].get('club_membership_id', 'N/A'), 'entity': entity})
+                self.attachment_search_results.set_rows(rows)
+
+            elif result_type == "entity_attachments":
+                self._show_entity_attachments(*data)
 
             elif result_type == "search_error":
                 error_message = data
                 messagebox.showerror("Search Error", f"An error occurred during search: {error_message}")
+                self.load_more_button.configure(text="Load More", state="disabled")
                 for item in self.results_tree.get_children(): self.results_tree.delete(item)
                 for item in self.club_results_tree.get_children(): self.club_results_tree.delete(item)
         except Empty:
@@ -1114,11 +1339,13 @@ class ReportsFrame(ctk.CTkFrame):
         self.coach_nat_rank.delete(0, 'end')
         self._perform_search() # Perform search with cleared filters
     
-    def _perform_search_worker(self, filters):
-        """Worker thread for member search."""
+    def _perform_search_worker(self, filters, after_id=None):
+        """Worker thread for member search. Fetches one keyset page; the total is counted on the first page only."""
         try:
-            results = search_members_advanced(**filters)
-            self.search_queue.put(("member_search_results", results))
+            page = search_members_page(after_id=after_id, count_mode="auto" if after_id is None else None, **filters)
+            page['append'] = after_id is not None
+            page['filters'] = filters  # the search it belongs to; stale pages are dropped when processed
+            self.search_queue.put(("member_search_results", page))
         except Exception as e:
             self.search_queue.put(("search_error", str(e)))
 
@@ -0,0 +1,307 @@
+"""
+Virtualized list widget for large result sets.
+
+A CTkScrollableFrame with one CTkFrame/CTkLabel set per row costs several Tk
+widgets per result, so a few thousand rows freeze the UI. VirtualList draws
+rows on a canvas and keeps only as many row slots as fit in the viewport;
+scrolling re-binds those slots to other rows instead of creating widgets, so
+the rendering cost depends on the viewport size, not on the number of rows.
+
+Rows are plain dicts. Sorting (click a column heading) and filtering (text
+and/or predicate) only reorder an index list in memory; selection, when
+enabled, is kept per row across sorting and filtering.
+"""
+import math
+import tkinter.font as tkfont
+
+import customtkinter as ctk
+
+_ROW_COLORS = (("gray90", "gray17"), ("gray85", "gray20"))
+_HEADER_COLOR = ("gray78", "gray25")
+_CHECK_ON, _CHECK_OFF = "☑", "☐"
+
+
+def _sort_value(value):
+    """Sort key that orders numbers, then text (case-insensitive), then empty values."""
+    if value is None or value == "":
+        return (2, "")
+    if isinstance(value, (int, float)):
+        return (0, value)
+    return (1, str(value).casefold())
+
+
+class VirtualList(ctk.CTkFrame):
+    """
+    columns: [(key, heading, weight), ...]; each cell shows str(row[key]).
+    selectable: draws a checkbox column; clicking a row toggles it and calls
+    on_selection_changed(selected_rows).
+    on_double_click(row) is called when a row is double-clicked.
+    """
+
+    def __init__(self, master, columns, row_height=28, selectable=False, on_selection_changed=None,
+                 on_double_click=None, empty_text="No results.", **kwargs):
+        super().__init__(master, **kwargs)
+        self.columns = list(columns)
+        self.selectable = selectable
+        self.on_selection_changed = on_selection_changed
+        self.on_double_click = on_double_click
+        self.empty_text = empty_text
+
+        self._rows = []          # all rows, in the order given to set_rows()
+        self._search_text = []   # per row: lower-cased text of all columns, for the text filter
+        self._view = []          # indices into _rows after filtering and sorting
+        self._selected = set()   # indices into _rows
+        self._filter_text = ""
+        self._filter_predicate = None
+        self._sort_key = None
+        self._sort_reverse = False
+        self._top = 0            # index into _view of the first visible row
+        self._slots = []         # canvas items per visible row: {'bg', 'check', 'cells'}
+        self._message = None
+
+        self._row_height = int(self._apply_widget_scaling(row_height))
+        self._font = tkfont.Font(font=self._apply_font_scaling(ctk.CTkFont()))
+        self._check_width = self._font.measure(_CHECK_ON) + 12 if selectable else 0
+
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(1, weight=1)
+        bg = self._apply_appearance_mode(_ROW_COLORS[0])
+        self._header = ctk.CTkCanvas(self, height=self._row_height, highlightthickness=0, bd=0, bg=bg)
+        self._header.grid(row=0, column=0, sticky="ew")
+        self._canvas = ctk.CTkCanvas(self, highlightthickness=0, bd=0, bg=bg)
+        self._canvas.grid(row=1, column=0, sticky="nsew")
+        self._scrollbar = ctk.CTkScrollbar(self, command=self._yview)
+        self._scrollbar.grid(row=0, column=1, rowspan=2, sticky="ns")
+
+        self._canvas.bind("<Configure>", lambda e: self._layout())
+        self._header.bind("<Configure>", lambda e: self._draw_header())
+        self._header.bind("<Button-1>", self._on_header_click)
+        self._canvas.bind("<Button-1>", self._on_click)
+        self._canvas.bind("<Double-Button-1>", self._on_double)
+        for widget in (self._canvas, self._header):
+            widget.bind("<MouseWheel>", self._on_mouse_wheel)
+            widget.bind("<Button-4>", self._on_mouse_wheel)  # For Linux scroll up
+            widget.bind("<Button-5>", self._on_mouse_wheel)  # For Linux scroll down
+
+    # --- Data ---
+
+    def set_rows(self, rows):
+        """Replaces the rows; the current sort and filter are applied, the selection is cleared."""
+        self._rows = list(rows)
+        keys = [key for key, _, _ in self.columns]
+        self._search_text = [" ".join(str(row.get(k) or "") for k in keys).casefold() for row in self._rows]
+        self._selected.clear()
+        self._message = None
+        self._refresh_view()
+
+    def show_message(self, text):
+        """Clears the rows and shows text instead (e.g. "Loading...")."""
+        self._rows, self._search_text, self._view = [], [], []
+        self._selected.clear()
+        self._message = text
+        self._top = 0
+        self._redraw()
+
+    @property
+    def rows(self):
+        """The rows currently shown, in display order."""
+        return [self._rows[i] for i in self._view]
+
+    def set_filter(self, text=None, predicate=None):
+        """Shows only rows containing text (in any column, case-insensitive) and accepted by predicate(row)."""
+        self._filter_text = (text or "").strip().casefold()
+        self._filter_predicate = predicate
+        self._refresh_view()
+
+    def sort_by(self, key, reverse=False):
+        self._sort_key = key
+        self._sort_reverse = reverse
+        self._refresh_view()
+
+    # --- Selection ---
+
+    def selected_rows(self):
+        """Selected rows in their original order, including rows hidden by the filter."""
+        return [self._rows[i] for i in sorted(self._selected)]
+
+    def select_all(self):
+        """Selects every row that passes the current filter."""
+        self._selected.update(self._view)
+        self._selection_changed()
+
+    def clear_selection(self):
+        self._selected.clear()
+        self._selection_changed()
+
+    def _selection_changed(self):
+        self._redraw()
+        if self.on_selection_changed:
+            self.on_selection_changed(self.selected_rows())
+
+    # --- View ---
+
+    def _refresh_view(self):
+        view = range(len(self._rows))
+        if self._filter_text:
+            view = [i for i in view if self._filter_text in self._search_text[i]]
+        if self._filter_predicate:
+            view = [i for i in view if self._filter_predicate(self._rows[i])]
+        view = list(view)
+        if self._sort_key is not None:
+            key = self._sort_key
+            view.sort(key=lambda i: _sort_value(self._rows[i].get(key)), reverse=self._sort_reverse)
+        self._view = view
+        self._top = 0
+        self._draw_header()
+        self._redraw()
+
+    def _visible_count(self):
+        return max(1, self._canvas.winfo_height() // self._row_height)
+
+    def _column_bounds(self):
+        """[(x0, x1), ...] per column, splitting the canvas width by column weight."""
+        width = max(1, self._canvas.winfo_width() - self._check_width)
+        total_weight = sum(weight for _, _, weight in self.columns) or 1
+        bounds, x = [], self._check_width
+        for _, _, weight in self.columns:
+            w = width * weight / total_weight
+            bounds.append((x, x + w))
+            x += w
+        return bounds
+
+    def _fit(self, text, width):
+        """Shortens text with an ellipsis to fit width pixels."""
+        if self._font.measure(text) <= width:
+            return text
+        lo, hi = 0, len(text)
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if self._font.measure(text[:mid] + "…") <= width:
+                lo = mid
+            else:
+                hi = mid - 1
+        return text[:lo] + "…"
+
+    def _layout(self):
+        """Creates or drops row slots so that exactly the rows fitting in the viewport exist."""
+        needed = math.ceil(self._canvas.winfo_height() / self._row_height)
+        while len(self._slots) < needed:
+            slot = {
+                'bg': self._canvas.create_rectangle(0, 0, 0, 0, width=0),
+                'check': self._canvas.create_text(0, 0, anchor="w", font=self._font) if self.selectable else None,
+                'cells': [self._canvas.create_text(0, 0, anchor="w", font=self._font) for _ in self.columns],
+            }
+            self._slots.append(slot)
+        while len(self._slots) > needed:
+            slot = self._slots.pop()
+            self._canvas.delete(slot['bg'], *slot['cells'], *([slot['check']] if slot['check'] else []))
+        self._draw_header()
+        self._redraw()
+
+    def _draw_header(self):
+        self._header.delete("all")
+        self._header.configure(bg=self._apply_appearance_mode(_HEADER_COLOR))
+        text_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkLabel"]["text_color"])
+        y = self._row_height / 2
+        for (key, heading, _), (x0, x1) in zip(self.columns, self._column_bounds()):
+            if key == self._sort_key:
+                heading = f"{heading} {'▼' if self._sort_reverse else '▲'}"
+            self._header.create_text(x0 + 6, y, anchor="w", font=self._font, fill=text_color, text=self._fit(heading, x1 - x0 - 12))
+
+    def _redraw(self):
+        """Binds the row slots to the rows at the current scroll position."""
+        self._top = max(0, min(self._top, len(self._view) - self._visible_count()))
+        canvas = self._canvas
+        canvas.delete("message")
+        text_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkLabel"]["text_color"])
+        selected_color = self._apply_appearance_mode(ctk.ThemeManager.theme["CTkButton"]["fg_color"])
+        width = canvas.winfo_width()
+        bounds = self._column_bounds()
+
+        for n, slot in enumerate(self._slots):
+            position = self._top + n
+            if position >= len(self._view):
+                for item in (slot['bg'], slot['check'], *slot['cells']):
+                    if item:
+                        canvas.itemconfigure(item, state="hidden")
+                continue
+            index = self._view[position]
+            row = self._rows[index]
+            y0 = n * self._row_height
+            y = y0 + self._row_height / 2
+            selected = index in self._selected
+            canvas.coords(slot['bg'], 0, y0, width, y0 + self._row_height)
+            canvas.itemconfigure(slot['bg'], state="normal", fill=self._apply_appearance_mode(_ROW_COLORS[position % 2]))
+            if slot['check']:
+                canvas.coords(slot['check'], 6, y)
+                canvas.itemconfigure(slot['check'], state="normal", text=_CHECK_ON if selected else _CHECK_OFF,
+                                     fill=selected_color if selected else text_color)
+            for item, (key, _, _), (x0, x1) in zip(slot['cells'], self.columns, bounds):
+                value = row.get(key)
+                canvas.coords(item, x0 + 6, y)
+                canvas.itemconfigure(item, state="normal", fill=text_color,
+                                     text=self._fit("" if value is None else str(value), x1 - x0 - 12))
+
+        if not self._view:
+            canvas.create_text(width / 2, self._row_height, anchor="n", font=self._font, tags="message",
+                               fill=self._apply_appearance_mode(("gray50", "gray60")),
+                               text=self._message if self._message is not None else self.empty_text)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self._view)
+        if total == 0:
+            self._scrollbar.set(0, 1)
+            return
+        self._scrollbar.set(self._top / total, min(1, (self._top + self._visible_count()) / total))
+
+    def _set_appearance_mode(self, mode_string):
+        super()._set_appearance_mode(mode_string)
+        self._canvas.configure(bg=self._apply_appearance_mode(_ROW_COLORS[0]))
+        self._draw_header()
+        self._redraw()
+
+    # --- Scrolling and events ---
+
+    def _yview(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', n, 'units'|'pages')."""
+        if args[0] == "moveto":
+            self._top = int(float(args[1]) * len(self._view))
+        elif args[0] == "scroll":
+            step = self._visible_count() if args[2] == "pages" else 1
+            self._top += int(args[1]) * step
+        self._redraw()
+
+    def yview_scroll(self, number, what):
+        self._yview("scroll", number, what)
+
+    def _on_mouse_wheel(self, event):
+        # Same normalization as utils.bind_mouse_wheel
+        if event.delta:
+            self.yview_scroll(int(-1 * (event.delta / 120)) if abs(event.delta) >= 120 else -event.delta, "units")
+        elif event.num == 4:
+            self.yview_scroll(-3, "units")
+        elif event.num == 5:
+            self.yview_scroll(3, "units")
+
+    def _index_at(self, y):
+        position = self._top + int(y // self._row_height)
+        return self._view[position] if 0 <= position < len(self._view) else None
+
+    def _on_click(self, event):
+        index = self._index_at(event.y)
+        if index is None or not self.selectable:
+            return
+        self._selected.symmetric_difference_update({index})
+        self._selection_changed()
+
+    def _on_double(self, event):
+        index = self._index_at(event.y)
+        if index is not None and self.on_double_click:
+            self.on_double_click(self._rows[index])
+
+    def _on_header_click(self, event):
+        for (key, _, _), (x0, x1) in zip(self.columns, self._column_bounds()):
+            if x0 <= event.x < x1:
+                self.sort_by(key, reverse=not self._sort_reverse if key == self._sort_key else False)
+                return
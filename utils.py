@@ -1,8 +1,13 @@
 import customtkinter as ctk
 from datetime import datetime, timedelta
 import calendar
+import logging
 from tkinter import Toplevel
 
+import eligibility
+
+logger = logging.getLogger(__name__)
+
 def bind_mouse_wheel(widget):
     """
     Binds mouse wheel scrolling for cross-platform compatibility (Windows, macOS, Linux).
@@ -35,7 +40,7 @@ def bind_mouse_wheel(widget):
 def calculate_age(dob_str):
     """Calculates age based on date of birth string (YYYY-MM-DD)."""
     if not dob_str:
-        print("DEBUG: calculate_age received empty dob_str.")
+        logger.debug("calculate_age received empty dob_str")
         return None
     try:
         dob = datetime.strptime(dob_str, '%Y-%m-%d').date()
@@ -43,7 +48,7 @@ def calculate_age(dob_str):
         age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
         return age
     except ValueError:
-        print(f"DEBUG: calculate_age failed to parse dob_str='{dob_str}'.")
+        logger.debug("calculate_age failed to parse dob_str=%r", dob_str)
         return None
 
 def get_eligible_categories(dob_str, gender, weight_kg):
@@ -58,46 +63,8 @@ def get_eligible_categories(dob_str, gender, weight_kg):
     Returns:
         tuple: (list of eligible kumite categories, list of eligible kata categories)
     """
-    print(f"DEBUG: get_eligible_categories called with dob='{dob_str}', gender='{gender}', weight={weight_kg}")
-    from competition_categories import KUMITE_CATEGORIES, KATA_CATEGORIES, AGE_RANGES
-
-    age = calculate_age(dob_str)
-    print(f"DEBUG: Calculated age: {age}")
-    if age is None or gender not in ["Male", "Female"]:
-        print("DEBUG: Age is None or gender is invalid. Returning empty lists.")
-        return [], []
-
-    eligible_kumite = []
-    eligible_kata = []
-    
-    age_category_keys = []
-    for min_age, max_age, key in AGE_RANGES:
-        if min_age <= age <= max_age:
-            age_category_keys.append(key)
-    print(f"DEBUG: Age category keys: {age_category_keys}")
-
-    if age_category_keys:
-        for age_category_key in age_category_keys:
-            # Kumite Categories
-            if age_category_key in KUMITE_CATEGORIES and gender in KUMITE_CATEGORIES[age_category_key]:
-                weight_classes = KUMITE_CATEGORIES[age_category_key][gender]
-                for wc in weight_classes:
-                    is_eligible = True
-                    if wc["min_weight"] is not None and weight_kg < wc["min_weight"]:
-                        is_eligible = False
-                    if wc["max_weight"] is not None and weight_kg > wc["max_weight"]:
-                        is_eligible = False
-                    
-                    if is_eligible:
-                        eligible_kumite.append(wc["label"])
-            
-            # Kata Categories
-            if age_category_key in KATA_CATEGORIES and gender in KATA_CATEGORIES[age_category_key]:
-                eligible_kata.extend(KATA_CATEGORIES[age_category_key][gender])
-        print(f"DEBUG: Kumite categories found: {eligible_kumite}")
-        print(f"DEBUG: Kata categories found: {eligible_kata}")
-
-    return eligible_kumite, eligible_kata
+    # Two binary searches over the index compiled at import (see eligibility.py)
+    return eligibility.lookup(calculate_age(dob_str), gender, weight_kg)
 
 class DateEntry(ctk.CTkFrame):
     """